@@ -107,5 +107,10 @@ LOGGING = {
             "level": "WARNING",  # Oculta los SELECTs
             "propagate": False,
         },
+        "stocks": {
+            "handlers": ["console"],
+            "level": "INFO",  # Progreso del pipeline con --output log
+            "propagate": False,
+        },
     },
 }
\ No newline at end of file
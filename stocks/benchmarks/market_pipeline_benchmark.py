@@ -0,0 +1,249 @@
+"""
+End-to-end benchmark of the stocks ingest and read paths on synthetic data.
+
+A SyntheticMarketDataFetcher generates deterministic OHLCV for N tickers x M years,
+which is driven through MarketDataTransformer, MarketDataRepository.save_time_series,
+the save_*_metrics methods and the read paths used by the API. Every case reports
+rows per second, SQL statements per row and process_peak_rss_mb, the peak RSS the
+process has reached so far. That peak is cumulative (cases run in one process, in
+order, and the transform case keeps every record in memory), so it only compares
+the same case between branches, never one case with another.
+
+The benchmark runs against a throwaway test database created from the configured
+DATABASES (e.g. a local Postgres), so the real data is never touched. Results are
+printed (and optionally written) as JSON to compare branches.
+
+Usage:
+    python -m stocks.benchmarks.market_pipeline_benchmark --tickers 500 --years 5 --output bench.json
+"""
+from starkadvisorbackend.utils.django_setup import ensure_django
+
+# Initialize Django and require the 'stocks' app to be present
+ensure_django(require_apps=["stocks"])
+
+import argparse
+import dataclasses
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from stocks.benchmarks.synthetic_market_data import SyntheticMarketDataFetcher, synthetic_symbols
+from stocks.dataclasses import AssetType
+from stocks.dtos.dtos import TimeSeriesDTO
+from stocks.dtos.time_series_dto_mapper import TimeSeriesDTOMapper
+from stocks.models import TimeSeries
+from stocks.services.market.market_data_fetcher.market_data_transformer import MarketDataTransformer
+from stocks.services.market.market_data_repository.market_data_repository import MarketDataRepository
+
+# Tickers per synthetic multi-ticker download, as in the pipeline
+DOWNLOAD_BATCH_SIZE = 50
+
+# Tickers sampled by the per-ticker read cases
+READ_SAMPLE_SIZE = 50
+
+# One bar in UPDATE_EVERY gets a new close and volume before the update case
+# (unchanged bars are skipped by save_time_series_batches, see save_time_series_unchanged)
+UPDATE_EVERY = 5
+
+
+class StatementCounter:
+    """
+    connection.execute_wrapper hook counting the SQL statements sent to the database.
+    """
+
+    def __init__(self):
+        self.statements = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements += 1
+        return execute(sql, params, many, context)
+
+
+def process_peak_rss_mb() -> float:
+    # High-water mark of the whole process so far; ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(name: str, func) -> dict:
+    """
+    Run func (which returns the number of rows it processed) once and collect its metrics.
+    """
+    counter = StatementCounter()
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        rows = func()
+        seconds = time.perf_counter() - started
+
+    result = {
+        "name": name,
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "statements": counter.statements,
+        "statements_per_row": round(counter.statements / rows, 4) if rows else None,
+        "process_peak_rss_mb": process_peak_rss_mb(),
+    }
+    print(f"⏱️ {name}: {rows} rows in {seconds:.2f}s, {counter.statements} statements", file=sys.stderr)
+    return result
+
+
+def legacy_get_time_series_from_db(ticker: str, period: str) -> list[TimeSeriesDTO]:
+    """
+    Model-instance read path as it was before the values_list rewrite, kept as the baseline.
+    """
+    days = {"5y": 5 * 365, "1y": 365, "1m": 30}[period]
+    start_date = timezone.now().date() - timedelta(days=days)
+    queryset = (
+        TimeSeries.objects
+        .select_related("asset")
+        .filter(asset__ticker=ticker, date__gte=start_date)
+        .order_by("date")
+    )
+    return TimeSeriesDTOMapper.from_queryset(queryset)
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(tickers: int, years: int) -> dict:
+    fetcher = SyntheticMarketDataFetcher(years=years, end=date.today())
+    period = f"{years}y"
+
+    stock_symbols = synthetic_symbols(tickers, "T")
+    etf_symbols = synthetic_symbols(tickers, "E")
+    currency_symbols = synthetic_symbols(tickers, "F")
+
+    # Raw frames are generated up front so the transform case only measures the transformer
+    frames = [
+        (symbols, fetcher.download_time_series_frame(symbols, period))
+        for symbols in (
+            stock_symbols[start:start + DOWNLOAD_BATCH_SIZE]
+            for start in range(0, tickers, DOWNLOAD_BATCH_SIZE)
+        )
+    ]
+    records = []
+
+    def transform():
+        for symbols, frame in frames:
+            batches = MarketDataTransformer.transform_time_series_batch(frame, symbols, AssetType.STOCK)
+            for batch in batches.values():
+                records.extend(batch.to_records())
+        return len(records)
+
+    def save_time_series(series):
+        def case():
+            return MarketDataRepository.save_time_series(series).total
+        return case
+
+    def revised_records():
+        return [
+            dataclasses.replace(record, close_price=round(record.close_price * 1.01, 4), volume=record.volume + 1)
+            if i % UPDATE_EVERY == 0 else record
+            for i, record in enumerate(records)
+        ]
+
+    def save_metrics_one_by_one(save_func, fetch_func, symbols):
+        def case():
+            for symbol in symbols:
+                save_func(fetch_func(symbol))
+            return len(symbols)
+        return case
+
+    def save_metrics_batch(asset_type, fetch_func, symbols):
+        def case():
+            return MarketDataRepository.save_metrics_batch(asset_type, [fetch_func(symbol) for symbol in symbols])
+        return case
+
+    read_sample = stock_symbols[:READ_SAMPLE_SIZE]
+
+    def read_time_series(read_func, read_period):
+        def case():
+            return sum(len(read_func(symbol, read_period)) for symbol in read_sample)
+        return case
+
+    def read_stock_metrics_pages():
+        rows, page, total_pages = 0, 1, 1
+        while page <= total_pages:
+            result = MarketDataRepository.get_stocks_metrics(page=page, page_size=25)
+            rows += len(result["results"])
+            total_pages = result["total_pages"]
+            page += 1
+        return rows
+
+    def read_stock_metrics_details():
+        return sum(1 for symbol in read_sample if MarketDataRepository.get_stock_metrics_by_ticker(symbol))
+
+    results = [
+        measure("transform_time_series_batch", transform),
+        measure("save_time_series_insert", save_time_series(records)),
+        measure("save_time_series_unchanged", save_time_series(records)),
+    ]
+    # Built outside the measured cases; records is filled by the transform case
+    results += [
+        measure("save_time_series_update", save_time_series(revised_records())),
+        measure("save_stock_metrics", save_metrics_one_by_one(
+            MarketDataRepository.save_stock_metrics, fetcher.get_stock_metrics, stock_symbols)),
+        measure("save_etf_metrics", save_metrics_one_by_one(
+            MarketDataRepository.save_etf_metrics, fetcher.get_etf_metrics, etf_symbols)),
+        measure("save_currency_metrics", save_metrics_one_by_one(
+            MarketDataRepository.save_currency_metrics, fetcher.get_currency_metrics, currency_symbols)),
+        measure("save_metrics_batch_stock", save_metrics_batch(
+            AssetType.STOCK, fetcher.get_stock_metrics, stock_symbols)),
+        measure("save_metrics_batch_etf", save_metrics_batch(
+            AssetType.ETF, fetcher.get_etf_metrics, etf_symbols)),
+        measure("save_metrics_batch_currency", save_metrics_batch(
+            AssetType.FOREX, fetcher.get_currency_metrics, currency_symbols)),
+        measure("read_time_series_5y_legacy", read_time_series(legacy_get_time_series_from_db, "5y")),
+        measure("read_time_series_5y", read_time_series(MarketDataRepository.get_time_series_from_db, "5y")),
+        measure("read_time_series_1m", read_time_series(MarketDataRepository.get_time_series_from_db, "1m")),
+        measure("read_stock_metrics_pages", read_stock_metrics_pages),
+        measure("read_stock_metrics_details", read_stock_metrics_details),
+    ]
+
+    return {
+        "tickers": tickers,
+        "years": years,
+        "revision": git_revision(),
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stocks ingest and read paths on synthetic data.")
+    parser.add_argument("--tickers", type=int, default=500, help="Number of synthetic tickers per asset type (default: 500)")
+    parser.add_argument("--years", type=int, default=5, help="Years of daily bars per ticker (default: 5)")
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this file")
+    parser.add_argument("--keepdb", action="store_true", help="Reuse the benchmark database between runs")
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=args.keepdb)
+    try:
+        report = run(args.tickers, args.years)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Deterministic synthetic market data for the stocks benchmarks.
+
+SyntheticMarketDataFetcher mirrors the MarketDataFetcher methods used by the
+pipeline, but generates OHLCV frames and metrics locally from a seed, so every
+run of a benchmark sees exactly the same data and never touches Yahoo.
+"""
+import zlib
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from stocks.dataclasses import CurrencyMetricsData, ETFMetricsData, MarketTicker, StockMetricsData
+
+TRADING_DAYS_PER_YEAR = 252
+END_DATE = "2024-12-31"
+
+
+def synthetic_symbols(count: int, prefix: str = "T") -> List[str]:
+    return [f"{prefix}{i:04d}" for i in range(count)]
+
+
+def synthetic_tickers(count: int, prefix: str = "T") -> List[MarketTicker]:
+    return [MarketTicker(symbol=symbol, name=f"Synthetic {symbol}") for symbol in synthetic_symbols(count, prefix)]
+
+
+def _rng(symbol: str, seed: int) -> np.random.Generator:
+    # Seeded per symbol so a ticker gets the same bars whatever batch it is downloaded in
+    return np.random.default_rng([seed, zlib.crc32(symbol.encode())])
+
+
+def synthetic_ohlcv(symbol: str, index: pd.DatetimeIndex, seed: int = 42) -> dict[str, np.ndarray]:
+    """
+    Random-walk OHLCV columns of one symbol over the given index.
+    """
+    rng = _rng(symbol, seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    spread = close * 0.01
+    return {
+        "Open": close - spread / 2,
+        "High": close + spread,
+        "Low": close - spread,
+        "Close": close,
+        "Adj Close": close,
+        "Volume": rng.integers(1_000, 1_000_000, len(index)).astype(float),
+    }
+
+
+def build_synthetic_frame(
+    tickers: int | List[str],
+    years: int,
+    seed: int = 42,
+    start: Optional[date] = None,
+    end: date | str = END_DATE
+) -> tuple[pd.DataFrame, list[str]]:
+    """
+    Build a deterministic multi-ticker OHLCV frame shaped like yf.download(group_by="ticker").
+    :param tickers: Number of synthetic tickers, or the symbols themselves.
+    :param start: Optional first date (incremental window).
+    :param end: Last business day of the bars.
+    """
+    symbols = synthetic_symbols(tickers) if isinstance(tickers, int) else list(tickers)
+    index = pd.bdate_range(end=end, periods=years * TRADING_DAYS_PER_YEAR, name="Date")
+
+    columns, data = [], []
+    for symbol in symbols:
+        for field, values in synthetic_ohlcv(symbol, index, seed).items():
+            columns.append((symbol, field))
+            data.append(values)
+
+    frame = pd.DataFrame(np.column_stack(data), index=index, columns=pd.MultiIndex.from_tuples(columns))
+    if start is not None:
+        frame = frame[frame.index >= pd.Timestamp(start)]
+    return frame, symbols
+
+
+class SyntheticMarketDataFetcher:
+    """
+    Drop-in replacement for the MarketDataFetcher methods used by the pipeline.
+    Bars end on `end` (default END_DATE); pass today's date to exercise the
+    relative read windows (5y, 1y, 1m) against fully populated data.
+    """
+
+    PERIOD_YEARS = {"1y": 1, "2y": 2, "5y": 5, "10y": 10}
+
+    def __init__(self, years: int = 5, seed: int = 42, end: date | str = END_DATE):
+        self.years = years
+        self.seed = seed
+        self.end = end
+
+    def download_time_series_frame(
+        self,
+        tickers: List[str],
+        period: str = "5y",
+        interval: str = "1d",
+        start: Optional[date] = None
+    ) -> pd.DataFrame:
+        years = self.PERIOD_YEARS.get(period, self.years)
+        frame, _ = build_synthetic_frame(tickers, years, self.seed, start, self.end)
+        return frame
+
+    def _close(self, ticker: str) -> float:
+        return float(synthetic_ohlcv(ticker, pd.bdate_range(end=self.end, periods=1), self.seed)["Close"][-1])
+
+    def get_stock_metrics(self, ticker: str, include_history: bool = True) -> StockMetricsData:
+        rng = _rng(ticker, self.seed + 1)
+        price = self._close(ticker)
+        return StockMetricsData(
+            symbol=ticker,
+            price=price,
+            daily_change=float(rng.normal(0, 1)),
+            change_5d_percent=float(rng.normal(0, 3)) if include_history else None,
+            change_1m_percent=float(rng.normal(0, 5)) if include_history else None,
+            change_ytd_percent=float(rng.normal(5, 15)) if include_history else None,
+            change_5y_percent=float(rng.normal(40, 60)) if include_history else None,
+            high=price * 1.01,
+            low=price * 0.99,
+            volume=int(rng.integers(1_000, 10_000_000)),
+            pe_ratio=float(rng.uniform(5, 60)),
+            eps=float(rng.uniform(0.1, 20)),
+            dividend_yield=float(rng.uniform(0, 5)),
+            market_cap=int(rng.integers(10**9, 10**12)),
+            sector="Synthetic"
+        )
+
+    def get_etf_metrics(self, ticker: str, include_history: bool = True) -> ETFMetricsData:
+        rng = _rng(ticker, self.seed + 2)
+        price = self._close(ticker)
+        return ETFMetricsData(
+            symbol=ticker,
+            current_price=price,
+            daily_change_percent=float(rng.normal(0, 1)),
+            change_5d_percent=float(rng.normal(0, 3)) if include_history else None,
+            change_1m_percent=float(rng.normal(0, 5)) if include_history else None,
+            change_ytd_percent=float(rng.normal(5, 15)) if include_history else None,
+            change_5y_percent=float(rng.normal(40, 60)) if include_history else None,
+            day_high=price * 1.01,
+            day_low=price * 0.99,
+            week52_high=price * 1.2,
+            week52_low=price * 0.8,
+            volume=int(rng.integers(1_000, 10_000_000)),
+            dividend_yield=float(rng.uniform(0, 5)),
+            market_cap=int(rng.integers(10**8, 10**11)),
+            nav=price
+        )
+
+    def get_currency_metrics(self, ticker: str, include_history: bool = True) -> CurrencyMetricsData:
+        rng = _rng(ticker, self.seed + 3)
+        rate = self._close(ticker) / 100
+        return CurrencyMetricsData(
+            symbol=ticker,
+            exchange_rate=rate,
+            daily_change_percent=float(rng.normal(0, 0.5)),
+            change_5d_percent=float(rng.normal(0, 1)) if include_history else None,
+            change_1m_percent=float(rng.normal(0, 2)) if include_history else None,
+            change_ytd_percent=float(rng.normal(0, 5)) if include_history else None,
+            change_5y_percent=float(rng.normal(0, 10)) if include_history else None,
+            day_high=rate * 1.005,
+            day_low=rate * 0.995,
+            fifty_two_week_high=rate * 1.1,
+            fifty_two_week_low=rate * 0.9,
+            bid=rate * 0.9999,
+            ask=rate * 1.0001
+        )
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark for MarketDataTransformer on a synthetic multi-ticker frame.
+
+Compares the legacy row-wise transformer (iterrows + one dataclass per bar) with the
+columnar transformer, on the same yfinance-shaped (Ticker, Price) frame.
+
+Usage:
+    python -m stocks.benchmarks.transform_time_series_benchmark --tickers 500 --years 5
+"""
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from stocks.benchmarks.synthetic_market_data import build_synthetic_frame
+from stocks.dataclasses import AssetType, TimeSeriesData
+from stocks.services.market.market_data_fetcher.market_data_transformer import MarketDataTransformer
+
+def legacy_transform_time_series(symbol: str, asset_type: AssetType, raw_data: pd.DataFrame) -> list[TimeSeriesData]:
+    """
+    Row-wise transformer as it was before the columnar rewrite, kept as the baseline.
+    """
+    series = []
+    for date, row in raw_data.iterrows():
+        series.append(TimeSeriesData(
+            asset_type=asset_type,
+            symbol=symbol,
+            date=date.to_pydatetime() if hasattr(date, 'to_pydatetime') else date,
+            open_price=float(row["Open"].iloc[0]) if isinstance(row["Open"], pd.Series) else float(row["Open"]),
+            close_price=float(row["Close"].iloc[0]) if isinstance(row["Close"], pd.Series) else float(row["Close"]),
+            high_price=float(row["High"].iloc[0]) if isinstance(row["High"], pd.Series) else float(row["High"]),
+            low_price=float(row["Low"].iloc[0]) if isinstance(row["Low"], pd.Series) else float(row["Low"]),
+            volume=int(row["Volume"].iloc[0]) if isinstance(row["Volume"], pd.Series) else int(row["Volume"])
+        ))
+    return series
+
+
+def measure(label: str, func, frames: dict[str, pd.DataFrame]) -> dict:
+    started = time.perf_counter()
+    rows = sum(len(func(symbol, AssetType.STOCK, frame)) for symbol, frame in frames.items())
+    seconds = time.perf_counter() - started
+    return {"name": label, "rows": rows, "seconds": round(seconds, 4), "rows_per_second": round(rows / seconds, 1)}
+
+
+def run(tickers: int, years: int) -> dict:
+    raw, symbols = build_synthetic_frame(tickers, years)
+    frames = MarketDataTransformer.split_multi_ticker_frame(raw, symbols)
+
+    results = [
+        measure("legacy_iterrows", legacy_transform_time_series, frames),
+        measure("columnar", MarketDataTransformer.transform_time_series_columnar, frames),
+        measure("columnar_to_records", MarketDataTransformer.transform_time_series, frames),
+    ]
+    baseline = results[0]["seconds"]
+    for result in results:
+        result["speedup"] = round(baseline / result["seconds"], 1) if result["seconds"] else None
+
+    return {"tickers": tickers, "years": years, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MarketDataTransformer.transform_time_series.")
+    parser.add_argument("--tickers", type=int, default=500, help="Number of synthetic tickers (default: 500)")
+    parser.add_argument("--years", type=int, default=5, help="Years of daily bars per ticker (default: 5)")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.tickers, args.years), indent=2))
+
+
+if __name__ == "__main__":
+    main()
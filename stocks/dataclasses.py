@@ -1,8 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import List,Optional
 
+import numpy as np
+
 class AssetType(Enum):
     STOCK = "stock"
     FOREX = "forex"
@@ -26,6 +28,77 @@ class TimeSeriesData:
     low_price: float
     volume: float | None = None
 
+@dataclass
+class TimeSeriesBatch:
+    """
+    Columnar OHLCV bars of one symbol, as NumPy arrays. Per-bar TimeSeriesData
+    objects are only built when a caller needs them (to_records).
+    """
+    asset_type: AssetType
+    symbol: str
+    dates: np.ndarray
+    open_prices: np.ndarray
+    high_prices: np.ndarray
+    low_prices: np.ndarray
+    close_prices: np.ndarray
+    volumes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def to_records(self) -> List[TimeSeriesData]:
+        return [
+            TimeSeriesData(
+                asset_type=self.asset_type,
+                symbol=self.symbol,
+                date=date,
+                open_price=open_price,
+                close_price=close_price,
+                high_price=high_price,
+                low_price=low_price,
+                volume=volume
+            )
+            for date, open_price, high_price, low_price, close_price, volume in zip(
+                self.dates.tolist(),
+                self.open_prices.tolist(),
+                self.high_prices.tolist(),
+                self.low_prices.tolist(),
+                self.close_prices.tolist(),
+                self.volumes.tolist()
+            )
+        ]
+
+    @classmethod
+    def from_records(cls, records: List[TimeSeriesData]) -> "TimeSeriesBatch":
+        """
+        Build a batch from TimeSeriesData of a single symbol.
+        """
+        return cls(
+            asset_type=records[0].asset_type,
+            symbol=records[0].symbol,
+            dates=np.array([r.date for r in records], dtype=object),
+            open_prices=np.array([r.open_price for r in records], dtype=float),
+            high_prices=np.array([r.high_price for r in records], dtype=float),
+            low_prices=np.array([r.low_price for r in records], dtype=float),
+            close_prices=np.array([r.close_price for r in records], dtype=float),
+            volumes=np.array([r.volume or 0 for r in records], dtype=np.int64)
+        )
+
+@dataclass
+class TimeSeriesSaveResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0          # Bars identical to the stored ones, not rewritten
+    touched: dict[int, set] = field(default_factory=dict)  # asset_id -> dates of the written bars
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
 @dataclass
 class StockMetricsData:
     symbol: str
@@ -79,3 +152,39 @@ class CurrencyMetricsData:
     fifty_two_week_low: Optional[float] = None
     bid: Optional[float] = None
     ask: Optional[float] = None
+
+
+@dataclass
+class DerivedMetricsData:
+    symbol: str
+    last_close: Optional[float] = None
+    change_5d_percent: Optional[float] = None
+    change_1m_percent: Optional[float] = None
+    change_ytd_percent: Optional[float] = None
+    change_5y_percent: Optional[float] = None
+    week52_high: Optional[float] = None
+    week52_low: Optional[float] = None
+
+
+@dataclass
+class UniverseDiff:
+    """
+    Membership change of a ticker universe between two snapshots.
+    """
+    added: List[MarketTicker] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+@dataclass
+class JobTiming:
+    """
+    Wall-clock timing of one pipeline job within a run.
+    """
+    name: str
+    asset_type: AssetType
+    started_at: float          # Seconds since the start of the run
+    seconds: float
+    succeeded: bool = True
@@ -0,0 +1,60 @@
+import hashlib
+from functools import wraps
+from typing import Callable, Optional, Union
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from stocks.services.market.market_data_repository.data_version_repository import DataVersionRepository
+
+
+def _variant(request) -> str:
+    """
+    Short digest of what selects the representation: the query string and the Accept
+    header (TimeSeriesView negotiates columnar / packed formats).
+    """
+    key = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def conditional_on_data_version(dataset: Union[str, Callable[..., Optional[str]]]):
+    """
+    Conditional GET for an APIView method, validated against a DataVersionRepository
+    dataset. The ETag and Last-Modified come from the dataset version (memoized in the
+    cache for a few seconds), so a matching If-None-Match (or If-Modified-Since) is
+    answered with 304 before the view runs its queries or serialization.
+
+    Unlike django.views.decorators.http.condition, validators are only attached to 200
+    (and 304) responses, so clients never revalidate an error.
+
+    :param dataset: Dataset name, or a callable (request, *args, **kwargs) returning it,
+                    or None for requests whose data is not versioned.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            name = dataset(request, *args, **kwargs) if callable(dataset) else dataset
+            if name is None or request.method not in ("GET", "HEAD"):
+                return view_method(self, request, *args, **kwargs)
+
+            token, modified = DataVersionRepository.get(name)
+            etag = f'"{token}-{_variant(request)}"'
+            last_modified = int(modified)
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+            # Errors, including a 412 for a failed If-Match / If-Unmodified-Since, go out as-is
+            if response.status_code not in (200, 304):
+                return response
+
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            # Always revalidate: the data changes whenever the pipeline runs
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ("Accept",))
+            return response
+
+        return wrapper
+
+    return decorator
@@ -2,6 +2,8 @@ from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
 
+import numpy as np
+
 @dataclass
 class MetricDTO:
     ticker: str
@@ -16,4 +18,17 @@ class MetricDTO:
 class TimeSeriesDTO:
     ticker: str
     timestamp: datetime  
-    close_price: float
\ No newline at end of file
+    close_price: float
+
+
+@dataclass
+class TimeSeriesColumnsDTO:
+    """
+    Columnar form of a list of TimeSeriesDTO: the ticker once plus parallel arrays.
+    times are epoch days for daily / weekly / monthly bars (time_unit "day") and
+    epoch seconds for intraday bars (time_unit "second").
+    """
+    ticker: str
+    time_unit: str
+    times: np.ndarray
+    close_prices: np.ndarray
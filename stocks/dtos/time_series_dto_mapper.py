@@ -1,9 +1,10 @@
 
-from datetime import datetime
+from datetime import date, datetime, time
 
+import numpy as np
 from django.utils import timezone
 from stocks.dataclasses import TimeSeriesData
-from stocks.dtos.dtos import TimeSeriesDTO
+from stocks.dtos.dtos import TimeSeriesColumnsDTO, TimeSeriesDTO
 
 
 
@@ -12,6 +13,13 @@ class TimeSeriesDTOMapper:
     Convierte datos crudos (DataFrame o QuerySet) en objetos TimeSeriesDTO.
     """
 
+    # Time units of TimeSeriesColumnsDTO.times
+    DAY = "day"
+    SECOND = "second"
+    TIME_UNITS = (DAY, SECOND)
+
+    EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
     @staticmethod
     def timedata_to_dto(time_series_data: list[TimeSeriesData]) -> list[TimeSeriesDTO]:
         """
@@ -27,6 +35,41 @@ class TimeSeriesDTOMapper:
             for item in time_series_data
         ]
 
+    @staticmethod
+    def from_rows(ticker: str, rows) -> list[TimeSeriesDTO]:
+        """
+        Converts (date, close_price) tuples of one ticker, as read by values_list with
+        the close already cast to float, into DTOs. Dates become midnight in the current
+        timezone, attached directly instead of one make_aware call per row.
+        """
+        midnight = time(tzinfo=timezone.get_current_timezone())
+        combine = datetime.combine
+        return [
+            TimeSeriesDTO(ticker=ticker, timestamp=combine(day, midnight), close_price=close_price)
+            for day, close_price in rows
+        ]
+
+    @staticmethod
+    def to_columns(ticker: str, series: list[TimeSeriesDTO], time_unit: str = DAY) -> TimeSeriesColumnsDTO:
+        """
+        Converts DTOs of one ticker into parallel arrays for the compact wire formats.
+        :param time_unit: DAY (epoch days of the local date) or SECOND (epoch seconds).
+        """
+        if time_unit == TimeSeriesDTOMapper.DAY:
+            epoch = TimeSeriesDTOMapper.EPOCH_ORDINAL
+            times = [item.timestamp.date().toordinal() - epoch for item in series]
+        elif time_unit == TimeSeriesDTOMapper.SECOND:
+            times = [int(item.timestamp.timestamp()) for item in series]
+        else:
+            raise ValueError(f"Invalid time unit '{time_unit}'. Must be one of {set(TimeSeriesDTOMapper.TIME_UNITS)}.")
+
+        return TimeSeriesColumnsDTO(
+            ticker=ticker,
+            time_unit=time_unit,
+            times=np.asarray(times, dtype=np.int64),
+            close_prices=np.fromiter((item.close_price for item in series), dtype=np.float64, count=len(series))
+        )
+
     @staticmethod
     def from_queryset(queryset) -> list[TimeSeriesDTO]:
         """
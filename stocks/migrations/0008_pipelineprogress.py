@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0007_rename_current_price_currencymetrics_exchange_rate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=100)),
+                ('asset_type', models.CharField(max_length=20)),
+                ('symbol', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('completed', 'Completed'), ('failed', 'Failed')], max_length=20)),
+                ('rows', models.IntegerField(default=0)),
+                ('duration', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('job_id', 'asset_type', 'symbol')},
+            },
+        ),
+    ]
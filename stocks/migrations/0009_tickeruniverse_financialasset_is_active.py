@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0008_pipelineprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TickerUniverse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('members', models.JSONField(default=list)),
+                ('etag', models.CharField(blank=True, default='', max_length=255)),
+                ('last_modified', models.CharField(blank=True, default='', max_length=100)),
+                ('checked_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='financialasset',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
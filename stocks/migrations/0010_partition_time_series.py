@@ -0,0 +1,95 @@
+from datetime import date
+
+from django.db import migrations
+
+TABLE = "stocks_timeseries"
+COLUMNS = "id, asset_id, date, open_price, high_price, low_price, close_price, volume"
+
+
+def _create_table(cursor, name, primary_key, suffix, partitioned):
+    cursor.execute(
+        f"CREATE TABLE {name} ("
+        "id bigint GENERATED BY DEFAULT AS IDENTITY, "
+        "asset_id bigint NOT NULL, "
+        "date date NOT NULL, "
+        "open_price numeric(20, 6) NOT NULL, "
+        "high_price numeric(20, 6) NOT NULL, "
+        "low_price numeric(20, 6) NOT NULL, "
+        "close_price numeric(20, 6) NOT NULL, "
+        "volume bigint NOT NULL, "
+        f"CONSTRAINT {TABLE}_pk{suffix} PRIMARY KEY ({primary_key}), "
+        f"CONSTRAINT {TABLE}_asset_id_date_uniq{suffix} UNIQUE (asset_id, date), "
+        f"CONSTRAINT {TABLE}_asset_id_fk{suffix} FOREIGN KEY (asset_id) "
+        "REFERENCES stocks_financialasset (id) DEFERRABLE INITIALLY DEFERRED"
+        ")" + (" PARTITION BY RANGE (date)" if partitioned else "")
+    )
+
+
+def _swap_tables(cursor, new_table):
+    cursor.execute(f"INSERT INTO {new_table} ({COLUMNS}) SELECT {COLUMNS} FROM {TABLE}")
+    cursor.execute(f"DROP TABLE {TABLE}")
+    cursor.execute(f"ALTER TABLE {new_table} RENAME TO {TABLE}")
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), COALESCE(max(id), 1), max(id) IS NOT NULL) FROM {TABLE}"
+    )
+
+
+def _relkind(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def partition_time_series(apps, schema_editor):
+    """
+    Rebuild stocks_timeseries as a table range-partitioned by date, with one partition
+    per year from the oldest stored bar to next year and a default partition for
+    anything else. The primary key becomes (id, date) because PostgreSQL requires the
+    partition key in every unique constraint; ids still come from the identity column.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if _relkind(cursor) == "p":
+            return
+
+        cursor.execute(f"SELECT min(date), max(date) FROM {TABLE}")
+        first, last = cursor.fetchone()
+        next_year = date.today().year + 1
+        first_year = first.year if first else next_year - 1
+        last_year = max(last.year if last else next_year, next_year)
+
+        new_table = f"{TABLE}_partitioned"
+        _create_table(cursor, new_table, "id, date", suffix="_p", partitioned=True)
+        for year in range(first_year, last_year + 1):
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_y{year} PARTITION OF {new_table} "
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            )
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {new_table} DEFAULT")
+        _swap_tables(cursor, new_table)
+
+
+def unpartition_time_series(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if _relkind(cursor) != "p":
+            return
+
+        new_table = f"{TABLE}_plain"
+        _create_table(cursor, new_table, "id", suffix="_plain", partitioned=False)
+        _swap_tables(cursor, new_table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0009_tickeruniverse_financialasset_is_active'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_time_series, unpartition_time_series),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0010_partition_time_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntradayBar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.CharField(max_length=5)),
+                ('timestamp', models.DateTimeField()),
+                ('open_price', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('high_price', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('low_price', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('close_price', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('volume', models.BigIntegerField()),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intraday_bars', to='stocks.financialasset')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['interval', 'timestamp'], name='stocks_intr_interva_58df5e_idx')],
+                'unique_together': {('asset', 'interval', 'timestamp')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0011_intradaybar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSeriesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.CharField(max_length=5)),
+                ('period_start', models.DateField()),
+                ('open_price', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('high_price', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('low_price', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('close_price', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('volume', models.BigIntegerField()),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_series_rollups', to='stocks.financialasset')),
+            ],
+            options={
+                'ordering': ['-period_start'],
+                'unique_together': {('asset', 'interval', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:11
+
+from django.db import migrations, models
+
+
+DATASETS = ["stock_metrics", "etf_metrics", "currency_metrics", "time_series"]
+
+
+def create_versions(apps, schema_editor):
+    DataVersion = apps.get_model("stocks", "DataVersion")
+    DataVersion.objects.bulk_create([DataVersion(dataset=dataset) for dataset in DATASETS], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0012_timeseriesrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('dataset', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -12,6 +12,7 @@ class FinancialAsset(models.Model):
             ('currency', 'Currency')
         ]
     )
+    is_active = models.BooleanField(default=True)  # False once the asset leaves its universe (e.g. S&P 500)
 
     def __str__(self):
         return f"{self.name} ({self.ticker})"
@@ -32,6 +33,51 @@ class TimeSeries(models.Model):
 
     def __str__(self):
         return f"{self.asset.ticker} - {self.date}"
+
+
+class TimeSeriesRollup(models.Model):
+    """
+    Weekly (1wk) or monthly (1mo) OHLCV bar aggregated from the daily TimeSeries,
+    kept up to date by the ingest pipeline for the buckets touched by new bars.
+    """
+    asset = models.ForeignKey(FinancialAsset, on_delete=models.CASCADE, related_name="time_series_rollups")
+    interval = models.CharField(max_length=5)                     # Example: 1wk, 1mo
+    period_start = models.DateField()                             # Monday of the week / first day of the month
+    open_price = models.DecimalField(max_digits=20, decimal_places=6)
+    high_price = models.DecimalField(max_digits=20, decimal_places=6)
+    low_price = models.DecimalField(max_digits=20, decimal_places=6)
+    close_price = models.DecimalField(max_digits=20, decimal_places=6)
+    volume = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('asset', 'interval', 'period_start')
+        ordering = ['-period_start']
+
+    def __str__(self):
+        return f"{self.asset.ticker} - {self.interval} - {self.period_start}"
+
+
+class IntradayBar(models.Model):
+    """
+    Intraday OHLCV bar (15m or 1h) kept for a rolling retention window, refreshed by
+    the intraday pipeline job and used by the 1d and 5d time series charts.
+    """
+    asset = models.ForeignKey(FinancialAsset, on_delete=models.CASCADE, related_name="intraday_bars")
+    interval = models.CharField(max_length=5)                     # Example: 15m, 1h
+    timestamp = models.DateTimeField()
+    open_price = models.DecimalField(max_digits=20, decimal_places=6)
+    high_price = models.DecimalField(max_digits=20, decimal_places=6)
+    low_price = models.DecimalField(max_digits=20, decimal_places=6)
+    close_price = models.DecimalField(max_digits=20, decimal_places=6)
+    volume = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('asset', 'interval', 'timestamp')
+        indexes = [models.Index(fields=['interval', 'timestamp'])]   # Retention purge
+        ordering = ['-timestamp']
+
+    def __str__(self):
+        return f"{self.asset.ticker} - {self.interval} - {self.timestamp}"
     
     
 
@@ -126,3 +172,63 @@ class CurrencyMetrics(models.Model):
 
     def __str__(self):
         return f"Currency Metrics - {self.asset.ticker}"
+
+
+class PipelineProgress(models.Model):
+    """
+    Per-ticker checkpoint of a market pipeline job.
+    Each (job, asset type, symbol) keeps only its latest outcome, so an interrupted
+    run can be resumed by skipping the tickers completed in the current run window.
+    """
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+
+    job_id = models.CharField(max_length=100)                     # Example: time_series:5y:1d, metrics
+    asset_type = models.CharField(max_length=20)
+    symbol = models.CharField(max_length=20)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            (STATUS_COMPLETED, 'Completed'),
+            (STATUS_FAILED, 'Failed')
+        ]
+    )
+    rows = models.IntegerField(default=0)                         # Rows written for the ticker
+    duration = models.FloatField(default=0)                       # Seconds spent on the ticker
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('job_id', 'asset_type', 'symbol')
+
+    def __str__(self):
+        return f"{self.job_id} - {self.symbol}: {self.status}"
+
+
+class TickerUniverse(models.Model):
+    """
+    Last known membership of a scraped ticker universe (e.g. the S&P 500 list),
+    with the HTTP validators needed to revalidate it conditionally.
+    """
+    name = models.CharField(max_length=50, unique=True)          # Example: sp500
+    members = models.JSONField(default=list)                      # [[symbol, name], ...]
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=100, blank=True, default='')
+    checked_at = models.DateTimeField()                           # Last successful (re)validation
+
+    def __str__(self):
+        return f"{self.name} ({len(self.members)} members)"
+
+
+class DataVersion(models.Model):
+    """
+    Version of a served dataset (e.g. stock_metrics, time_series), bumped by the
+    repository writes along with the data. Used as the HTTP
+    validators (ETag / Last-Modified) of the metrics and time series endpoints.
+    """
+    dataset = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.dataset} v{self.version}"
+
@@ -0,0 +1,113 @@
+import struct
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from stocks.dtos.dtos import TimeSeriesColumnsDTO
+from stocks.dtos.time_series_dto_mapper import TimeSeriesDTOMapper
+
+
+class ColumnarTimeSeriesRenderer(JSONRenderer):
+    """
+    Columnar JSON for TimeSeriesView (`Accept: application/vnd.starkadvisor.timeseries+json`
+    or `?format=columnar`):
+
+        {"ticker": "AAPL", "time_unit": "day", "times": [19723, ...], "close": [185.64, ...]}
+
+    The ticker is sent once and times are epoch days (epoch seconds for intraday bars)
+    instead of one object with an ISO timestamp per point. Other payloads, such as
+    errors, are rendered as plain JSON.
+    """
+
+    media_type = "application/vnd.starkadvisor.timeseries+json"
+    format = "columnar"
+    columnar = True     # TimeSeriesView hands this renderer a TimeSeriesColumnsDTO
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, TimeSeriesColumnsDTO):
+            data = {
+                "ticker": data.ticker,
+                "time_unit": data.time_unit,
+                "times": data.times.tolist(),
+                "close": data.close_prices.tolist()
+            }
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class PackedTimeSeriesRenderer(BaseRenderer):
+    """
+    Binary time series for TimeSeriesView (`Accept: application/vnd.starkadvisor.timeseries`
+    or `?format=packed`). Little-endian layout:
+
+        4s   magic b"SATS"
+        B    version (1)
+        B    time unit: 0 = epoch days, 1 = epoch seconds
+        B    ticker length, then the ticker in UTF-8
+        I    number of points n
+        n*I  times (uint32)
+        n*f  close prices (float32, ~7 significant digits, enough for charting)
+
+    A 5y daily series is 8 bytes per point. Other payloads, such as errors, are
+    rendered as JSON with an application/json content type.
+    """
+
+    media_type = "application/vnd.starkadvisor.timeseries"
+    format = "packed"
+    charset = None
+    render_style = "binary"
+    columnar = True
+
+    MAGIC = b"SATS"
+    VERSION = 1
+    TIME_UNITS = (TimeSeriesDTOMapper.DAY, TimeSeriesDTOMapper.SECOND)
+
+    @staticmethod
+    def pack(columns: TimeSeriesColumnsDTO) -> bytes:
+        ticker = columns.ticker.encode("utf-8")
+        header = struct.pack(
+            f"<4sBBB{len(ticker)}sI",
+            PackedTimeSeriesRenderer.MAGIC,
+            PackedTimeSeriesRenderer.VERSION,
+            PackedTimeSeriesRenderer.TIME_UNITS.index(columns.time_unit),
+            len(ticker),
+            ticker,
+            len(columns.times)
+        )
+        return (
+            header
+            + columns.times.astype("<u4").tobytes()
+            + columns.close_prices.astype("<f4").tobytes()
+        )
+
+    @staticmethod
+    def unpack(payload: bytes) -> TimeSeriesColumnsDTO:
+        """
+        Inverse of pack, for clients written in Python and for the tests.
+        """
+        magic, version, unit, ticker_length = struct.unpack_from("<4sBBB", payload)
+        if magic != PackedTimeSeriesRenderer.MAGIC or version != PackedTimeSeriesRenderer.VERSION:
+            raise ValueError("Not a packed time series (version 1) payload.")
+
+        offset = struct.calcsize("<4sBBB")
+        ticker = payload[offset:offset + ticker_length].decode("utf-8")
+        offset += ticker_length
+        (count,) = struct.unpack_from("<I", payload, offset)
+        offset += 4
+
+        times = np.frombuffer(payload, dtype="<u4", count=count, offset=offset)
+        close_prices = np.frombuffer(payload, dtype="<f4", count=count, offset=offset + 4 * count)
+        return TimeSeriesColumnsDTO(
+            ticker=ticker,
+            time_unit=PackedTimeSeriesRenderer.TIME_UNITS[unit],
+            times=times.astype(np.int64),
+            close_prices=close_prices.astype(np.float64)
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, TimeSeriesColumnsDTO):
+            return self.pack(data)
+
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = "application/json"
+        return JSONRenderer().render(data)
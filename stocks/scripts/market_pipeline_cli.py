@@ -4,7 +4,12 @@ from starkadvisorbackend.utils.django_setup import ensure_django
 ensure_django(require_apps=["stocks"])
 
 from stocks.services.market.market_data_pipeline import MarketDataPipeline
+from stocks.services.market.market_data_fetcher.response_store import ResponseStore
+from stocks.services.market.instrumentation.pipeline_instrumentation import PipelineInstrumentation
+from stocks.dataclasses import AssetType
 import argparse
+import json
+from datetime import date
 
 
 def main():
@@ -22,6 +27,10 @@ def main():
             "update_stock_metrics",
             "update_etf_metrics",
             "update_currency_metrics",
+            "update_metrics_from_time_series",
+            "update_intraday_bars",
+            "rebuild_rollups",
+            "load_staged_time_series",
             "run_all"
         ],
         help="Command to execute in the MarketDataPipeline."
@@ -30,24 +39,155 @@ def main():
     # Argumentos opcionales comunes
     parser.add_argument("--period", default="5y", help="Historical period (default: 5y)")
     parser.add_argument("--interval", default="1d", help="Data interval (default: 1d)")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=MarketDataPipeline.DEFAULT_BATCH_SIZE,
+        help=f"Tickers per multi-ticker download for time series (default: {MarketDataPipeline.DEFAULT_BATCH_SIZE}, 1 = one request per ticker)"
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only download time series bars after the last stored one (new assets get a full backfill)"
+    )
+
+    parser.add_argument(
+        "--local-changes",
+        action="store_true",
+        help="Derive metric window changes from stored time series instead of downloading history"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MarketDataPipeline.DEFAULT_WORKERS,
+        help=f"Concurrent upstream fetch threads (default: {MarketDataPipeline.DEFAULT_WORKERS})"
+    )
+
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=MarketDataPipeline.DEFAULT_RATE,
+        help=f"Maximum upstream requests per second shared by all workers, 0 = unlimited (default: {MarketDataPipeline.DEFAULT_RATE})"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip tickers already completed by the job in the current run window and retry only the rest"
+    )
+
+    parser.add_argument(
+        "--stage-dir",
+        default=None,
+        help="Stage downloaded time series as partitioned Parquet files in this directory instead of writing them to the database (load them later with load_staged_time_series)"
+    )
+
+    parser.add_argument(
+        "--asset-type",
+        choices=[asset_type.value for asset_type in AssetType],
+        default=None,
+        help="load_staged_time_series: only load this asset type (default: all)"
+    )
+
+    parser.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        default=None,
+        help="load_staged_time_series: only load partitions from this date's month on (YYYY-MM-DD)"
+    )
+
+    parser.add_argument(
+        "--cache-mode",
+        choices=ResponseStore.MODES,
+        default=None,
+        help="Yahoo response store: passthrough (live), record (live + save responses) or replay (saved responses only, no network). Default: $MARKET_DATA_CACHE_MODE or passthrough"
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help=f"Directory of the recorded responses (default: $MARKET_DATA_CACHE_DIR or {ResponseStore.DEFAULT_DIR})"
+    )
+
+    parser.add_argument(
+        "--output",
+        choices=[PipelineInstrumentation.OUTPUT_PRINT, PipelineInstrumentation.OUTPUT_LOG],
+        default=None,
+        help="Progress output: console lines (print) or structured JSON logging (log). Default: $MARKET_PIPELINE_OUTPUT or print"
+    )
+
+    parser.add_argument(
+        "--report",
+        default=None,
+        help="Write the per-stage timing report (JSON) to this file"
+    )
 
     args = parser.parse_args()
+    if args.output:
+        PipelineInstrumentation.configure(args.output)
+    ResponseStore.configure(args.cache_mode, args.cache_dir)
+    PipelineInstrumentation.progress(f"🗄️ Response store mode: {ResponseStore.mode()}", cache_mode=ResponseStore.mode())
+    PipelineInstrumentation.reset()
 
     # Llamar la función correspondiente dinámicamente
     try:
         if args.command == "run_all":
-            MarketDataPipeline.run_all(period=args.period, interval=args.interval)
+            MarketDataPipeline.run_all(
+                period=args.period,
+                interval=args.interval,
+                batch_size=args.batch_size,
+                incremental=args.incremental,
+                local_changes=args.local_changes,
+                workers=args.workers,
+                rate=args.rate,
+                resume=args.resume,
+                stage_dir=args.stage_dir
+            )
+        elif args.command == "load_staged_time_series":
+            if not args.stage_dir:
+                parser.error("load_staged_time_series requires --stage-dir")
+            MarketDataPipeline.load_staged_time_series(
+                args.stage_dir,
+                asset_type=AssetType(args.asset_type) if args.asset_type else None,
+                since=args.since,
+                workers=args.workers
+            )
         else:
             func = getattr(MarketDataPipeline, args.command)
-            if "time_series" in args.command:
-                func(period=args.period, interval=args.interval)
+            if args.command == "update_metrics_from_time_series":
+                func()
+            elif args.command == "update_intraday_bars":
+                func(batch_size=args.batch_size, workers=args.workers, rate=args.rate)
+            elif "time_series" in args.command:
+                func(
+                    period=args.period,
+                    interval=args.interval,
+                    batch_size=args.batch_size,
+                    incremental=args.incremental,
+                    workers=args.workers,
+                    rate=args.rate,
+                    resume=args.resume,
+                    stage_dir=args.stage_dir
+                )
+            elif args.command.endswith("_metrics"):
+                func(local_changes=args.local_changes, workers=args.workers, rate=args.rate, resume=args.resume)
             else:
                 func()
-        print(f"✅ Command '{args.command}' executed successfully!")
+        PipelineInstrumentation.progress(f"✅ Command '{args.command}' executed successfully!", command=args.command)
     except AttributeError:
-        print(f"❌ Error: Method '{args.command}' not found in MarketDataPipeline.")
+        PipelineInstrumentation.progress(f"❌ Error: Method '{args.command}' not found in MarketDataPipeline.", command=args.command)
     except Exception as e:
-        print(f"❌ An unexpected error occurred: {e}")
+        PipelineInstrumentation.progress(f"❌ An unexpected error occurred: {e}", command=args.command, error=str(e))
+
+    # Reporte de tiempos por etapa (p50/p95/max)
+    report = PipelineInstrumentation.report()
+    PipelineInstrumentation.progress(f"📊 Stage report: {json.dumps(report)}", report=report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        PipelineInstrumentation.progress(f"📝 Stage report written to {args.report}", report_file=args.report)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+from starkadvisorbackend.utils.django_setup import ensure_django
+
+# Initialize Django and require the 'stocks' app to be present
+ensure_django(require_apps=["stocks"])
+
+from stocks.services.market.market_data_repository.time_series_partition_repository import TimeSeriesPartitionRepository
+import argparse
+import sys
+from datetime import date
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manage the date range partitions of the time series table (PostgreSQL)."
+    )
+
+    parser.add_argument(
+        "command",
+        choices=["list", "create", "drop"],
+        help="list the partitions, create them ahead of time, or drop the old ones"
+    )
+
+    parser.add_argument(
+        "--ahead",
+        type=int,
+        default=1,
+        help="create: periods to create after the current one (default: 1)"
+    )
+
+    parser.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        default=None,
+        help="create: also create the partitions from this date on (YYYY-MM-DD, default: today)"
+    )
+
+    parser.add_argument(
+        "--granularity",
+        choices=[TimeSeriesPartitionRepository.YEAR, TimeSeriesPartitionRepository.MONTH],
+        default=TimeSeriesPartitionRepository.YEAR,
+        help="create: partition period (default: year)"
+    )
+
+    parser.add_argument(
+        "--before",
+        type=date.fromisoformat,
+        default=None,
+        help="drop: drop the partitions that end on or before this date (YYYY-MM-DD)"
+    )
+
+    args = parser.parse_args()
+
+    if not TimeSeriesPartitionRepository.is_partitioned():
+        print("⚠️ The time series table is not partitioned (PostgreSQL with migration 0010 required).")
+        return
+
+    if args.command == "list":
+        for name, start, end in TimeSeriesPartitionRepository.list_partitions():
+            print(f"🧱 {name}: {start or 'DEFAULT'} → {end or ''}")
+
+    elif args.command == "create":
+        today = date.today()
+        end = today
+        for _ in range(args.ahead):
+            _, end = TimeSeriesPartitionRepository.period_bounds(end, args.granularity)
+        try:
+            created = TimeSeriesPartitionRepository.ensure_partitions(args.since or today, end, args.granularity)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ Created {len(created)} partitions: {', '.join(created) or '-'}")
+
+    elif args.command == "drop":
+        if not args.before:
+            parser.error("drop requires --before")
+        dropped = TimeSeriesPartitionRepository.drop_partitions_before(args.before)
+        print(f"🗑️ Dropped {len(dropped)} partitions: {', '.join(dropped) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
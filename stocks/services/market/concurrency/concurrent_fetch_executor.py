@@ -0,0 +1,54 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+from stocks.services.market.concurrency.rate_limiter import TokenBucketRateLimiter
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class ConcurrentFetchExecutor:
+    """
+    Runs upstream fetches on a bounded thread pool, throttled by a shared
+    TokenBucketRateLimiter. Results are handed back to the calling thread as
+    they complete, so the caller stays the single (serialized) DB writer.
+    """
+
+    def __init__(self, workers: int, rate_limiter: Optional[TokenBucketRateLimiter] = None):
+        self.workers = max(1, workers)
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter(rate=0)
+
+    def map(
+        self,
+        func: Callable[[T], R],
+        items: Iterable[T],
+        cost: float = 1.0
+    ) -> Iterator[Tuple[T, Optional[R], Optional[Exception]]]:
+        """
+        Apply func to every item concurrently and yield (item, result, error) tuples
+        in completion order. At most 2 x workers tasks are in flight, which keeps
+        memory flat for large universes.
+        :param cost: Rate limiter tokens consumed per call (upstream requests per item).
+        """
+        def run(item):
+            self.rate_limiter.acquire(cost)
+            return func(item)
+
+        pending = {}
+        items = iter(items)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                for item in items:
+                    pending[pool.submit(run, item)] = item
+                    if len(pending) >= 2 * self.workers:
+                        break
+
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    error = future.exception()
+                    yield item, (None if error else future.result()), error
@@ -0,0 +1,48 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucketRateLimiter:
+    """
+    Thread-safe token bucket shared by every worker that calls the same upstream.
+    Tokens refill continuously at `rate` per second up to `capacity`, so short
+    bursts are allowed while the long-run request rate never exceeds `rate`.
+    A rate of 0 (or less) disables the limit.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        Block until `tokens` are available and consume them. Requests larger than the
+        bucket capacity are served in capacity-sized installments.
+        """
+        if self.rate <= 0:
+            return
+
+        while tokens > self.capacity:
+            self._acquire(self.capacity)
+            tokens -= self.capacity
+
+        self._acquire(tokens)
+
+    def _acquire(self, tokens: float):
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+
+            time.sleep(wait)
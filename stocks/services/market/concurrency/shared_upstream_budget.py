@@ -0,0 +1,39 @@
+import time
+
+from django.core.cache import cache
+
+
+class SharedUpstreamBudget:
+    """
+    Upstream request budget shared by every web worker: a fixed-window counter kept
+    in the Django cache (Redis in deployments, so all processes see the same count).
+    Unlike UpstreamBudget it never waits; callers check try_acquire and fall back to
+    cached data when the window's budget is spent.
+    """
+
+    def __init__(self, name: str, limit: int, window_seconds: int = 60):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+
+    def _key(self) -> str:
+        window = int(time.time() // self.window_seconds)
+        return f"upstream_budget:{self.name}:{window}"
+
+    def try_acquire(self) -> bool:
+        """
+        Take one request from the current window's budget.
+        :return: False when the budget of the window is exhausted.
+        """
+        key = self._key()
+        cache.add(key, 0, timeout=self.window_seconds * 2)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # The window key expired between add and incr
+            cache.add(key, 1, timeout=self.window_seconds * 2)
+            count = 1
+        return count <= self.limit
+
+    def remaining(self) -> int:
+        return max(0, self.limit - (cache.get(self._key()) or 0))
@@ -0,0 +1,43 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable, TypeVar
+
+R = TypeVar("R")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for a key is in flight, later
+    callers with the same key wait for it and get its result (or its exception)
+    instead of running their own. Nothing is kept once the call returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+        self.shared = 0     # Calls answered by another caller's flight
+
+    def do(self, key: Hashable, func: Callable[[], R]) -> R:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
@@ -0,0 +1,195 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from queue import Queue
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from stocks.services.market.concurrency.rate_limiter import TokenBucketRateLimiter
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of busy time (per worker for multi-threaded stages)."""
+        return self.items / self.busy_seconds if self.busy_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name}: {self.items} items, {self.busy_seconds:.1f}s busy / {self.wall_seconds:.1f}s wall "
+            f"({self.throughput:.1f} items/s)"
+        )
+
+
+class StagedPipeline:
+    """
+    Producer/consumer pipeline with three stages connected by bounded queues:
+
+        fetch (N threads) -> transform (1 thread) -> write (calling thread, batched)
+
+    Network fetches overlap with transformation and DB writes, so the wall time
+    approaches that of the slowest stage instead of the sum of all of them. Bounded
+    queues apply backpressure: fetchers block when the writer falls behind, keeping
+    memory flat. Writes run on the calling thread so DB access stays serialized on a
+    single connection.
+
+    - fetch_func(item) -> raw
+    - transform_func(item, raw) -> list of units
+    - write_func(units) persists a batch of units
+    - unit_size(unit) -> weight of a unit when filling write batches (e.g. rows)
+    - on_error(item, error) -> list of units forwarded to the writer when fetching or
+      transforming an item fails (e.g. to account for its symbols as failed)
+    - item_cost(item) -> rate limiter tokens consumed by one fetch (upstream requests)
+    """
+
+    def __init__(
+        self,
+        fetch_func: Callable[[Any], Any],
+        transform_func: Callable[[Any, Any], List[Any]],
+        write_func: Callable[[List[Any]], None],
+        fetch_workers: int = 4,
+        queue_size: int = 8,
+        write_batch_size: int = 5000,
+        unit_size: Callable[[Any], int] = lambda unit: 1,
+        on_error: Optional[Callable[[Any, Exception], List[Any]]] = None,
+        rate_limiter: Optional[TokenBucketRateLimiter] = None,
+        item_cost: Callable[[Any], float] = lambda item: 1
+    ):
+        self.fetch_func = fetch_func
+        self.transform_func = transform_func
+        self.write_func = write_func
+        self.fetch_workers = max(1, fetch_workers)
+        self.queue_size = max(1, queue_size)
+        self.write_batch_size = max(1, write_batch_size)
+        self.unit_size = unit_size
+        self.on_error = on_error or (lambda item, error: [])
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter(rate=0)
+        self.item_cost = item_cost
+        self._started = 0.0
+
+        self.stats = {name: StageStats(name) for name in ("fetch", "transform", "write")}
+        self.failures: List[Tuple[str, Any, Exception]] = []
+
+    def _fetch_worker(self, items, items_lock: threading.Lock, raw_queue: Queue):
+        stats = self.stats["fetch"]
+        try:
+            while True:
+                with items_lock:
+                    item = next(items, _DONE)
+                if item is _DONE:
+                    return
+
+                started = time.perf_counter()
+                try:
+                    self.rate_limiter.acquire(self.item_cost(item))
+                    started = time.perf_counter()
+                    raw, error = self.fetch_func(item), None
+                except Exception as e:
+                    raw, error = None, e
+                stats.record(1, time.perf_counter() - started)
+
+                raw_queue.put((item, raw, error))
+        finally:
+            # The transformer waits for one _DONE per fetcher, even if this one dies
+            raw_queue.put(_DONE)
+
+    def _transform(self, item, raw, error) -> List[Any]:
+        if error is not None:
+            self.failures.append(("fetch", item, error))
+            return self.on_error(item, error)
+        try:
+            return self.transform_func(item, raw)
+        except Exception as e:
+            self.failures.append(("transform", item, e))
+            return self.on_error(item, e)
+
+    def _transform_worker(self, raw_queue: Queue, unit_queue: Queue):
+        stats = self.stats["transform"]
+        finished_fetchers = 0
+
+        try:
+            while finished_fetchers < self.fetch_workers:
+                message = raw_queue.get()
+                if message is _DONE:
+                    finished_fetchers += 1
+                    continue
+
+                item, raw, error = message
+                started = time.perf_counter()
+                try:
+                    units = self._transform(item, raw, error)
+                except Exception as e:
+                    # on_error itself failed: keep draining so the fetchers never block
+                    self.failures.append(("on_error", item, e))
+                    units = []
+                stats.record(1, time.perf_counter() - started)
+
+                for unit in units:
+                    unit_queue.put(unit)
+        finally:
+            # The writer loop ends only on _DONE, so it is sent whatever happened above
+            self.stats["fetch"].wall_seconds = self.stats["transform"].wall_seconds = time.perf_counter() - self._started
+            unit_queue.put(_DONE)
+
+    def _flush(self, batch: List[Any]):
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            self.write_func(list(batch))
+        except Exception as e:
+            self.failures.append(("write", list(batch), e))
+        self.stats["write"].record(len(batch), time.perf_counter() - started)
+        batch.clear()
+
+    def run(self, items: Iterable[Any]) -> dict[str, StageStats]:
+        """
+        Push every item through the three stages and block until the last batch is written.
+        :return: Per-stage statistics (items, busy and wall seconds, throughput).
+        """
+        raw_queue: Queue = Queue(maxsize=self.queue_size)
+        unit_queue: Queue = Queue(maxsize=self.queue_size * 4)
+        items_lock = threading.Lock()
+        items = iter(items)
+        self._started = time.perf_counter()
+
+        fetchers = [
+            threading.Thread(target=self._fetch_worker, args=(items, items_lock, raw_queue), daemon=True)
+            for _ in range(self.fetch_workers)
+        ]
+        transformer = threading.Thread(target=self._transform_worker, args=(raw_queue, unit_queue), daemon=True)
+
+        for thread in (*fetchers, transformer):
+            thread.start()
+
+        batch, batch_size = [], 0
+        while True:
+            unit = unit_queue.get()
+            if unit is _DONE:
+                break
+            batch.append(unit)
+            batch_size += self.unit_size(unit)
+            if batch_size >= self.write_batch_size:
+                self._flush(batch)
+                batch_size = 0
+        self._flush(batch)
+
+        for thread in (*fetchers, transformer):
+            thread.join()
+
+        self.stats["write"].wall_seconds = time.perf_counter() - self._started
+        return self.stats
@@ -0,0 +1,36 @@
+import functools
+from typing import Any, Callable, Optional, TypeVar
+
+from stocks.services.market.concurrency.rate_limiter import TokenBucketRateLimiter
+from stocks.services.market.concurrency.upstream_health import UpstreamHealthController
+
+R = TypeVar("R")
+
+
+class UpstreamBudget:
+    """
+    Global upstream budget shared by jobs running at the same time: one token
+    bucket for the request rate and one UpstreamHealthController capping the
+    requests in flight, so running several jobs concurrently never exceeds what a
+    single job may use, and all of them back off together when Yahoo throttles.
+    """
+
+    def __init__(self, rate: float, max_in_flight: int, health: Optional[UpstreamHealthController] = None):
+        self.rate_limiter = TokenBucketRateLimiter(rate)
+        self.max_in_flight = max(1, max_in_flight)
+        self.health = health or UpstreamHealthController(max_concurrency=self.max_in_flight)
+
+    def bounded(
+        self,
+        func: Callable[..., R],
+        result_is_failure: Optional[Callable[[Any], bool]] = None
+    ) -> Callable[..., R]:
+        """
+        Wrap an upstream call so it only runs within the health controller's current
+        concurrency limit and feeds its outcome back to it.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.health.call(func, *args, result_is_failure=result_is_failure, **kwargs)
+
+        return wrapper
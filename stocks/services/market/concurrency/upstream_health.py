@@ -0,0 +1,197 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling the upstream while the circuit breaker is open.
+    """
+
+
+class UpstreamHealthController:
+    """
+    Adapts the pressure put on an upstream (Yahoo) to how healthy it looks.
+
+    - Concurrency is adjusted AIMD-style: every `increase_every` successes allow one
+      more call in flight (up to max_concurrency); a rate limit or an error burst
+      halves it (down to min_concurrency).
+    - Each rate limit or burst also pauses every caller for an exponential backoff
+      with jitter (base_backoff * 2^streak, capped at max_backoff, x0.5-1.5).
+    - After `trip_after` consecutive failures, or when at least `failure_ratio` of
+      the last `window` calls failed, the circuit opens: calls fail fast with
+      CircuitOpenError for `open_seconds`, then a single probe call is let through
+      (half-open) and its outcome closes or re-opens the circuit.
+
+    Callers are expected to requeue the work rejected with CircuitOpenError or
+    failed with a rate limit (see is_rate_limit) for a later pass.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    RATE_LIMIT_MARKERS = ("too many requests", "rate limit", "429")
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        window: int = 20,
+        failure_ratio: float = 0.5,
+        trip_after: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        open_seconds: float = 60.0,
+        increase_every: int = 10
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.failure_ratio = failure_ratio
+        self.trip_after = trip_after
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.open_seconds = open_seconds
+        self.increase_every = increase_every
+
+        self.limit = self.max_concurrency
+        self.state = self.CLOSED
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "rate_limited": 0, "rejected": 0, "trips": 0}
+
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._streak = 0
+        self._successes_since_increase = 0
+        self._paused_until = 0.0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @staticmethod
+    def is_rate_limit(error: BaseException) -> bool:
+        """
+        Whether an error (or any error it was raised from) is an upstream rate limit.
+        """
+        while error is not None:
+            if "RateLimit" in type(error).__name__:
+                return True
+            message = str(error).lower()
+            if any(marker in message for marker in UpstreamHealthController.RATE_LIMIT_MARKERS):
+                return True
+            error = error.__cause__ or error.__context__
+        return False
+
+    @staticmethod
+    def should_requeue(error: BaseException) -> bool:
+        """
+        Whether work that failed with this error should be retried in a later pass.
+        """
+        return isinstance(error, CircuitOpenError) or UpstreamHealthController.is_rate_limit(error)
+
+    def seconds_until_available(self) -> float:
+        """
+        Time until new calls are accepted again (backoff pause or open circuit).
+        """
+        with self._cond:
+            now = time.monotonic()
+            waits = [self._paused_until - now]
+            if self.state == self.OPEN:
+                waits.append(self._opened_at + self.open_seconds - now)
+            return max(0.0, *waits)
+
+    def call(self, func: Callable[..., Any], *args, result_is_failure: Optional[Callable[[Any], bool]] = None, **kwargs):
+        """
+        Call the upstream under the current concurrency limit, recording the outcome.
+        :param result_is_failure: Optional check marking a returned value as a soft
+                                  failure (e.g. an empty frame for a whole batch).
+        :raises CircuitOpenError: When the circuit is open.
+        """
+        probe = self._acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._release(success=False, rate_limited=self.is_rate_limit(e), probe=probe)
+            raise
+
+        failed = bool(result_is_failure and result_is_failure(result))
+        self._release(success=not failed, rate_limited=False, probe=probe)
+        return result
+
+    def _acquire(self) -> bool:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.state == self.OPEN:
+                    if now - self._opened_at < self.open_seconds:
+                        self.stats["rejected"] += 1
+                        raise CircuitOpenError("Upstream circuit breaker is open")
+                    self.state = self.HALF_OPEN
+
+                if self.state == self.HALF_OPEN:
+                    if self._probe_in_flight:
+                        self.stats["rejected"] += 1
+                        raise CircuitOpenError("Upstream circuit breaker is half-open, waiting for the probe")
+                    self._probe_in_flight = True
+                    self._in_flight += 1
+                    return True
+
+                if now < self._paused_until:
+                    self._cond.wait(self._paused_until - now)
+                    continue
+
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    return False
+
+                self._cond.wait()
+
+    def _release(self, success: bool, rate_limited: bool, probe: bool):
+        with self._cond:
+            self._in_flight -= 1
+            self.stats["calls"] += 1
+            self._outcomes.append(success)
+
+            if probe:
+                self._probe_in_flight = False
+
+            if success:
+                self.stats["successes"] += 1
+                self._streak = 0
+                if probe:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                self._successes_since_increase += 1
+                if self._successes_since_increase >= self.increase_every and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes_since_increase = 0
+            else:
+                self.stats["failures"] += 1
+                self.stats["rate_limited"] += int(rate_limited)
+                self._streak += 1
+                self._successes_since_increase = 0
+
+                failures = self._outcomes.count(False)
+                if (
+                    probe
+                    or self._streak >= self.trip_after
+                    or (len(self._outcomes) == self._outcomes.maxlen and failures >= self.failure_ratio * len(self._outcomes))
+                ):
+                    self._trip()
+                elif rate_limited or self._streak >= 2:
+                    self._back_off()
+
+            self._cond.notify_all()
+
+    def _back_off(self):
+        self.limit = max(self.min_concurrency, self.limit // 2)
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._streak - 1))
+        self._paused_until = max(self._paused_until, time.monotonic() + backoff * random.uniform(0.5, 1.5))
+
+    def _trip(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.limit = self.min_concurrency
+        self._outcomes.clear()
+        self.stats["trips"] += 1
@@ -0,0 +1,104 @@
+from typing import List
+
+import numpy as np
+
+from stocks.dtos.dtos import TimeSeriesDTO
+
+
+class TimeSeriesDownsampler:
+    """
+    Shape-preserving downsampling of chart series, so long windows (5y = ~1,260 daily
+    points) are sent at roughly the resolution the chart can draw.
+
+    - lttb: Largest-Triangle-Three-Buckets, keeps the points that contribute most to
+      the visual shape of the line.
+    - minmax: keeps the lowest and highest point of each bucket, so every peak and
+      trough survives.
+    The first and last points are always kept and the original order is preserved.
+    """
+
+    LTTB = "lttb"
+    MINMAX = "minmax"
+    METHODS = (LTTB, MINMAX)
+
+    # Fewer points than this leave no room for min/max pairs between the end points
+    MIN_POINTS = 4
+
+    @staticmethod
+    def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+        """
+        Indices of the points selected by LTTB.
+        :param x: Ascending x values (e.g. epoch seconds).
+        :param y: Values of the series.
+        :param points: Number of points to keep.
+        """
+        n = len(y)
+        if points >= n or points < TimeSeriesDownsampler.MIN_POINTS:
+            return np.arange(n)
+
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        # The first and last points are fixed; the rest is split into points - 2 buckets
+        bucket_size = (n - 2) / (points - 2)
+        edges = (np.arange(points - 1) * bucket_size).astype(int) + 1
+        edges[-1] = n - 1
+
+        indices = np.empty(points, dtype=int)
+        indices[0], indices[-1] = 0, n - 1
+        selected = 0
+
+        for bucket in range(points - 2):
+            start, end = edges[bucket], edges[bucket + 1]
+            next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+
+            # Third vertex of the triangle: average of the next bucket (the last point for the last bucket)
+            next_x = x[end:next_end].mean()
+            next_y = y[end:next_end].mean()
+
+            areas = np.abs(
+                (x[selected] - next_x) * (y[start:end] - y[selected])
+                - (x[selected] - x[start:end]) * (next_y - y[selected])
+            )
+            selected = start + int(areas.argmax())
+            indices[bucket + 1] = selected
+
+        return indices
+
+    @staticmethod
+    def minmax_indices(y: np.ndarray, points: int) -> np.ndarray:
+        """
+        Indices of the minimum and maximum of each of points // 2 buckets, plus the
+        first and last points, in ascending order.
+        """
+        n = len(y)
+        if points >= n or points < TimeSeriesDownsampler.MIN_POINTS:
+            return np.arange(n)
+
+        y = np.asarray(y, dtype=float)
+        buckets = np.array_split(np.arange(1, n - 1), (points - 2) // 2)
+        selected = [0, n - 1]
+        for bucket in buckets:
+            if len(bucket):
+                values = y[bucket]
+                selected += [bucket[values.argmin()], bucket[values.argmax()]]
+        return np.unique(selected)
+
+    @staticmethod
+    def downsample(series: List[TimeSeriesDTO], points: int, method: str = LTTB) -> List[TimeSeriesDTO]:
+        """
+        Downsample a chronologically ordered list of TimeSeriesDTO to at most `points` items.
+        """
+        if method not in TimeSeriesDownsampler.METHODS:
+            raise ValueError(f"Invalid downsampling method '{method}'. Must be one of {set(TimeSeriesDownsampler.METHODS)}.")
+        if points >= len(series):
+            return series
+
+        y = np.fromiter((item.close_price for item in series), dtype=float, count=len(series))
+        if method == TimeSeriesDownsampler.MINMAX:
+            indices = TimeSeriesDownsampler.minmax_indices(y, points)
+        else:
+            x = np.fromiter((item.timestamp.timestamp() for item in series), dtype=float, count=len(series))
+            indices = TimeSeriesDownsampler.lttb_indices(x, y, points)
+
+        return [series[i] for i in indices.tolist()]
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List
+
+import numpy as np
+
+logger = logging.getLogger("stocks.pipeline")
+
+
+@dataclass
+class StageSpan:
+    """
+    One timed unit of work of a pipeline stage (a download, a transform, a DB write...).
+    """
+    stage: str
+    attrs: dict = field(default_factory=dict)
+    rows: int = 0
+    retries: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+
+
+class PipelineInstrumentation:
+    """
+    Collects timing spans of the market pipeline stages and summarizes them in a
+    machine-readable report, and routes progress output either to the console
+    (emoji lines, default) or to structured JSON logging.
+
+    Stages: universe (ticker list load), fetch (upstream calls), transform,
+    write (DB), rollups (weekly/monthly re-aggregation) and metrics (local
+    metrics computation).
+    """
+
+    STAGES = ("universe", "fetch", "transform", "write", "rollups", "metrics")
+
+    OUTPUT_PRINT = "print"
+    OUTPUT_LOG = "log"
+
+    _spans: List[StageSpan] = []
+    _lock = threading.Lock()
+    _output = os.environ.get("MARKET_PIPELINE_OUTPUT", OUTPUT_PRINT)
+
+    @staticmethod
+    def configure(output: str):
+        """
+        Select the progress output: "print" for console lines or "log" for JSON log records.
+        """
+        if output not in (PipelineInstrumentation.OUTPUT_PRINT, PipelineInstrumentation.OUTPUT_LOG):
+            raise ValueError(f"Invalid pipeline output '{output}'. Use 'print' or 'log'.")
+        PipelineInstrumentation._output = output
+        if output == PipelineInstrumentation.OUTPUT_LOG:
+            PipelineInstrumentation._ensure_log_handler()
+
+    @staticmethod
+    def reset():
+        with PipelineInstrumentation._lock:
+            PipelineInstrumentation._spans = []
+
+    @staticmethod
+    def progress(message: str, **fields):
+        """
+        Report pipeline progress in the configured output format.
+        """
+        if PipelineInstrumentation._output == PipelineInstrumentation.OUTPUT_LOG:
+            PipelineInstrumentation._ensure_log_handler()
+            logger.info(json.dumps({"event": message, **fields}, ensure_ascii=False, default=str))
+        else:
+            print(message)
+
+    @staticmethod
+    def _ensure_log_handler():
+        """
+        Log mode must always print: when the settings give the "stocks.pipeline" records
+        no handler, or drop INFO records, print them to stderr as bare JSON lines.
+        """
+        if logger.isEnabledFor(logging.INFO) and logger.hasHandlers():
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    @staticmethod
+    @contextmanager
+    def span(stage: str, **attrs) -> Iterator[StageSpan]:
+        """
+        Time the enclosed block as one span of `stage`. The yielded StageSpan can be
+        updated with the rows, retries and failures of the block; an exception counts
+        as a failure and is re-raised.
+        """
+        span = StageSpan(stage=stage, attrs=attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception:
+            span.failures = max(span.failures, 1)
+            raise
+        finally:
+            span.seconds = time.perf_counter() - started
+            with PipelineInstrumentation._lock:
+                PipelineInstrumentation._spans.append(span)
+
+    @staticmethod
+    def spans() -> List[StageSpan]:
+        with PipelineInstrumentation._lock:
+            return list(PipelineInstrumentation._spans)
+
+    @staticmethod
+    def report() -> dict:
+        """
+        Summarize the recorded spans per stage: span count, rows, retries, failures,
+        total busy seconds and p50/p95/max span duration.
+
+        Fetch spans run on several threads, so each stage also reports its busy time
+        divided by the largest `workers` attribute seen: the stage with the highest
+        effective seconds is reported as the bottleneck (fetch = Yahoo latency,
+        write = database).
+        """
+        by_stage: dict[str, List[StageSpan]] = {}
+        for span in PipelineInstrumentation.spans():
+            by_stage.setdefault(span.stage, []).append(span)
+
+        stages = {}
+        for stage, spans in sorted(by_stage.items(), key=lambda item: PipelineInstrumentation._stage_order(item[0])):
+            durations = np.array([span.seconds for span in spans])
+            workers = max(int(span.attrs.get("workers", 1)) for span in spans)
+            stages[stage] = {
+                "spans": len(spans),
+                "rows": sum(span.rows for span in spans),
+                "retries": sum(span.retries for span in spans),
+                "failures": sum(span.failures for span in spans),
+                "total_seconds": round(float(durations.sum()), 4),
+                "effective_seconds": round(float(durations.sum()) / workers, 4),
+                "p50_seconds": round(float(np.percentile(durations, 50)), 4),
+                "p95_seconds": round(float(np.percentile(durations, 95)), 4),
+                "max_seconds": round(float(durations.max()), 4),
+            }
+
+        bottleneck = max(stages, key=lambda stage: stages[stage]["effective_seconds"]) if stages else None
+        return {"stages": stages, "bottleneck": bottleneck}
+
+    @staticmethod
+    def _stage_order(stage: str) -> int:
+        stages = PipelineInstrumentation.STAGES
+        return stages.index(stage) if stage in stages else len(stages)
+
+
+# Shorthand used by the pipeline for its progress lines
+progress = PipelineInstrumentation.progress
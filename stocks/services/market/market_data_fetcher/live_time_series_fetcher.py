@@ -0,0 +1,79 @@
+import time
+from typing import List
+
+from django.core.cache import cache
+
+from stocks.dataclasses import AssetType, TimeSeriesData
+from stocks.services.market.concurrency.shared_upstream_budget import SharedUpstreamBudget
+from stocks.services.market.concurrency.single_flight import SingleFlight
+from stocks.services.market.market_data_fetcher.market_data_fetcher import MarketDataFetcher
+
+
+class UpstreamBudgetExhausted(RuntimeError):
+    """
+    Raised when a live fetch is over the shared upstream budget and nothing is cached.
+    """
+
+
+class LiveTimeSeriesFetcher:
+    """
+    Live time series fetches made on behalf of HTTP requests (TimeSeriesView).
+
+    - Concurrent requests for the same (ticker, period, interval) share one in-flight
+      download (SingleFlight, per process).
+    - Results are cached in the Django cache and reused for CACHE_SECONDS by every worker.
+    - All workers share one upstream budget of BUDGET_REQUESTS per BUDGET_WINDOW_SECONDS;
+      once it is spent, or when Yahoo fails, the last cached result (up to
+      STALE_SECONDS old) is served instead.
+    """
+
+    CACHE_SECONDS = 60
+    STALE_SECONDS = 6 * 60 * 60
+
+    BUDGET_REQUESTS = 60
+    BUDGET_WINDOW_SECONDS = 60
+
+    _flights = SingleFlight()
+    _budget = SharedUpstreamBudget("live_time_series", BUDGET_REQUESTS, BUDGET_WINDOW_SECONDS)
+
+    @staticmethod
+    def cache_key(ticker: str, period: str, interval: str) -> str:
+        return f"live_time_series:{ticker}:{period}:{interval}"
+
+    @staticmethod
+    def get_time_series(ticker: str, asset_type: AssetType, period: str, interval: str) -> List[TimeSeriesData]:
+        """
+        Same result as MarketDataFetcher.get_time_series, coalesced, cached and budgeted.
+        :raises UpstreamBudgetExhausted: Over budget with nothing cached for the key.
+        """
+        key = LiveTimeSeriesFetcher.cache_key(ticker, period, interval)
+
+        cached = cache.get(key)
+        if cached and time.time() - cached[0] < LiveTimeSeriesFetcher.CACHE_SECONDS:
+            return cached[1]
+
+        return LiveTimeSeriesFetcher._flights.do(
+            key, lambda: LiveTimeSeriesFetcher._fetch(key, ticker, asset_type, period, interval)
+        )
+
+    @staticmethod
+    def _fetch(key: str, ticker: str, asset_type: AssetType, period: str, interval: str) -> List[TimeSeriesData]:
+        # A flight that just finished may have refreshed the entry
+        cached = cache.get(key)
+        if cached and time.time() - cached[0] < LiveTimeSeriesFetcher.CACHE_SECONDS:
+            return cached[1]
+
+        if not LiveTimeSeriesFetcher._budget.try_acquire():
+            if cached:
+                return cached[1]
+            raise UpstreamBudgetExhausted(f"Upstream budget exhausted, no cached time series for {ticker}")
+
+        try:
+            data = MarketDataFetcher.get_time_series(ticker=ticker, asset_type=asset_type, period=period, interval=interval)
+        except Exception:
+            if cached:
+                return cached[1]
+            raise
+
+        cache.set(key, (time.time(), data), LiveTimeSeriesFetcher.STALE_SECONDS)
+        return data
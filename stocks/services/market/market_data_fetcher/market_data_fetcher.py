@@ -1,19 +1,35 @@
-from typing import List
+from typing import List, Optional
 import yfinance as yf
-from datetime import datetime
+from datetime import date, datetime
 
 import pandas as pd
 
 from stocks.dataclasses import AssetType, CurrencyMetricsData, ETFMetricsData, StockMetricsData, TimeSeriesData
+from stocks.services.market.concurrency.upstream_health import UpstreamHealthController
 from stocks.services.market.market_data_fetcher.market_data_transformer import MarketDataTransformer
+from stocks.services.market.market_data_fetcher.response_store import ResponseStore
 class MarketDataFetcher:
 
+    # Longest window needed by the metrics; shorter windows are derived from it
+    METRICS_HISTORY_PERIOD = "5y"
+
+    @staticmethod
+    def _download_window(period: str, start: Optional[date]) -> dict:
+        """
+        Build the yf.download window arguments: an explicit start date when given
+        (incremental refresh), otherwise the relative period.
+        """
+        if start is not None:
+            return {"start": start.strftime("%Y-%m-%d")}
+        return {"period": period}
+
     @staticmethod
     def get_time_series(
         ticker: str,
         asset_type: AssetType,
         period: str = "5y",
-        interval: str = "1d"
+        interval: str = "1d",
+        start: Optional[date] = None
     ) -> list[TimeSeriesData]:
         """
         Download the time series of a financial asset and return it as a list of TimeSeriesData.
@@ -23,11 +39,22 @@ class MarketDataFetcher:
         :param asset_type: Type of asset (AssetType.STOCK, AssetType.ETF, AssetType.FOREX)
         :param period: Data period (e.g., 1d, 5d, 1mo, 6mo, 1y, 5y, max)
         :param interval: Data interval (e.g., 1m, 5m, 15m, 1h, 1d, 1wk, 1mo)
+        :param start: Optional first date to download; when given it replaces period.
         :return: List of TimeSeriesData
         """
         
         try:
-            raw_data = yf.download(ticker, period=period, interval=interval, auto_adjust=False)
+            window = MarketDataFetcher._download_window(period, start)
+            raw_data = ResponseStore.fetch(
+                "download",
+                {"tickers": [ticker], "interval": interval, **window},
+                lambda: yf.download(
+                    ticker,
+                    interval=interval,
+                    auto_adjust=False,
+                    **window
+                )
+            )
 
             if raw_data.empty:
                 return []
@@ -39,37 +66,88 @@ class MarketDataFetcher:
             )
 
         except Exception as e:
-            raise RuntimeError(f"Error downloading time series for {ticker}: {e}")
+            raise RuntimeError(f"Error downloading time series for {ticker}: {e}") from e
 
     @staticmethod
-    def get_stock_metrics(ticker: str) -> StockMetricsData:
+    def download_time_series_frame(
+        tickers: List[str],
+        period: str = "5y",
+        interval: str = "1d",
+        start: Optional[date] = None
+    ) -> pd.DataFrame:
+        """
+        Download the raw multi-ticker yfinance frame (columns grouped by ticker) for several assets
+        in a single request. Use MarketDataTransformer.transform_time_series_batch to turn it into
+        one TimeSeriesBatch per symbol.
+        """
+        try:
+            window = MarketDataFetcher._download_window(period, start)
+            return ResponseStore.fetch(
+                "download_batch",
+                {"tickers": list(tickers), "interval": interval, **window},
+                lambda: yf.download(
+                    tickers,
+                    interval=interval,
+                    auto_adjust=False,
+                    group_by="ticker",
+                    threads=True,
+                    progress=False,
+                    **window
+                )
+            )
+
+        except Exception as e:
+            raise RuntimeError(f"Error downloading time series for {len(tickers)} tickers: {e}") from e
+
+    @staticmethod
+    def _metrics_history(ticker: yf.Ticker) -> pd.DataFrame:
+        """
+        Download the single daily history frame used to derive every metrics window.
+        Returns an empty frame (no changes) when the history cannot be downloaded, except
+        for upstream rate limits: those are raised so the caller's health controller can
+        back off and requeue the ticker instead of saving empty changes.
+        """
+        period = MarketDataFetcher.METRICS_HISTORY_PERIOD
+        try:
+            return ResponseStore.fetch(
+                "history",
+                {"tickers": [ticker.ticker], "period": period, "interval": "1d"},
+                lambda: ticker.history(period=period, interval="1d")
+            )
+        except Exception as e:
+            if UpstreamHealthController.is_rate_limit(e):
+                raise
+            return pd.DataFrame()
+
+    @staticmethod
+    def _info(ticker: yf.Ticker) -> dict:
+        """
+        Fetch the .info dict of a ticker through the ResponseStore.
+        """
+        return ResponseStore.fetch("info", {"tickers": [ticker.ticker]}, lambda: ticker.info)
+
+    @staticmethod
+    def get_stock_metrics(ticker: str, include_history: bool = True) -> StockMetricsData:
 
         """
         Fetch the latest stock metrics for a given ticker and return as a StockMetricsData object.
-        Calculates historical percentage changes (5d, 1mo, YTD, 5y) based on historical closing prices.
+        Calculates historical percentage changes (5d, 1mo, YTD, 5y) from a single 5y daily history.
+        With include_history=False only the info endpoint is called and the changes are left empty
+        (they can then be derived locally with MarketMetricsEngine).
         :param ticker: Stock symbol (e.g., AAPL)
+        :param include_history: Download the 5y history to compute the percentage changes.
         :return: StockMetricsData object with the metrics
         """
         
         try:
             stock = yf.Ticker(ticker)
-            info = stock.info
+            info = MarketDataFetcher._info(stock)
 
             if not info:
                 return StockMetricsData(symbol=ticker)
 
-            periods = ["5d", "1mo", "ytd", "5y"]
-            changes = {}
-
-            for period in periods:
-                try:
-                    hist = stock.history(period=period, interval="1d")
-                    if not hist.empty:
-                        first_close = hist["Close"].iloc[0]
-                        last_close = hist["Close"].iloc[-1]
-                        changes[f"change_{period}_percent"] = ((last_close - first_close) / first_close) * 100
-                except Exception:
-                    changes[f"change_{period}_percent"] = None
+            hist = MarketDataFetcher._metrics_history(stock) if include_history else pd.DataFrame()
+            changes = MarketDataTransformer.compute_period_changes(hist)
 
             return MarketDataTransformer.transform_stock_metrics(
                 symbol=ticker,
@@ -78,37 +156,30 @@ class MarketDataFetcher:
             )
 
         except Exception as e:
-            raise RuntimeError(f"Error fetching stock metrics for {ticker}: {e}")
+            raise RuntimeError(f"Error fetching stock metrics for {ticker}: {e}") from e
 
     @staticmethod
-    def get_etf_metrics(ticker: str) -> ETFMetricsData:
+    def get_etf_metrics(ticker: str, include_history: bool = True) -> ETFMetricsData:
         
         """
         Fetch the latest ETF metrics for a given ticker and return as an ETFMetricsData object.
-        Calculates historical percentage changes (5d, 1mo, YTD, 5y) based on historical closing prices.
+        Calculates historical percentage changes (5d, 1mo, YTD, 5y) from a single 5y daily history.
+        With include_history=False only the info endpoint is called and the changes are left empty
+        (they can then be derived locally with MarketMetricsEngine).
         :param ticker: ETF symbol (e.g., SPY)
+        :param include_history: Download the 5y history to compute the percentage changes.
         :return: ETFMetricsData object with the metrics
         """
         
         try:
             etf = yf.Ticker(ticker)
-            info = etf.info
+            info = MarketDataFetcher._info(etf)
 
             if not info:
                 return ETFMetricsData(symbol=ticker)
 
-            periods = ["5d", "1mo", "ytd", "5y"]
-            changes = {}
-
-            for period in periods:
-                try:
-                    hist = etf.history(period=period, interval="1d")
-                    if not hist.empty:
-                        first_close = hist["Close"].iloc[0]
-                        last_close = hist["Close"].iloc[-1]
-                        changes[f"change_{period}_percent"] = ((last_close - first_close) / first_close) * 100
-                except Exception:
-                    changes[f"change_{period}_percent"] = None
+            hist = MarketDataFetcher._metrics_history(etf) if include_history else pd.DataFrame()
+            changes = MarketDataTransformer.compute_period_changes(hist)
 
             return MarketDataTransformer.transform_etf_metrics(
                 symbol=ticker,
@@ -117,44 +188,35 @@ class MarketDataFetcher:
             )
 
         except Exception as e:
-            raise RuntimeError(f"Error fetching ETF metrics for {ticker}: {e}")
+            raise RuntimeError(f"Error fetching ETF metrics for {ticker}: {e}") from e
 
     @staticmethod
-    def get_currency_metrics(ticker: str) -> CurrencyMetricsData:
+    def get_currency_metrics(ticker: str, include_history: bool = True) -> CurrencyMetricsData:
         
         
         """
         Fetch the latest Forex metrics for a given currency ticker and return as a CurrencyMetricsData object.
-        Calculates historical percentage changes (5d, 1mo, YTD, 5y) based on historical closing prices.
+        Calculates historical percentage changes (5d, 1mo, YTD, 5y) from a single 5y daily history.
+        With include_history=False only the info endpoint is called and the changes are left empty
+        (they can then be derived locally with MarketMetricsEngine).
         :param ticker: Currency symbol (e.g., "EURUSD=X")
+        :param include_history: Download the 5y history to compute the percentage changes.
         :return: CurrencyMetricsData object with the metrics
         """
         
         try:
             fx = yf.Ticker(ticker)
-            info = fx.info
+            info = MarketDataFetcher._info(fx)
 
             if not info:
                 return CurrencyMetricsData(symbol=ticker)
 
+            hist = MarketDataFetcher._metrics_history(fx) if include_history else pd.DataFrame()
+            changes = MarketDataTransformer.compute_period_changes(hist)
+
             robust_rate = info.get("currentPrice") or info.get("regularMarketPrice")
-            if not robust_rate:
-                hist = fx.history(period="1d", interval="1d")
-                if not hist.empty:
-                    robust_rate = hist["Close"].iloc[-1]
-
-            periods = ["5d", "1mo", "ytd", "5y"]
-            changes = {}
-
-            for period in periods:
-                try:
-                    hist = fx.history(period=period, interval="1d")
-                    if not hist.empty:
-                        first_close = hist["Close"].iloc[0]
-                        last_close = hist["Close"].iloc[-1]
-                        changes[f"change_{period}_percent"] = ((last_close - first_close) / first_close) * 100
-                except Exception:
-                    changes[f"change_{period}_percent"] = None
+            if not robust_rate and not hist.empty:
+                robust_rate = float(hist["Close"].iloc[-1])
 
             return MarketDataTransformer.transform_currency_metrics(
                 symbol=ticker,
@@ -164,4 +226,4 @@ class MarketDataFetcher:
             )
 
         except Exception as e:
-            raise RuntimeError(f"Error fetching currency metrics for {ticker}: {e}")
+            raise RuntimeError(f"Error fetching currency metrics for {ticker}: {e}") from e
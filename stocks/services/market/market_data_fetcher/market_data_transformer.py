@@ -1,33 +1,168 @@
 
 
+import numpy as np
 import pandas as pd
 from typing import Optional
 
-from stocks.dataclasses import AssetType, CurrencyMetricsData, ETFMetricsData, StockMetricsData, TimeSeriesData
+from stocks.dataclasses import AssetType, CurrencyMetricsData, ETFMetricsData, StockMetricsData, TimeSeriesBatch, TimeSeriesData
 
 class MarketDataTransformer:
 
+    # OHLCV columns as named by yfinance
+    PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+    @staticmethod
+    def normalize_columns(raw_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Flatten the (Price, Ticker) or (Ticker, Price) MultiIndex columns that yfinance returns
+        for a single ticker, keeping only the price level.
+        """
+        if not isinstance(raw_data.columns, pd.MultiIndex):
+            return raw_data
+
+        price_level = next(
+            (
+                level for level in range(raw_data.columns.nlevels)
+                if "Close" in raw_data.columns.get_level_values(level)
+            ),
+            0
+        )
+        frame = raw_data.copy(deep=False)
+        frame.columns = raw_data.columns.get_level_values(price_level)
+        # Keep the first column of each price field, as the row-wise transformer did
+        return frame.loc[:, ~frame.columns.duplicated()]
+
+    @staticmethod
+    def transform_time_series_columnar(symbol: str, asset_type: AssetType, raw_data: pd.DataFrame) -> TimeSeriesBatch:
+        """
+        Convert raw yfinance DataFrame into a columnar TimeSeriesBatch: columns are normalized
+        once and whole OHLCV columns are extracted as NumPy arrays, without per-row work.
+        """
+        frame = MarketDataTransformer.normalize_columns(raw_data)
+        index = frame.index
+
+        dates = index.to_pydatetime() if isinstance(index, pd.DatetimeIndex) else np.asarray(index, dtype=object)
+
+        return TimeSeriesBatch(
+            asset_type=asset_type,
+            symbol=symbol,
+            dates=np.asarray(dates, dtype=object),
+            open_prices=frame["Open"].to_numpy(dtype=float),
+            high_prices=frame["High"].to_numpy(dtype=float),
+            low_prices=frame["Low"].to_numpy(dtype=float),
+            close_prices=frame["Close"].to_numpy(dtype=float),
+            volumes=frame["Volume"].fillna(0).to_numpy(dtype=np.int64)
+        )
+
     @staticmethod
     def transform_time_series(symbol: str, asset_type: AssetType, raw_data: pd.DataFrame) -> list[TimeSeriesData]:
         """
         Convert raw yfinance DataFrame into a list of TimeSeriesData.
+        Prefer transform_time_series_columnar when per-bar objects are not needed.
         """
-        series = []
+        return MarketDataTransformer.transform_time_series_columnar(symbol, asset_type, raw_data).to_records()
 
-        for date, row in raw_data.iterrows():
-            ts_data = TimeSeriesData(
-                asset_type=asset_type,
+    @staticmethod
+    def split_multi_ticker_frame(raw_data: pd.DataFrame, symbols: list[str]) -> dict[str, pd.DataFrame]:
+        """
+        Split a multi-ticker yfinance DataFrame into one OHLCV frame per symbol.
+        Works with both column layouts (Ticker, Price) and (Price, Ticker). Rows where
+        a symbol did not trade (NaN closes introduced by the shared date index) are dropped.
+        """
+        if not isinstance(raw_data.columns, pd.MultiIndex):
+            # Single-level columns only happen when one ticker was requested
+            return {symbols[0]: raw_data} if len(symbols) == 1 and not raw_data.empty else {}
+
+        ticker_level = next(
+            (
+                level for level in range(raw_data.columns.nlevels)
+                if set(symbols) & set(raw_data.columns.get_level_values(level))
+            ),
+            None
+        )
+        if ticker_level is None:
+            return {}
+
+        available = set(raw_data.columns.get_level_values(ticker_level))
+        frames = {}
+
+        for symbol in symbols:
+            if symbol not in available:
+                continue
+
+            frame = raw_data.xs(symbol, axis=1, level=ticker_level).dropna(subset=["Close"])
+            if not frame.empty:
+                frames[symbol] = frame
+
+        return frames
+
+    @staticmethod
+    def transform_time_series_batch(
+        raw_data: pd.DataFrame,
+        symbols: list[str],
+        asset_type: AssetType
+    ) -> dict[str, TimeSeriesBatch]:
+        """
+        Convert a multi-ticker yfinance DataFrame into columnar TimeSeriesBatch objects keyed
+        by symbol. Symbols without data are left out.
+        """
+        if raw_data is None or raw_data.empty:
+            return {}
+
+        frames = MarketDataTransformer.split_multi_ticker_frame(raw_data, symbols)
+
+        return {
+            symbol: MarketDataTransformer.transform_time_series_columnar(
                 symbol=symbol,
-                date=date.to_pydatetime() if hasattr(date, 'to_pydatetime') else date,
-                open_price=float(row["Open"].iloc[0]) if isinstance(row["Open"], pd.Series) else float(row["Open"]),
-                close_price=float(row["Close"].iloc[0]) if isinstance(row["Close"], pd.Series) else float(row["Close"]),
-                high_price=float(row["High"].iloc[0]) if isinstance(row["High"], pd.Series) else float(row["High"]),
-                low_price=float(row["Low"].iloc[0]) if isinstance(row["Low"], pd.Series) else float(row["Low"]),
-                volume=int(row["Volume"].iloc[0]) if isinstance(row["Volume"], pd.Series) else int(row["Volume"])
+                asset_type=asset_type,
+                raw_data=frame
             )
-            series.append(ts_data)
+            for symbol, frame in frames.items()
+        }
+
+    @staticmethod
+    def compute_period_changes(history: pd.DataFrame) -> dict:
+        """
+        Compute the 5d, 1mo, YTD and 5y percentage changes from a single daily history
+        frame (the 5y frame covers every shorter window). The first close of each window
+        is found with one vectorized lookup over the frame's index:
+        - 5d: the last 5 trading sessions
+        - 1mo: first session on or after one calendar month before the last session
+        - ytd: first session of the last session's year
+        - 5y: first session of the frame
+        Keys follow the yfinance period names (change_1mo_percent, ...), as expected
+        by the transform_*_metrics methods.
+        """
+        periods = ["5d", "1mo", "ytd", "5y"]
+
+        if history is None or history.empty or "Close" not in history:
+            return {}
+
+        closes = history["Close"]
+        if isinstance(closes, pd.DataFrame):
+            closes = closes.iloc[:, 0]
+        closes = closes.dropna()
+        if closes.empty:
+            return {}
+
+        index = closes.index
+        values = closes.to_numpy(dtype=float)
+        last_date = index[-1]
+
+        calendar_starts = index.searchsorted([
+            last_date - pd.DateOffset(months=1),
+            pd.Timestamp(year=last_date.year, month=1, day=1, tz=last_date.tz),
+        ])
+        positions = np.array([max(len(values) - 5, 0), calendar_starts[0], calendar_starts[1], 0])
+
+        first_closes = values[positions]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            changes = (values[-1] - first_closes) / first_closes * 100
 
-        return series
+        return {
+            f"change_{period}_percent": float(change) if np.isfinite(change) else None
+            for period, change in zip(periods, changes)
+        }
 
     @staticmethod
     def transform_stock_metrics(symbol: str, raw_info: dict, changes: dict) -> StockMetricsData:
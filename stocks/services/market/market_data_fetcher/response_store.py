@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+
+class ResponseNotRecorded(RuntimeError):
+    """
+    Raised in replay mode when a response was never recorded.
+    """
+
+
+class ResponseStore:
+    """
+    Pluggable store for raw yfinance responses, so pipeline runs and benchmarks can
+    be reproduced without Yahoo:
+
+    - passthrough: call the upstream (default, today's behavior)
+    - record: call the upstream and save the raw response (frames, .info dicts)
+    - replay: serve the saved responses with zero network access
+
+    Responses are keyed by endpoint, tickers, period, interval and window start, and
+    saved as gzip-compressed pickles under the cache directory. The mode and directory
+    come from MARKET_DATA_CACHE_MODE / MARKET_DATA_CACHE_DIR, or from configure().
+    Only replay stores you recorded yourself: pickles are trusted local data.
+    """
+
+    PASSTHROUGH = "passthrough"
+    RECORD = "record"
+    REPLAY = "replay"
+    MODES = (PASSTHROUGH, RECORD, REPLAY)
+
+    DEFAULT_DIR = "market_data_cache"
+
+    _mode: Optional[str] = None
+    _directory: Optional[Path] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def configure(mode: Optional[str] = None, directory: Optional[str] = None):
+        """
+        Select the mode and store directory; None falls back to the environment.
+        """
+        mode = mode or os.environ.get("MARKET_DATA_CACHE_MODE") or ResponseStore.PASSTHROUGH
+        if mode not in ResponseStore.MODES:
+            raise ValueError(f"Invalid response store mode '{mode}'. Use one of {', '.join(ResponseStore.MODES)}.")
+
+        with ResponseStore._lock:
+            ResponseStore._mode = mode
+            ResponseStore._directory = Path(
+                directory or os.environ.get("MARKET_DATA_CACHE_DIR") or ResponseStore.DEFAULT_DIR
+            )
+
+    @staticmethod
+    def mode() -> str:
+        if ResponseStore._mode is None:
+            ResponseStore.configure()
+        return ResponseStore._mode
+
+    @staticmethod
+    def _path(endpoint: str, key: dict) -> Path:
+        canonical = json.dumps({"endpoint": endpoint, **key}, sort_keys=True, default=str)
+        digest = hashlib.sha256(canonical.encode()).hexdigest()[:32]
+        return ResponseStore._directory / endpoint / f"{digest}.pkl.gz"
+
+    @staticmethod
+    def fetch(endpoint: str, key: dict, loader: Callable[[], Any]) -> Any:
+        """
+        Return the response of an upstream call according to the current mode.
+        :param endpoint: Upstream endpoint name (download, info, history).
+        :param key: Request parameters identifying the response (tickers, period, interval...).
+        :param loader: Performs the actual upstream call.
+        """
+        mode = ResponseStore.mode()
+        if mode == ResponseStore.PASSTHROUGH:
+            return loader()
+
+        path = ResponseStore._path(endpoint, key)
+
+        if mode == ResponseStore.REPLAY:
+            try:
+                with gzip.open(path, "rb") as f:
+                    return pickle.load(f)
+            except FileNotFoundError:
+                raise ResponseNotRecorded(f"No recorded {endpoint} response for {key} in {ResponseStore._directory}")
+
+        response = loader()
+        ResponseStore._save(path, response)
+        return response
+
+    @staticmethod
+    def _save(path: Path, response: Any):
+        # Write to a temporary file first so concurrent readers never see partial files
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                pickle.dump(response, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
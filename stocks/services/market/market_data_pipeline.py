@@ -1,242 +1,858 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import List, Optional
+
 from stocks.services.market.market_data_repository.market_data_repository import MarketDataRepository
+from stocks.services.market.market_data_repository.intraday_repository import IntradayRepository
+from stocks.services.market.market_data_repository.pipeline_progress_repository import PipelineProgressRepository
+from stocks.services.market.market_data_repository.rollup_repository import RollupRepository
+from stocks.services.market.market_data_repository.time_series_partition_repository import TimeSeriesPartitionRepository
 from stocks.services.market.market_data_fetcher.market_data_fetcher import MarketDataFetcher
 
-from stocks.dataclasses import AssetType
+from django.db import connections
+
+from stocks.dataclasses import AssetType, JobTiming, TimeSeriesSaveResult
+from stocks.models import PipelineProgress
 from stocks.services.market.market_data_provider.market_ticket_provider import MarketTickerProvider
+from stocks.services.market.market_metrics_engine.market_metrics_engine import MarketMetricsEngine
+from stocks.services.market.concurrency.concurrent_fetch_executor import ConcurrentFetchExecutor
+from stocks.services.market.concurrency.staged_pipeline import StagedPipeline
+from stocks.services.market.concurrency.upstream_budget import UpstreamBudget
+from stocks.services.market.concurrency.upstream_health import UpstreamHealthController
+from stocks.services.market.instrumentation.pipeline_instrumentation import PipelineInstrumentation, progress
+from stocks.services.market.market_data_fetcher.market_data_transformer import MarketDataTransformer
+from stocks.services.market.market_data_staging.time_series_staging import TimeSeriesStaging
 
 
 class MarketDataPipeline:
     """
     Orchestrates the full data pipeline for financial market assets.
     """
+    # Number of tickers downloaded together in a single multi-ticker request
+    DEFAULT_BATCH_SIZE = 50
+
+    # Concurrent metric fetches and shared upstream request budget (requests per second)
+    DEFAULT_WORKERS = 8
+    DEFAULT_RATE = 5.0
+
+    # Metrics rows persisted per write by the single writer
+    METRICS_WRITE_BATCH_SIZE = 100
+
+    # Days re-downloaded before the last stored bar in incremental mode, to catch revisions
+    INCREMENTAL_OVERLAP_DAYS = 5
+
+    # Extra passes over the work skipped while Yahoo was throttling or the circuit was open
+    REQUEUE_PASSES = 2
+
+    @staticmethod
+    def _plan_download_windows(
+        symbols: List[str],
+        incremental: bool,
+        overlap_days: int = INCREMENTAL_OVERLAP_DAYS
+    ) -> dict[Optional[date], List[str]]:
+        """
+        Group symbols by the first date that has to be downloaded for them.
+        The None key holds symbols that need a full backfill of the requested period
+        (every symbol when not incremental, or assets without stored bars).
+        """
+        if not incremental:
+            return {None: list(symbols)}
+
+        last_dates = MarketDataRepository.get_last_time_series_dates(symbols)
+        windows: dict[Optional[date], List[str]] = {}
+
+        for symbol in symbols:
+            last_date = last_dates.get(symbol)
+            start = last_date - timedelta(days=overlap_days) if last_date else None
+            windows.setdefault(start, []).append(symbol)
+
+        return windows
+
+    @staticmethod
+    def _load_tickers(get_tickers_func, asset_type: AssetType):
+        """
+        Load the ticker universe of an asset type as a "universe" span.
+        """
+        with PipelineInstrumentation.span("universe", asset_type=asset_type.value) as span:
+            tickers = get_tickers_func()
+            span.rows = len(tickers)
+        return tickers
+
+    @staticmethod
+    def _pending_tickers(tickers, job_id: str, asset_type: AssetType, resume: bool):
+        """
+        Drop the tickers already completed by the job in the current run window when resuming.
+        """
+        if not resume:
+            return tickers
+
+        completed = PipelineProgressRepository.get_completed_symbols(job_id, asset_type)
+        pending = [ticker for ticker in tickers if ticker.symbol not in completed]
+        progress(f"⏭️ Resuming {job_id}: skipping {len(tickers) - len(pending)} completed tickers, {len(pending)} remaining.")
+        return pending
+
+    @staticmethod
+    def _run_passes(items: list, run_pass, budget: UpstreamBudget, label: str) -> list:
+        """
+        Run run_pass(items), which returns the items it had to requeue (throttled or
+        rejected by the circuit breaker), and retry those in up to REQUEUE_PASSES later
+        passes once the upstream accepts calls again.
+        :return: Items still requeued after the last pass.
+        """
+        for pass_number in range(1, MarketDataPipeline.REQUEUE_PASSES + 2):
+            items = run_pass(items)
+            if not items or pass_number > MarketDataPipeline.REQUEUE_PASSES:
+                break
+
+            wait = budget.health.seconds_until_available()
+            progress(f"🔁 Requeued {len(items)} {label} for pass {pass_number + 1}, resuming in {wait:.0f}s",
+                     requeued=len(items), next_pass=pass_number + 1)
+            time.sleep(wait)
+
+        return items
+
+    @staticmethod
+    def _record_progress(job_id: str, asset_type: AssetType, entries):
+        try:
+            PipelineProgressRepository.record(job_id, asset_type, entries)
+        except Exception as e:
+            progress(f"⚠️ Could not record progress for {job_id}: {e}")
+
+    @staticmethod
+    def _refresh_rollups(touched: dict, asset_type: AssetType, job: str):
+        """
+        Re-aggregate the weekly and monthly rollup buckets containing the written bars.
+        A failure only leaves those buckets stale until the next write or a rebuild.
+        """
+        if not touched:
+            return
+        try:
+            with PipelineInstrumentation.span("rollups", asset_type=asset_type.value, job=job) as span:
+                span.rows = RollupRepository.refresh(touched)
+        except Exception as e:
+            progress(f"⚠️ Could not refresh the rollups of {len(touched)} assets: {e}")
+
     # --- MÉTODO GENÉRICO PARA REDUCIR DUPLICIDAD ---
     @staticmethod
     def _update_time_series_for_asset_type(
         asset_type: AssetType,
         get_tickers_func,
         period: str,
-        interval: str
+        interval: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        incremental: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        budget: Optional[UpstreamBudget] = None,
+        stage_dir: Optional[str] = None
     ):
         """
         Generic handler for updating time series data for a given asset type.
+        Runs as a StagedPipeline: multi-ticker downloads (workers threads), transformation
+        and batched DB writes overlap, connected by bounded queues.
         :param asset_type: AssetType (STOCK, ETF, CURRENCY)
         :param get_tickers_func: Function to fetch list of tickers for that asset type.
         :param period: Time period for historical data.
-        :param interval: Data interval (1d, 1wk, etc.)
+        :param interval: Data interval (1d, 1wk, etc.). Intraday intervals (15m, 1h) are
+                         stored as IntradayBar rows instead of TimeSeries.
+        :param batch_size: Tickers downloaded per multi-ticker request (1 = one request per ticker).
+        :param incremental: Only download bars after the last stored one (plus a small overlap);
+                            assets without stored bars are backfilled with the full period.
+        :param workers: Number of concurrent download threads.
+        :param rate: Maximum upstream requests per second (one per ticker, 0 = unlimited).
+        :param resume: Skip the tickers already completed in the current run window.
+        :param budget: Upstream budget shared with concurrently running jobs; replaces
+                       the job's own rate limit and health controller.
+        :param stage_dir: Stage the bars as partitioned Parquet files under this directory
+                          instead of writing them to the database (see load_staged_time_series).
         """
-        print(f"🚀 Starting {asset_type.value.lower()} time series update | Period={period}, Interval={interval}")
-
-        tickers = get_tickers_func()
-        print(f"📊 Found {len(tickers)} {asset_type.value}s to process.")
+        intraday = interval in IntradayRepository.PERIODS
+        if intraday and stage_dir:
+            raise ValueError("Intraday bars cannot be staged, only daily time series.")
+        # Intraday refreshes always download their (short) period
+        incremental = incremental and not intraday
+
+        budget = budget or UpstreamBudget(rate, workers)
+        mode = "incremental" if incremental else "full"
+        progress(f"🚀 Starting {asset_type.value.lower()} time series update | Period={period}, Interval={interval}, Batch size={batch_size}, Mode={mode}, Workers={workers}")
+
+        job_id = PipelineProgressRepository.time_series_job_id(period, interval)
+        if stage_dir:
+            job_id = f"staged:{job_id}"
+        tickers = MarketDataPipeline._pending_tickers(
+            MarketDataPipeline._load_tickers(get_tickers_func, asset_type), job_id, asset_type, resume
+        )
+        progress(f"📊 Found {len(tickers)} {asset_type.value}s to process.")
 
         processed, failed = 0, 0
+        inserted, updated, unchanged = 0, 0, 0
+        batch_size = max(1, batch_size)
 
-        for ticker in tickers:
-            try:
-                print(f"🔹 Fetching time series for {ticker.symbol} ...")
-
-                time_series = MarketDataFetcher.get_time_series(
-                    ticker=ticker.symbol,
-                    asset_type=asset_type,
-                    period=period,
-                    interval=interval
-                )
+        windows = MarketDataPipeline._plan_download_windows(
+            [ticker.symbol for ticker in tickers],
+            incremental=incremental
+        )
+        chunks = [
+            (window_start, window_symbols[start:start + batch_size])
+            for window_start, window_symbols in windows.items()
+            for start in range(0, len(window_symbols), batch_size)
+        ]
+
+        # Time each chunk has been in flight, used as the per-ticker duration checkpoint
+        started_at = {}
+        requeued = []
+        # Chunks already fetched in an earlier pass: fetching them again is a retry
+        attempted = set()
+
+        # A whole batch coming back empty is how yf.download reports throttling
+        download = budget.bounded(
+            MarketDataFetcher.download_time_series_frame,
+            result_is_failure=lambda frame: frame.empty
+        )
 
-                if not time_series:
-                    print(f"⚠️ No data returned for {ticker.symbol}")
+        def fetch(chunk):
+            window_start, symbols = chunk
+            started_at[id(chunk)] = time.perf_counter()
+            window_label = f"since {window_start}" if window_start else f"period {period}"
+            progress(f"🔹 Fetching time series for {len(symbols)} tickers ({symbols[0]} ... {symbols[-1]}), {window_label} ...")
+            with PipelineInstrumentation.span(
+                "fetch", asset_type=asset_type.value, job="time_series", tickers=len(symbols), workers=workers
+            ) as span:
+                span.retries = 1 if id(chunk) in attempted else 0
+                attempted.add(id(chunk))
+                try:
+                    raw_data = download(symbols, period, interval, window_start)
+                except Exception:
+                    span.failures = len(symbols)
+                    raise
+                span.rows = len(raw_data)
+            return raw_data
+
+        def transform(chunk, raw_data):
+            _, symbols = chunk
+            with PipelineInstrumentation.span("transform", asset_type=asset_type.value, job="time_series") as span:
+                series_by_symbol = MarketDataTransformer.transform_time_series_batch(raw_data, symbols, asset_type)
+                span.rows = sum(len(batch) for batch in series_by_symbol.values())
+                # Tickers that came back without data
+                span.failures = sum(1 for symbol in symbols if not series_by_symbol.get(symbol))
+            started = started_at.pop(id(chunk), time.perf_counter())
+            return [(symbol, series_by_symbol.get(symbol), started) for symbol in symbols]
+
+        def on_error(chunk, error):
+            _, symbols = chunk
+            started = started_at.pop(id(chunk), time.perf_counter())
+            if UpstreamHealthController.should_requeue(error):
+                requeued.append(chunk)
+                return []
+
+            progress(f"❌ Error fetching batch {symbols[0]} ... {symbols[-1]}: {error}")
+            return [(symbol, None, started) for symbol in symbols]
+
+        def write(units):
+            nonlocal processed, failed, inserted, updated, unchanged
+            batches, stored, checkpoints = [], [], []
+            for symbol, batch, started in units:
+                if not batch:
+                    progress(f"⚠️ No data returned for {symbol}")
                     failed += 1
+                    checkpoints.append((symbol, PipelineProgress.STATUS_FAILED, 0, time.perf_counter() - started))
                     continue
+                batches.append(batch)
+                stored.append((symbol, len(batch), started))
 
-                MarketDataRepository.save_time_series(time_series)
-                print(f"✅ Stored {len(time_series)} entries for {ticker.symbol}")
-                processed += 1
-
+            try:
+                with PipelineInstrumentation.span("write", asset_type=asset_type.value, job="time_series") as span:
+                    if stage_dir:
+                        saved = TimeSeriesSaveResult(inserted=TimeSeriesStaging.write_batches(stage_dir, batches))
+                    elif intraday:
+                        saved = IntradayRepository.save_batches(interval, batches)
+                    else:
+                        saved = MarketDataRepository.save_time_series_batches(batches)
+                    span.rows = saved.total
+                MarketDataPipeline._refresh_rollups(saved.touched, asset_type, job="time_series")
             except Exception as e:
-                print(f"❌ Error processing {ticker.symbol}: {e}")
-                failed += 1
-
-        print(f"📈 {asset_type.value} time series update completed: {processed} succeeded, {failed} failed.")
+                progress(f"❌ Error storing {len(stored)} tickers ({', '.join(symbol for symbol, _, _ in stored)}): {e}")
+                failed += len(stored)
+                checkpoints += [(symbol, PipelineProgress.STATUS_FAILED, 0, time.perf_counter() - started) for symbol, _, started in stored]
+                MarketDataPipeline._record_progress(job_id, asset_type, checkpoints)
+                return
+
+            progress(f"✅ Stored {saved.total} entries for {len(stored)} tickers ({saved.inserted} inserted, {saved.updated} updated, {saved.unchanged} unchanged)")
+            processed += len(stored)
+            inserted += saved.inserted
+            updated += saved.updated
+            unchanged += saved.unchanged
+            checkpoints += [(symbol, PipelineProgress.STATUS_COMPLETED, rows, time.perf_counter() - started) for symbol, rows, started in stored]
+            MarketDataPipeline._record_progress(job_id, asset_type, checkpoints)
+
+        def run_pass(pass_chunks):
+            requeued.clear()
+            pipeline = StagedPipeline(
+                fetch_func=fetch,
+                transform_func=transform,
+                write_func=write,
+                fetch_workers=workers,
+                write_batch_size=MarketDataRepository.TIME_SERIES_CHUNK_SIZE,
+                unit_size=lambda unit: len(unit[1] or ()),
+                on_error=on_error,
+                rate_limiter=budget.rate_limiter,
+                item_cost=lambda chunk: len(chunk[1])
+            )
+            stats = pipeline.run(pass_chunks)
+
+            for stage in stats.values():
+                progress(f"⏱️ {stage.summary()}")
+            return list(requeued)
+
+        skipped = MarketDataPipeline._run_passes(chunks, run_pass, budget, "batches")
+        if skipped:
+            skipped_symbols = [symbol for _, symbols in skipped for symbol in symbols]
+            progress(f"⛔ Upstream unavailable, giving up on {len(skipped_symbols)} tickers (retry them with --resume)")
+            failed += len(skipped_symbols)
+            MarketDataPipeline._record_progress(
+                job_id, asset_type, [(symbol, PipelineProgress.STATUS_FAILED, 0, 0.0) for symbol in skipped_symbols]
+            )
+
+        progress(f"📈 {asset_type.value} time series update completed: {processed} succeeded, {failed} failed, {inserted} rows inserted, {updated} rows updated, {unchanged} rows unchanged.",
+                 job="time_series", asset_type=asset_type.value, succeeded=processed, failed=failed,
+                 inserted=inserted, updated=updated, unchanged=unchanged)
 
 
     # --- ESPECÍFICOS DE CADA TIPO DE ACTIVO ---
     @staticmethod
-    def update_stock_time_series(period: str = "5y", interval: str = "1d"):
+    def update_stock_time_series(
+        period: str = "5y",
+        interval: str = "1d",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        incremental: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        budget: Optional[UpstreamBudget] = None,
+        stage_dir: Optional[str] = None
+    ):
         MarketDataPipeline._update_time_series_for_asset_type(
             asset_type=AssetType.STOCK,
             get_tickers_func=MarketTickerProvider.get_sp500_tickers,
             period=period,
-            interval=interval
+            interval=interval,
+            batch_size=batch_size,
+            incremental=incremental,
+            workers=workers,
+            rate=rate,
+            resume=resume,
+            budget=budget,
+            stage_dir=stage_dir
         )
 
     @staticmethod
-    def update_etf_time_series(period: str = "5y", interval: str = "1d"):
+    def update_etf_time_series(
+        period: str = "5y",
+        interval: str = "1d",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        incremental: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        budget: Optional[UpstreamBudget] = None,
+        stage_dir: Optional[str] = None
+    ):
         MarketDataPipeline._update_time_series_for_asset_type(
             asset_type=AssetType.ETF,
             get_tickers_func=MarketTickerProvider.get_etf_tickers,
             period=period,
-            interval=interval
+            interval=interval,
+            batch_size=batch_size,
+            incremental=incremental,
+            workers=workers,
+            rate=rate,
+            resume=resume,
+            budget=budget,
+            stage_dir=stage_dir
         )
 
     @staticmethod
-    def update_currency_time_series(period: str = "5y", interval: str = "1d"):
+    def update_currency_time_series(
+        period: str = "5y",
+        interval: str = "1d",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        incremental: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        budget: Optional[UpstreamBudget] = None,
+        stage_dir: Optional[str] = None
+    ):
         MarketDataPipeline._update_time_series_for_asset_type(
             asset_type=AssetType.FOREX,
             get_tickers_func=MarketTickerProvider.get_currency_tickers,
             period=period,
-            interval=interval
+            interval=interval,
+            batch_size=batch_size,
+            incremental=incremental,
+            workers=workers,
+            rate=rate,
+            resume=resume,
+            budget=budget,
+            stage_dir=stage_dir
         )
 
 
     @staticmethod
-    def update_stock_metrics():
+    def _update_metrics_for_asset_type(
+        asset_type: AssetType,
+        get_tickers_func,
+        fetch_func,
+        label: str,
+        local_changes: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        budget: Optional[UpstreamBudget] = None
+    ):
         """
-        Fetch and store the latest metrics for all S&P 500 stocks.
+        Generic handler for updating the metrics of a given asset type.
+        Tickers are fetched concurrently on a bounded thread pool throttled by a shared
+        token bucket; results are funnelled back to this thread, which is the single
+        writer and persists them in batches. Tickers throttled by Yahoo or rejected by
+        the circuit breaker are requeued for up to REQUEUE_PASSES later passes.
+        :param asset_type: AssetType (STOCK, ETF, FOREX)
+        :param get_tickers_func: Function to fetch list of tickers for that asset type.
+        :param fetch_func: MarketDataFetcher method returning the metrics of one ticker.
+        :param label: Human readable asset label used in progress messages.
+        :param local_changes: Derive the window changes from stored TimeSeries and only call
+                              Yahoo for the fields that cannot be derived (P/E, EPS, market cap...).
+        :param workers: Number of concurrent fetch threads.
+        :param rate: Maximum upstream requests per second shared by all workers (0 = unlimited).
+        :param resume: Skip the tickers already completed in the current run window.
+        :param budget: Upstream budget shared with concurrently running jobs; replaces
+                       the job's own rate limit and health controller.
         """
-        print("🚀 Starting stock metrics update for S&P 500...")
+        budget = budget or UpstreamBudget(rate, workers)
+        progress(f"🚀 Starting {label} metrics update | Workers={workers}, Rate={rate}/s")
 
-        tickers = MarketTickerProvider.get_sp500_tickers()
-        print(f"📊 Found {len(tickers)} tickers to process.")
+        job_id = PipelineProgressRepository.metrics_job_id(local_changes)
+        tickers = MarketDataPipeline._pending_tickers(
+            MarketDataPipeline._load_tickers(get_tickers_func, asset_type), job_id, asset_type, resume
+        )
+        progress(f"📊 Found {len(tickers)} {label} tickers to process.")
 
-        processed, failed = 0, 0
+        # Window changes derived from stored TimeSeries instead of downloading history
+        derived = {}
+        if local_changes:
+            with PipelineInstrumentation.span("metrics", asset_type=asset_type.value) as span:
+                derived = MarketMetricsEngine.compute([t.symbol for t in tickers])
+                span.rows = len(derived)
 
-        # 2️⃣ Recorrer cada ticker
-        for ticker in tickers:
-            try:
-                print(f"🔹 Fetching metrics for {ticker.symbol} ...")
+        executor = ConcurrentFetchExecutor(workers, budget.rate_limiter)
+        upstream_fetch = budget.bounded(fetch_func)
+        processed, failed = 0, 0
+        pending, durations, checkpoints = [], [], []
+
+        def flush():
+            nonlocal processed, failed
+            if pending:
+                try:
+                    with PipelineInstrumentation.span("write", asset_type=asset_type.value, job="metrics") as span:
+                        span.rows = MarketDataRepository.save_metrics_batch(asset_type, pending)
+                    processed += len(pending)
+                    status = PipelineProgress.STATUS_COMPLETED
+                except Exception as e:
+                    progress(f"❌ Error storing {len(pending)} {label} metrics: {e}")
+                    failed += len(pending)
+                    status = PipelineProgress.STATUS_FAILED
+                checkpoints.extend(
+                    (metrics.symbol, status, 1 if status == PipelineProgress.STATUS_COMPLETED else 0, duration)
+                    for metrics, duration in zip(pending, durations)
+                )
+            MarketDataPipeline._record_progress(job_id, asset_type, checkpoints)
+            pending.clear()
+            durations.clear()
+            checkpoints.clear()
+
+        # Tickers already fetched in an earlier pass: fetching them again is a retry
+        attempted = set()
+
+        def fetch(ticker):
+            started = time.perf_counter()
+            with PipelineInstrumentation.span(
+                "fetch", asset_type=asset_type.value, job="metrics", tickers=1, workers=workers
+            ) as span:
+                span.retries = 1 if ticker.symbol in attempted else 0
+                attempted.add(ticker.symbol)
+                metrics = upstream_fetch(ticker.symbol, include_history=not local_changes)
+                span.rows = 1 if metrics else 0
+                span.failures = 0 if metrics else 1
+            return metrics, time.perf_counter() - started
+
+        def run_pass(pass_tickers):
+            nonlocal failed
+            requeued = []
+            results = executor.map(
+                fetch,
+                pass_tickers,
+                # .info, plus the 5y history when the changes are not derived locally
+                cost=1 if local_changes else 2
+            )
+
+            for ticker, result, error in results:
+                if error and UpstreamHealthController.should_requeue(error):
+                    requeued.append(ticker)
+                    continue
 
-                # Obtener métricas del ticker
-                metrics = MarketDataFetcher.get_stock_metrics(ticker.symbol)
+                if error:
+                    progress(f"❌ Error processing {label} {ticker.symbol}: {error}")
+                    failed += 1
+                    checkpoints.append((ticker.symbol, PipelineProgress.STATUS_FAILED, 0, 0.0))
+                    continue
 
+                metrics, duration = result
                 if not metrics:
-                    print(f"⚠️ No metrics returned for {ticker.symbol}")
+                    progress(f"⚠️ No metrics returned for {ticker.symbol}")
                     failed += 1
+                    checkpoints.append((ticker.symbol, PipelineProgress.STATUS_FAILED, 0, duration))
                     continue
 
-                # Guardar métricas en la base de datos
-                MarketDataRepository.save_stock_metrics(metrics)
+                pending.append(MarketMetricsEngine.apply(metrics, derived.get(ticker.symbol)))
+                durations.append(duration)
+                progress(f"✅ Fetched metrics for {label} {ticker.symbol}")
 
-                print(f"✅ Stored metrics for {ticker.symbol}")
-                processed += 1
+                if len(pending) >= MarketDataPipeline.METRICS_WRITE_BATCH_SIZE:
+                    flush()
 
-            except Exception as e:
-                print(f"❌ Error processing {ticker.symbol}: {e}")
-                failed += 1
+            flush()
+            return requeued
+
+        skipped = MarketDataPipeline._run_passes(tickers, run_pass, budget, f"{label} tickers")
+        if skipped:
+            progress(f"⛔ Upstream unavailable, giving up on {len(skipped)} {label} tickers (retry them with --resume)")
+            failed += len(skipped)
+            MarketDataPipeline._record_progress(
+                job_id, asset_type, [(ticker.symbol, PipelineProgress.STATUS_FAILED, 0, 0.0) for ticker in skipped]
+            )
 
-        print(f"📈 Stock metrics update completed: {processed} succeeded, {failed} failed.")
+        progress(f"📈 {label} metrics update completed: {processed} succeeded, {failed} failed.",
+                 job="metrics", asset_type=asset_type.value, succeeded=processed, failed=failed)
 
     @staticmethod
-    def update_etf_metrics():
+    def update_stock_metrics(
+        local_changes: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        budget: Optional[UpstreamBudget] = None
+    ):
         """
-        Fetch and store the latest metrics for all predefined ETFs.
+        Fetch and store the latest metrics for all S&P 500 stocks.
         """
-        print("🚀 Starting ETF metrics update...")
-
-        # 1️⃣ Obtener los tickers de ETFs predefinidos
-        tickers = MarketTickerProvider.get_etf_tickers()
-        print(f"📊 Found {len(tickers)} ETF tickers to process.")
-
-        processed, failed = 0, 0
-
-        # 2️⃣ Recorrer cada ETF
-        for ticker in tickers:
-            try:
-                print(f"🔹 Fetching metrics for ETF {ticker.symbol} ...")
-
-                # Obtener métricas del ETF
-                metrics = MarketDataFetcher.get_etf_metrics(ticker.symbol)
-
-                if not metrics:
-                    print(f"⚠️ No metrics returned for {ticker.symbol}")
-                    failed += 1
-                    continue
-
-                # Guardar métricas del ETF
-                MarketDataRepository.save_etf_metrics(metrics)
-
-                print(f"✅ Stored metrics for ETF {ticker.symbol}")
-                processed += 1
-
-            except Exception as e:
-                print(f"❌ Error processing ETF {ticker.symbol}: {e}")
-                failed += 1
+        MarketDataPipeline._update_metrics_for_asset_type(
+            asset_type=AssetType.STOCK,
+            get_tickers_func=MarketTickerProvider.get_sp500_tickers,
+            fetch_func=MarketDataFetcher.get_stock_metrics,
+            label="stock",
+            local_changes=local_changes,
+            workers=workers,
+            rate=rate,
+            resume=resume,
+            budget=budget
+        )
 
-        print(f"📈 ETF metrics update completed: {processed} succeeded, {failed} failed.")
+    @staticmethod
+    def update_etf_metrics(
+        local_changes: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        budget: Optional[UpstreamBudget] = None
+    ):
+        """
+        Fetch and store the latest metrics for all predefined ETFs.
+        """
+        MarketDataPipeline._update_metrics_for_asset_type(
+            asset_type=AssetType.ETF,
+            get_tickers_func=MarketTickerProvider.get_etf_tickers,
+            fetch_func=MarketDataFetcher.get_etf_metrics,
+            label="ETF",
+            local_changes=local_changes,
+            workers=workers,
+            rate=rate,
+            resume=resume,
+            budget=budget
+        )
 
-    
     @staticmethod
-    def update_currency_metrics():
+    def update_currency_metrics(
+        local_changes: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        budget: Optional[UpstreamBudget] = None
+    ):
         """
         Fetch and store the latest metrics for all predefined currency pairs.
         """
-        print("🚀 Starting currency metrics update...")
-
-        # 1️⃣ Obtener tickers de pares de divisas (Forex)
-        tickers = MarketTickerProvider.get_currency_tickers()
-        print(f"📊 Found {len(tickers)} currency tickers to process.")
+        MarketDataPipeline._update_metrics_for_asset_type(
+            asset_type=AssetType.FOREX,
+            get_tickers_func=MarketTickerProvider.get_currency_tickers,
+            fetch_func=MarketDataFetcher.get_currency_metrics,
+            label="currency",
+            local_changes=local_changes,
+            workers=workers,
+            rate=rate,
+            resume=resume,
+            budget=budget
+        )
 
-        processed, failed = 0, 0
+    @staticmethod
+    def update_intraday_bars(
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        budget: Optional[UpstreamBudget] = None
+    ):
+        """
+        Refresh the stored intraday bars (15m for the 1d chart, 1h for the 5d chart) of
+        every asset type and purge the bars older than each interval's retention window.
+        Meant to run every few minutes during market hours, so TimeSeriesView can serve
+        the 1d and 5d periods from the database.
+        """
+        budget = budget or UpstreamBudget(rate, workers)
+        universes = [
+            (AssetType.STOCK, MarketTickerProvider.get_sp500_tickers),
+            (AssetType.ETF, MarketTickerProvider.get_etf_tickers),
+            (AssetType.FOREX, MarketTickerProvider.get_currency_tickers),
+        ]
+
+        for interval, period in IntradayRepository.PERIODS.items():
+            for asset_type, get_tickers_func in universes:
+                MarketDataPipeline._update_time_series_for_asset_type(
+                    asset_type=asset_type,
+                    get_tickers_func=get_tickers_func,
+                    period=period,
+                    interval=interval,
+                    batch_size=batch_size,
+                    workers=workers,
+                    rate=rate,
+                    budget=budget
+                )
 
-        # 2️⃣ Recorrer cada par de divisas
-        for ticker in tickers:
-            try:
-                print(f"🔹 Fetching metrics for currency pair {ticker.symbol} ...")
+            deleted = IntradayRepository.purge_expired(interval)
+            progress(f"🧹 Removed {deleted} {interval} bars older than {IntradayRepository.RETENTION_DAYS[interval]} days.",
+                     job="intraday", interval=interval, deleted=deleted)
 
-                # Obtener métricas de la divisa
-                metrics = MarketDataFetcher.get_currency_metrics(ticker.symbol)
+    @staticmethod
+    def rebuild_rollups():
+        """
+        Recompute the weekly and monthly rollups of every asset from the stored daily
+        bars (needed once for the data stored before rollups existed).
+        """
+        progress("🚀 Rebuilding weekly and monthly time series rollups...")
+        with PipelineInstrumentation.span("rollups", job="rebuild_rollups") as span:
+            span.rows = RollupRepository.rebuild()
+        progress(f"📈 Rollups rebuilt: {span.rows} rows written.", job="rebuild_rollups", written=span.rows)
 
-                if not metrics:
-                    print(f"⚠️ No metrics returned for {ticker.symbol}")
-                    failed += 1
-                    continue
+    @staticmethod
+    def load_staged_time_series(
+        stage_dir: str,
+        asset_type: Optional[AssetType] = None,
+        since: Optional[date] = None,
+        workers: int = 1
+    ) -> TimeSeriesSaveResult:
+        """
+        Bulk-load the time series staged under stage_dir into TimeSeries, one
+        (asset type, month) partition at a time with COPY. Loads are idempotent, so the
+        same staging directory can be loaded again or into another database.
+        :param stage_dir: Staging directory written by the time series jobs.
+        :param asset_type: Only load this asset type (default: all).
+        :param since: Only load the partitions of this month and later.
+        :param workers: Partitions loaded in parallel, each on its own DB connection.
+        """
+        partitions = TimeSeriesStaging.partitions(stage_dir, asset_type, since)
+        progress(f"🚀 Loading {len(partitions)} staged time series partitions from {stage_dir} | Workers={workers}")
+
+        total = TimeSeriesSaveResult()
+
+        def load(partition):
+            partition_type, month = partition
+            with PipelineInstrumentation.span("write", asset_type=partition_type.value, job="load_staged") as span:
+                frame = TimeSeriesStaging.read_partition(stage_dir, partition_type, month)
+                saved = MarketDataRepository.copy_time_series(partition_type, frame)
+                span.rows = saved.total
+            MarketDataPipeline._refresh_rollups(saved.touched, partition_type, job="load_staged")
+            return saved
+
+        def loaded(partition, saved):
+            partition_type, month = partition
+            total.inserted += saved.inserted
+            total.updated += saved.updated
+            total.unchanged += saved.unchanged
+            progress(f"✅ Loaded {partition_type.value} {month}: {saved.inserted} inserted, {saved.updated} updated, {saved.unchanged} unchanged")
+
+        if workers <= 1:
+            for partition in partitions:
+                loaded(partition, load(partition))
+        else:
+            def load_on_own_connection(partition):
+                try:
+                    return load(partition)
+                finally:
+                    connections.close_all()
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for partition, saved in zip(partitions, pool.map(load_on_own_connection, partitions)):
+                    loaded(partition, saved)
+
+        progress(f"📈 Staged time series load completed: {total.inserted} rows inserted, {total.updated} rows updated, {total.unchanged} rows unchanged.",
+                 job="load_staged", inserted=total.inserted, updated=total.updated, unchanged=total.unchanged)
+        return total
 
-                # Guardar métricas de la divisa
-                MarketDataRepository.save_currency_metrics(metrics)
+    @staticmethod
+    def update_metrics_from_time_series():
+        """
+        Recompute the derived metrics (window changes and 52-week range) of every asset
+        type from the stored TimeSeries and bulk-write them, without any upstream call.
+        """
+        progress("🚀 Starting derived metrics update from stored time series...")
 
-                print(f"✅ Stored metrics for currency pair {ticker.symbol}")
-                processed += 1
+        for asset_type, get_tickers_func in (
+            (AssetType.STOCK, MarketTickerProvider.get_sp500_tickers),
+            (AssetType.ETF, MarketTickerProvider.get_etf_tickers),
+            (AssetType.FOREX, MarketTickerProvider.get_currency_tickers),
+        ):
+            try:
+                tickers = MarketDataPipeline._load_tickers(get_tickers_func, asset_type)
+                with PipelineInstrumentation.span("metrics", asset_type=asset_type.value) as span:
+                    derived = MarketMetricsEngine.compute([t.symbol for t in tickers])
+                    span.rows = len(derived)
+                with PipelineInstrumentation.span("write", asset_type=asset_type.value, job="derived_metrics") as span:
+                    written = span.rows = MarketDataRepository.save_derived_metrics(asset_type, list(derived.values()))
+                progress(f"✅ Stored derived metrics for {written}/{len(tickers)} {asset_type.value}s")
 
             except Exception as e:
-                print(f"❌ Error processing currency pair {ticker.symbol}: {e}")
-                failed += 1
+                progress(f"❌ Error deriving {asset_type.value} metrics: {e}")
 
-        print(f"📈 Currency metrics update completed: {processed} succeeded, {failed} failed.")
-        
+        progress("📈 Derived metrics update completed.")
 
     @staticmethod
-    def run_all(period: str = "5y", interval: str = "1d"):
+    def _run_job_chain(asset_type: AssetType, jobs, run_started: float) -> List[JobTiming]:
         """
-        Execute the full market data pipeline for all asset types:
-        updates both time series and metrics data for stocks, ETFs, and currencies.
+        Run the jobs of one asset type in order on the current thread.
+        A failing job is reported and does not stop the rest of the chain.
         """
-        print("🚀 Starting full Market Data Pipeline execution...")
-        print(f"🕒 Configuration: Period={period}, Interval={interval}")
-        print("-" * 80)
-
+        timings = []
         try:
-            # --- SERIES TEMPORALES ---
-            print("\n📘 Updating STOCK time series...")
-            MarketDataPipeline.update_stock_time_series(period, interval)
-
-            print("\n📗 Updating ETF time series...")
-            MarketDataPipeline.update_etf_time_series(period, interval)
-
-            print("\n📙 Updating CURRENCY time series...")
-            MarketDataPipeline.update_currency_time_series(period, interval)
-
-            # --- MÉTRICAS ---
-            print("\n📈 Updating STOCK metrics...")
-            MarketDataPipeline.update_stock_metrics()
-
-            print("\n💹 Updating ETF metrics...")
-            MarketDataPipeline.update_etf_metrics()
-
-            print("\n💱 Updating CURRENCY metrics...")
-            MarketDataPipeline.update_currency_metrics()
+            for name, job in jobs:
+                started = time.perf_counter()
+                succeeded = True
+                try:
+                    job()
+                except Exception as e:
+                    progress(f"❌ {name} failed due to unexpected error: {e}")
+                    succeeded = False
+                timings.append(JobTiming(
+                    name=name,
+                    asset_type=asset_type,
+                    started_at=started - run_started,
+                    seconds=time.perf_counter() - started,
+                    succeeded=succeeded
+                ))
+        finally:
+            # Each chain thread owns its DB connection
+            connections.close_all()
+        return timings
 
-            print("\n✅ All market data successfully updated!")
+    @staticmethod
+    def run_all(
+        period: str = "5y",
+        interval: str = "1d",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        incremental: bool = False,
+        local_changes: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        resume: bool = False,
+        stage_dir: Optional[str] = None
+    ) -> List[JobTiming]:
+        """
+        Execute the full market data pipeline for all asset types:
+        updates both time series and metrics data for stocks, ETFs, and currencies.
+        The asset types share no data, so each one runs as its own chain (time series,
+        then metrics) and the three chains run concurrently under one global upstream
+        budget: `rate` requests per second and `workers` requests in flight overall.
+        A type's metrics start as soon as its own time series are stored, so the small
+        ETF and currency jobs no longer wait behind the stock universe.
+        Every job checkpoints each ticker, so with resume=True an interrupted run only
+        redoes the tickers that failed or were not reached in the current run window.
+        With stage_dir the time series are staged as Parquet instead of stored.
+        :return: Per-job timings.
+        """
+        progress("🚀 Starting full Market Data Pipeline execution...")
+        progress(f"🕒 Configuration: Period={period}, Interval={interval}, Batch size={batch_size}, Incremental={incremental}, Local changes={local_changes}, Workers={workers}, Rate={rate}/s, Resume={resume}, Stage dir={stage_dir}")
+        progress("-" * 80)
 
-        except Exception as e:
-            print(f"\n❌ Pipeline failed due to unexpected error: {e}")
+        # Make sure this year's and next year's partitions exist before writing bars
+        if not stage_dir:
+            today = date.today()
+            try:
+                created = TimeSeriesPartitionRepository.ensure_partitions(today, date(today.year + 1, 1, 1))
+                if created:
+                    progress(f"🧱 Created time series partitions: {', '.join(created)}")
+            except Exception as e:
+                # Bars without a partition still land in the default partition
+                progress(f"⚠️ Could not create the time series partitions: {e}")
 
-        print("-" * 80)
-        print("🏁 Market Data Pipeline completed.")
+        budget = UpstreamBudget(rate, workers)
+        time_series_args = dict(
+            period=period, interval=interval, batch_size=batch_size, incremental=incremental,
+            workers=workers, rate=rate, resume=resume, budget=budget, stage_dir=stage_dir
+        )
+        metrics_args = dict(local_changes=local_changes, workers=workers, rate=rate, resume=resume, budget=budget)
+
+        chains = {
+            AssetType.STOCK: [
+                ("📘 STOCK time series", lambda: MarketDataPipeline.update_stock_time_series(**time_series_args)),
+                ("📈 STOCK metrics", lambda: MarketDataPipeline.update_stock_metrics(**metrics_args)),
+            ],
+            AssetType.ETF: [
+                ("📗 ETF time series", lambda: MarketDataPipeline.update_etf_time_series(**time_series_args)),
+                ("💹 ETF metrics", lambda: MarketDataPipeline.update_etf_metrics(**metrics_args)),
+            ],
+            AssetType.FOREX: [
+                ("📙 CURRENCY time series", lambda: MarketDataPipeline.update_currency_time_series(**time_series_args)),
+                ("💱 CURRENCY metrics", lambda: MarketDataPipeline.update_currency_metrics(**metrics_args)),
+            ],
+        }
+
+        run_started = time.perf_counter()
+        timings: List[JobTiming] = []
+
+        with ThreadPoolExecutor(max_workers=len(chains)) as pool:
+            futures = [
+                pool.submit(MarketDataPipeline._run_job_chain, asset_type, jobs, run_started)
+                for asset_type, jobs in chains.items()
+            ]
+            for future in futures:
+                timings.extend(future.result())
+
+        wall = time.perf_counter() - run_started
+        busy = sum(timing.seconds for timing in timings)
+
+        progress("-" * 80)
+        progress("⏱️ Job timings:")
+        for timing in sorted(timings, key=lambda t: t.started_at):
+            status = "✅" if timing.succeeded else "❌"
+            progress(f"   {status} {timing.name}: started +{timing.started_at:.1f}s, took {timing.seconds:.1f}s",
+                     job=timing.name, started_at=round(timing.started_at, 3), seconds=round(timing.seconds, 3),
+                     succeeded=timing.succeeded)
+        progress(f"⏱️ Total: {wall:.1f}s wall for {busy:.1f}s of job time ({busy / wall if wall else 0:.1f}x overlap)")
+
+        if all(timing.succeeded for timing in timings):
+            progress("\n✅ All market data successfully updated!")
+        else:
+            progress("\n⚠️ Market data updated with failed jobs.")
+
+        progress("-" * 80)
+        progress("🏁 Market Data Pipeline completed.")
+        return timings
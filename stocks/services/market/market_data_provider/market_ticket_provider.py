@@ -1,18 +1,66 @@
 
-from typing import List
+import threading
+import time
+from datetime import timedelta
+from typing import List, Tuple
 import requests
 import pandas as pd
 from io import StringIO
 
-from stocks.dataclasses import MarketTicker
+from django.utils import timezone
+
+from stocks.dataclasses import AssetType, MarketTicker
+from stocks.services.market.market_data_repository.universe_repository import UniverseRepository
 
 class MarketTickerProvider:
+    SP500_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+    SP500_UNIVERSE = "sp500"
+
+    # Stored universes younger than this are used without contacting Wikipedia
+    UNIVERSE_TTL = timedelta(hours=24)
+
+    # In-process memo so a run parses the universe at most once: name -> (loaded at, tickers)
+    _universe_memo: dict[str, Tuple[float, List[MarketTicker]]] = {}
+    _universe_lock = threading.Lock()
+
     @staticmethod
-    def get_sp500_tickers() -> List[MarketTicker]:
+    def reset_universe_cache():
         """
-        Retrieve tickers and company names for all S&P 500 components from Wikipedia.
+        Forget the in-process universes (the stored snapshots are kept).
         """
-        url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+        with MarketTickerProvider._universe_lock:
+            MarketTickerProvider._universe_memo.clear()
+
+    @staticmethod
+    def get_sp500_tickers(force_refresh: bool = False) -> List[MarketTicker]:
+        """
+        Retrieve tickers and company names for all S&P 500 components.
+        The list is memoized in-process and persisted in TickerUniverse; Wikipedia is
+        only contacted once the stored snapshot is older than UNIVERSE_TTL, with a
+        conditional GET, and the page is parsed only when it actually changed.
+        :param force_refresh: Revalidate against Wikipedia regardless of the TTL.
+        """
+        name = MarketTickerProvider.SP500_UNIVERSE
+        with MarketTickerProvider._universe_lock:
+            memo = MarketTickerProvider._universe_memo.get(name)
+            ttl = MarketTickerProvider.UNIVERSE_TTL.total_seconds()
+            if memo and not force_refresh and time.monotonic() - memo[0] < ttl:
+                return list(memo[1])
+
+            tickers = MarketTickerProvider._load_sp500_universe(force_refresh)
+            MarketTickerProvider._universe_memo[name] = (time.monotonic(), tickers)
+            return list(tickers)
+
+    @staticmethod
+    def _load_sp500_universe(force_refresh: bool) -> List[MarketTicker]:
+        name = MarketTickerProvider.SP500_UNIVERSE
+        snapshot = UniverseRepository.get_snapshot(name)
+
+        if snapshot and not force_refresh and timezone.now() - snapshot.checked_at < MarketTickerProvider.UNIVERSE_TTL:
+            tickers = UniverseRepository.to_tickers(snapshot)
+            print(f"✅ Loaded {len(tickers)} S&P 500 tickers from the stored universe")
+            return tickers
+
         headers = {
             "User-Agent": (
                 "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -20,18 +68,50 @@ class MarketTickerProvider:
                 "Chrome/140.0.0.0 Safari/537.36"
             )
         }
+        if snapshot and snapshot.etag:
+            headers["If-None-Match"] = snapshot.etag
+        if snapshot and snapshot.last_modified:
+            headers["If-Modified-Since"] = snapshot.last_modified
+
+        try:
+            response = requests.get(MarketTickerProvider.SP500_URL, headers=headers, timeout=30)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except requests.RequestException as e:
+            if not snapshot:
+                raise
+            print(f"⚠️ Could not revalidate the S&P 500 list ({e}), using the stored universe")
+            return UniverseRepository.to_tickers(snapshot)
+
+        if response.status_code == 304 and snapshot:
+            UniverseRepository.touch_snapshot(name)
+            tickers = UniverseRepository.to_tickers(snapshot)
+            print(f"✅ S&P 500 list not modified, reusing {len(tickers)} stored tickers")
+            return tickers
+
+        tickers = MarketTickerProvider._parse_sp500_page(response.text)
+        diff = UniverseRepository.save_snapshot(
+            name,
+            AssetType.STOCK,
+            tickers,
+            etag=response.headers.get("ETag", ""),
+            last_modified=response.headers.get("Last-Modified", "")
+        )
+
+        print(f"✅ Found {len(tickers)} S&P 500 tickers from Wikipedia")
+        if diff:
+            print(f"🔄 S&P 500 membership changed: {len(diff.added)} added, {len(diff.removed)} removed")
+
+        return tickers
 
-        response = requests.get(url, headers=headers)
-        sp500_table = pd.read_html(StringIO(response.text))[0]
+    @staticmethod
+    def _parse_sp500_page(html: str) -> List[MarketTicker]:
+        sp500_table = pd.read_html(StringIO(html))[0]
 
         tickers = [t.replace('.', '-') for t in sp500_table['Symbol'].tolist()]
         names = sp500_table['Security'].tolist()
 
-        tickers_data = [MarketTicker(symbol=t, name=n) for t, n in zip(tickers, names)]
-
-        print(f"✅ Found {len(tickers_data)} S&P 500 tickers from Wikipedia")
-
-        return tickers_data
+        return [MarketTicker(symbol=t, name=n) for t, n in zip(tickers, names)]
 
     @staticmethod
     def get_etf_tickers() -> List[MarketTicker]:
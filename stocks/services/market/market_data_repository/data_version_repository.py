@@ -0,0 +1,90 @@
+from typing import Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from stocks.dataclasses import AssetType
+from stocks.models import DataVersion
+
+
+class DataVersionRepository:
+    """
+    Per-dataset data versions used as HTTP validators (ETag / Last-Modified) by the
+    metrics and time series endpoints.
+
+    The versions live in the DataVersion table: the write methods of the repositories
+    bump the dataset they changed in the same transaction as the data (or right after
+    it commits, never before), so every process (web workers, pipeline and CLI jobs)
+    sees the same version whatever the cache backend. Readers memoize the version in the Django cache for MEMO_SECONDS,
+    so most polls of an unchanged dataset do not touch the database.
+    """
+
+    STOCK_METRICS = "stock_metrics"
+    ETF_METRICS = "etf_metrics"
+    CURRENCY_METRICS = "currency_metrics"
+    TIME_SERIES = "time_series"     # Daily bars and their weekly / monthly rollups
+    DATASETS = (STOCK_METRICS, ETF_METRICS, CURRENCY_METRICS, TIME_SERIES)
+
+    METRICS_DATASETS = {
+        AssetType.STOCK: STOCK_METRICS,
+        AssetType.ETF: ETF_METRICS,
+        AssetType.FOREX: CURRENCY_METRICS,
+    }
+
+    # Longest time a worker may keep answering with a superseded version
+    MEMO_SECONDS = 5
+
+    @staticmethod
+    def cache_key(dataset: str) -> str:
+        return f"data_version:{dataset}"
+
+    @staticmethod
+    def get(dataset: str) -> Tuple[str, float]:
+        """
+        Current version of a dataset.
+        :return: (token, modified) with modified as a Unix timestamp. The token includes the
+                 bump time, so a recreated table never repeats an earlier token.
+        """
+        key = DataVersionRepository.cache_key(dataset)
+        version = cache.get(key)
+        if version is not None:
+            return version
+
+        row = DataVersion.objects.filter(dataset=dataset).values_list("version", "updated_at").first()
+        if row is None:
+            data_version, _ = DataVersion.objects.get_or_create(dataset=dataset)
+            row = (data_version.version, data_version.updated_at)
+
+        number, updated_at = row
+        modified = updated_at.timestamp()
+        version = (f"{number}-{int(modified * 1_000_000):x}", modified)
+        cache.set(key, version, DataVersionRepository.MEMO_SECONDS)
+        return version
+
+    @staticmethod
+    def bump(*datasets: str):
+        """
+        Increment the versions of the datasets, inside the caller's transaction when there
+        is one, so the new version is never visible before the rows it describes.
+        """
+        bumped = DataVersion.objects.filter(dataset__in=datasets).update(
+            version=F("version") + 1,
+            updated_at=timezone.now()
+        )
+        if bumped < len(datasets):
+            # Datasets without a row yet (rows are created by the migration)
+            DataVersion.objects.bulk_create(
+                [DataVersion(dataset=dataset, version=1) for dataset in datasets],
+                ignore_conflicts=True
+            )
+
+        # Drop the memoized versions once committed (shared caches see it right away)
+        transaction.on_commit(
+            lambda: cache.delete_many([DataVersionRepository.cache_key(dataset) for dataset in datasets])
+        )
+
+    @staticmethod
+    def bump_metrics(asset_type: AssetType):
+        DataVersionRepository.bump(DataVersionRepository.METRICS_DATASETS[asset_type])
@@ -0,0 +1,221 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from stocks.dataclasses import AssetType, TimeSeriesBatch, TimeSeriesSaveResult
+from stocks.dtos.dtos import TimeSeriesDTO
+from stocks.models import IntradayBar, PipelineProgress
+from stocks.services.market.market_data_repository.market_data_repository import MarketDataRepository
+from stocks.services.market.market_data_repository.pipeline_progress_repository import PipelineProgressRepository
+
+
+class IntradayRepository:
+    """
+    Stores the intraday bars behind the 1d (15m bars) and 5d (1h bars) charts, so
+    they are served from the database instead of a live Yahoo call per request.
+    """
+
+    # Chart period served by each stored interval, also downloaded by the refresh job
+    PERIODS = {"15m": "1d", "1h": "5d"}
+
+    # Trading sessions shown for each chart period
+    SESSIONS = {"1d": 1, "5d": 5}
+
+    # Rolling retention window of each interval, in days
+    RETENTION_DAYS = {"15m": 7, "1h": 30}
+
+    # While the market is open, a ticker not refreshed by the intraday job for this long is served live
+    STALE_AFTER = {"15m": timedelta(minutes=30), "1h": timedelta(hours=2)}
+
+    BAR_LENGTH = {"15m": timedelta(minutes=15), "1h": timedelta(hours=1)}
+
+    # Regular US session (stocks and ETFs, holidays not accounted for) and the weekly
+    # forex close (Friday 17:00 to Sunday 17:00), New York time
+    MARKET_TIMEZONE = ZoneInfo("America/New_York")
+    SESSION_OPEN = time(9, 30)
+    SESSION_CLOSE = time(16, 0)
+    FOREX_WEEK_CLOSE = time(17, 0)
+
+    UPDATE_FIELDS = ["open_price", "high_price", "low_price", "close_price", "volume"]
+
+    @staticmethod
+    def interval_for_period(period: str) -> str:
+        for interval, interval_period in IntradayRepository.PERIODS.items():
+            if interval_period == period:
+                return interval
+        raise ValueError(f"No intraday interval for period '{period}'. Must be one of {set(IntradayRepository.SESSIONS)}.")
+
+    @staticmethod
+    def job_id(interval: str) -> str:
+        """
+        Checkpoint job id of the intraday refresh of an interval.
+        """
+        return PipelineProgressRepository.time_series_job_id(IntradayRepository.PERIODS[interval], interval)
+
+    @staticmethod
+    def save_batches(interval: str, batches: List[TimeSeriesBatch]) -> TimeSeriesSaveResult:
+        """
+        Upsert the intraday bars of several symbols with one
+        INSERT ... ON CONFLICT (asset_id, interval, timestamp) DO UPDATE per symbol.
+        :return: TimeSeriesSaveResult with the number of inserted and updated bars.
+        """
+        result = TimeSeriesSaveResult()
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return result
+
+        asset_ids = {}
+        for asset_type in {batch.asset_type for batch in batches}:
+            asset_ids.update(MarketDataRepository._resolve_asset_ids(
+                [batch.symbol for batch in batches if batch.asset_type == asset_type], asset_type.value
+            ))
+
+        for batch in batches:
+            asset_id = asset_ids[batch.symbol]
+            # Duplicated timestamps would hit the same row twice in one statement; keep the last one
+            position_by_timestamp = {
+                IntradayRepository._as_aware(value): position
+                for position, value in enumerate(batch.dates.tolist())
+            }
+
+            opens = batch.open_prices.tolist()
+            highs = batch.high_prices.tolist()
+            lows = batch.low_prices.tolist()
+            closes = batch.close_prices.tolist()
+            volumes = batch.volumes.tolist()
+
+            with transaction.atomic():
+                existing = set(
+                    IntradayBar.objects
+                    .filter(asset_id=asset_id, interval=interval, timestamp__in=list(position_by_timestamp))
+                    .values_list("timestamp", flat=True)
+                )
+                IntradayBar.objects.bulk_create(
+                    [
+                        IntradayBar(
+                            asset_id=asset_id,
+                            interval=interval,
+                            timestamp=timestamp,
+                            open_price=opens[i],
+                            high_price=highs[i],
+                            low_price=lows[i],
+                            close_price=closes[i],
+                            volume=volumes[i]
+                        )
+                        for timestamp, i in position_by_timestamp.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["asset", "interval", "timestamp"],
+                    update_fields=IntradayRepository.UPDATE_FIELDS
+                )
+
+            result.updated += len(existing)
+            result.inserted += len(position_by_timestamp) - len(existing)
+
+        return result
+
+    @staticmethod
+    def purge_expired(interval: str, now: Optional[datetime] = None) -> int:
+        """
+        Delete the bars of an interval older than its retention window.
+        :return: Number of bars deleted.
+        """
+        cutoff = (now or timezone.now()) - timedelta(days=IntradayRepository.RETENTION_DAYS[interval])
+        deleted, _ = IntradayBar.objects.filter(interval=interval, timestamp__lt=cutoff).delete()
+        return deleted
+
+    @staticmethod
+    def get_bars(ticker: str, period: str) -> List[TimeSeriesDTO]:
+        """
+        Stored intraday bars of the last trading sessions of a chart period (1d or 5d),
+        oldest first.
+        """
+        interval = IntradayRepository.interval_for_period(period)
+        queryset = IntradayBar.objects.filter(asset__ticker=ticker, interval=interval)
+
+        sessions = list(queryset.datetimes("timestamp", "day", order="DESC")[:IntradayRepository.SESSIONS[period]])
+        if not sessions:
+            return []
+
+        bars = queryset.filter(timestamp__gte=sessions[-1]).order_by("timestamp").values_list("timestamp", "close_price")
+        return [
+            TimeSeriesDTO(ticker=ticker, timestamp=timestamp, close_price=float(close_price))
+            for timestamp, close_price in bars
+        ]
+
+    @staticmethod
+    def last_session_close(now: datetime, asset_type: AssetType = AssetType.STOCK) -> Optional[datetime]:
+        """
+        Close of the last trading session while the market is closed, None while it is open.
+        """
+        local = now.astimezone(IntradayRepository.MARKET_TIMEZONE)
+        weekday, clock = local.weekday(), local.time()
+
+        if asset_type == AssetType.FOREX:
+            week_close = IntradayRepository.FOREX_WEEK_CLOSE
+            closed = (weekday == 4 and clock >= week_close) or weekday == 5 or (weekday == 6 and clock < week_close)
+            if not closed:
+                return None
+            friday = local.date() - timedelta(days=weekday - 4)
+            return datetime.combine(friday, week_close, tzinfo=IntradayRepository.MARKET_TIMEZONE)
+
+        if weekday < 5 and IntradayRepository.SESSION_OPEN <= clock < IntradayRepository.SESSION_CLOSE:
+            return None
+
+        day = local.date()
+        if weekday >= 5 or clock < IntradayRepository.SESSION_OPEN:
+            day -= timedelta(days=1)
+            while day.weekday() >= 5:
+                day -= timedelta(days=1)
+        return datetime.combine(day, IntradayRepository.SESSION_CLOSE, tzinfo=IntradayRepository.MARKET_TIMEZONE)
+
+    @staticmethod
+    def is_fresh(
+        ticker: str,
+        interval: str,
+        now: Optional[datetime] = None,
+        asset_type: AssetType = AssetType.STOCK,
+        latest_bar: Optional[datetime] = None
+    ) -> bool:
+        """
+        Whether the stored bars of a ticker can be served without a live fetch.
+        - Market open: the intraday job refreshed the ticker within STALE_AFTER.
+        - Market closed: no new bars can appear, so the bars are fresh when they reach
+          the last session close, or when the job refreshed the ticker after it.
+        :param latest_bar: Timestamp of the newest stored bar, when the caller has it.
+        """
+        now = now or timezone.now()
+        last_close = IntradayRepository.last_session_close(now, asset_type)
+
+        if last_close is None:
+            since = now - IntradayRepository.STALE_AFTER[interval]
+        else:
+            if latest_bar is None:
+                latest_bar = IntradayBar.objects.filter(
+                    asset__ticker=ticker, interval=interval
+                ).aggregate(latest=Max("timestamp"))["latest"]
+            if latest_bar is not None and latest_bar + IntradayRepository.BAR_LENGTH[interval] >= last_close:
+                return True
+            since = last_close
+
+        return PipelineProgress.objects.filter(
+            job_id=IntradayRepository.job_id(interval),
+            symbol=ticker,
+            status=PipelineProgress.STATUS_COMPLETED,
+            updated_at__gte=since
+        ).exists()
+
+    @staticmethod
+    def _as_aware(value) -> datetime:
+        """
+        Normalize a bar timestamp (pandas Timestamp or datetime) to an aware datetime.
+        """
+        if hasattr(value, "to_pydatetime"):
+            value = value.to_pydatetime()
+        if timezone.is_naive(value):
+            value = value.replace(tzinfo=dt_timezone.utc)
+        return value
@@ -1,16 +1,23 @@
 
-from datetime import timedelta
+import dataclasses
+import io
+from datetime import date, datetime, timedelta
+from django.db import connection, transaction
 from django.utils import timezone
 
 from typing import List, Optional
 
-from django.db.models import Q
-from stocks.dataclasses import CurrencyMetricsData, ETFMetricsData, StockMetricsData, TimeSeriesData
+import pandas as pd
+from django.db.models import FloatField, Max, Q
+from django.db.models.functions import Cast
+from stocks.dataclasses import AssetType, CurrencyMetricsData, DerivedMetricsData, ETFMetricsData, StockMetricsData, TimeSeriesBatch, TimeSeriesData, TimeSeriesSaveResult
 
 from stocks.dtos.dtos import MetricDTO, TimeSeriesDTO
 from stocks.dtos.metrics_dto_mapper import MetricsDtoMapper
 from stocks.dtos.time_series_dto_mapper import TimeSeriesDTOMapper
 from stocks.models import CurrencyMetrics, ETFMetrics, FinancialAsset, StockMetrics, TimeSeries
+from stocks.services.market.market_data_repository.data_version_repository import DataVersionRepository
+from stocks.services.market.market_data_repository.rollup_repository import RollupRepository
 from django.core.paginator import Paginator
 
 
@@ -23,32 +30,238 @@ class MarketDataRepository:
  
 
     
+    # Rows written per INSERT ... ON CONFLICT statement (and per transaction)
+    TIME_SERIES_CHUNK_SIZE = 2000
+
+    # Columns refreshed when a bar for (asset, date) already exists
+    TIME_SERIES_UPDATE_FIELDS = ["open_price", "close_price", "high_price", "low_price", "volume"]
+
+    # Decimal places of the TimeSeries price columns; incoming prices are compared at this precision
+    PRICE_DECIMALS = 6
+
     @staticmethod
-    def save_time_series(time_series_list: List[TimeSeriesData]):
+    def save_time_series(time_series_list: List[TimeSeriesData]) -> TimeSeriesSaveResult:
         """
-        Persist a list of TimeSeriesData into the database.
-        This uses the same robust conversion logic as before, handling
-        possible pd.Series inside each row.
+        Persist a list of TimeSeriesData into the database using set-based upserts.
+        Bars are grouped per symbol into TimeSeriesBatch objects and written with
+        save_time_series_batches.
+        :return: TimeSeriesSaveResult with the number of inserted and updated rows.
         """
+        records_by_symbol: dict[str, List[TimeSeriesData]] = {}
         for ts in time_series_list:
-            # Get or create the financial asset
+            records_by_symbol.setdefault(ts.symbol, []).append(ts)
+
+        return MarketDataRepository.save_time_series_batches(
+            [TimeSeriesBatch.from_records(records) for records in records_by_symbol.values()]
+        )
+
+    @staticmethod
+    def save_time_series_batches(batches: List[TimeSeriesBatch]) -> TimeSeriesSaveResult:
+        """
+        Persist columnar TimeSeriesBatch objects using set-based upserts.
+        The asset is resolved once per symbol and bars are processed in chunks, one
+        transaction per chunk: the stored bars of the chunk dates are read in a single
+        query, and only new bars or bars whose values changed are written with
+        INSERT ... ON CONFLICT (asset_id, date) DO UPDATE. Re-ingesting an overlapping
+        window therefore does not rewrite identical rows (no WAL or vacuum churn).
+        :return: TimeSeriesSaveResult with the number of inserted, updated and unchanged bars,
+                 and the dates of the written bars per asset (touched).
+        """
+        result = TimeSeriesSaveResult()
+
+        for batch in batches:
+            if not len(batch):
+                continue
+
             asset, _ = FinancialAsset.objects.get_or_create(
-                ticker=ts.symbol,
-                defaults={"name": ts.symbol, "asset_type": ts.asset_type.value}  # store enum value
+                ticker=batch.symbol,
+                defaults={"name": batch.symbol, "asset_type": batch.asset_type.value}  # store enum value
             )
 
-            # Prepare the data dictionary exactly as before
-            TimeSeries.objects.update_or_create(
-                asset=asset,
-                date=ts.date,
-                defaults={
-                    "open_price": ts.open_price,
-                    "close_price": ts.close_price,
-                    "high_price": ts.high_price,
-                    "low_price": ts.low_price,
-                    "volume": ts.volume
-                }
+            # Duplicated dates would hit the same row twice in one statement; keep the last one
+            position_by_date = {
+                MarketDataRepository._as_date(value): position
+                for position, value in enumerate(batch.dates.tolist())
+            }
+            dates = sorted(position_by_date)
+
+            opens = batch.open_prices.tolist()
+            highs = batch.high_prices.tolist()
+            lows = batch.low_prices.tolist()
+            closes = batch.close_prices.tolist()
+            volumes = batch.volumes.tolist()
+
+            chunk_size = MarketDataRepository.TIME_SERIES_CHUNK_SIZE
+
+            for start in range(0, len(dates), chunk_size):
+                chunk_dates = dates[start:start + chunk_size]
+
+                with transaction.atomic():
+                    stored = {
+                        day: values
+                        for day, *values in TimeSeries.objects.filter(
+                            asset=asset,
+                            date__in=chunk_dates
+                        ).values_list("date", "open_price", "high_price", "low_price", "close_price", "volume")
+                    }
+
+                    rows = []
+                    for day in chunk_dates:
+                        i = position_by_date[day]
+                        incoming = (opens[i], highs[i], lows[i], closes[i], volumes[i])
+                        current = stored.get(day)
+
+                        if current is None:
+                            result.inserted += 1
+                        elif MarketDataRepository._same_bar(current, incoming):
+                            result.unchanged += 1
+                            continue
+                        else:
+                            result.updated += 1
+
+                        rows.append(TimeSeries(
+                            asset=asset,
+                            date=day,
+                            open_price=opens[i],
+                            close_price=closes[i],
+                            high_price=highs[i],
+                            low_price=lows[i],
+                            volume=volumes[i]
+                        ))
+
+                    if rows:
+                        result.touched.setdefault(asset.id, set()).update(row.date for row in rows)
+                        TimeSeries.objects.bulk_create(
+                            rows,
+                            update_conflicts=True,
+                            unique_fields=["asset", "date"],
+                            update_fields=MarketDataRepository.TIME_SERIES_UPDATE_FIELDS
+                        )
+
+        if result.touched:
+            DataVersionRepository.bump(DataVersionRepository.TIME_SERIES)
+        return result
+
+    @staticmethod
+    def copy_time_series(asset_type: AssetType, frame: pd.DataFrame) -> TimeSeriesSaveResult:
+        """
+        Bulk-load staged bars (symbol, date, open/high/low/close_price, volume columns, one
+        row per symbol and date) into TimeSeries.
+        On PostgreSQL the rows are streamed with COPY into a temporary table and merged
+        with a single INSERT ... SELECT ... ON CONFLICT (asset_id, date) DO UPDATE that
+        leaves identical rows untouched. Other databases fall back to save_time_series_batches.
+        :return: TimeSeriesSaveResult with the number of inserted, updated and unchanged bars,
+                 and the dates of the written bars per asset (touched).
+        """
+        if frame.empty:
+            return TimeSeriesSaveResult()
+
+        if connection.vendor != "postgresql":
+            return MarketDataRepository.save_time_series_batches([
+                TimeSeriesBatch(
+                    asset_type=asset_type,
+                    symbol=symbol,
+                    dates=group["date"].to_numpy(dtype=object),
+                    open_prices=group["open_price"].to_numpy(dtype=float),
+                    high_prices=group["high_price"].to_numpy(dtype=float),
+                    low_prices=group["low_price"].to_numpy(dtype=float),
+                    close_prices=group["close_price"].to_numpy(dtype=float),
+                    volumes=group["volume"].to_numpy(dtype="int64")
+                )
+                for symbol, group in frame.groupby("symbol", sort=False)
+            ])
+
+        asset_ids = MarketDataRepository._resolve_asset_ids(frame["symbol"].unique().tolist(), asset_type.value)
+        columns = ["open_price", "high_price", "low_price", "close_price", "volume"]
+
+        buffer = io.StringIO()
+        frame.assign(asset_id=frame["symbol"].map(asset_ids))[["asset_id", "date", *columns]].to_csv(
+            buffer, index=False, header=False
+        )
+        buffer.seek(0)
+
+        table = connection.ops.quote_name(TimeSeries._meta.db_table)
+        target = ", ".join(f"{table}.{column}" for column in columns)
+        excluded = ", ".join(f"EXCLUDED.{column}" for column in columns)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE time_series_stage ("
+                "asset_id bigint, date date, open_price numeric(20, 6), high_price numeric(20, 6), "
+                "low_price numeric(20, 6), close_price numeric(20, 6), volume bigint"
+                ") ON COMMIT DROP"
+            )
+            copy_sql = "COPY time_series_stage FROM STDIN WITH (FORMAT csv)"
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, "copy_expert"):      # psycopg2
+                raw_cursor.copy_expert(copy_sql, buffer)
+            else:                                       # psycopg 3
+                with raw_cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+
+            cursor.execute(
+                f"SELECT count(*) FROM time_series_stage s "
+                f"JOIN {table} t ON t.asset_id = s.asset_id AND t.date = s.date"
             )
+            existing = cursor.fetchone()[0]
+
+            cursor.execute(
+                f"INSERT INTO {table} (asset_id, date, {', '.join(columns)}) "
+                f"SELECT asset_id, date, {', '.join(columns)} FROM time_series_stage "
+                f"ON CONFLICT (asset_id, date) DO UPDATE SET "
+                f"{', '.join(f'{column} = EXCLUDED.{column}' for column in columns)} "
+                f"WHERE ({target}) IS DISTINCT FROM ({excluded}) "
+                f"RETURNING asset_id, date"
+            )
+            written = cursor.fetchall()
+
+        touched = {}
+        for asset_id, day in written:
+            touched.setdefault(asset_id, set()).add(day)
+
+        inserted = len(frame) - existing
+        updated = len(written) - inserted
+        if touched:
+            DataVersionRepository.bump(DataVersionRepository.TIME_SERIES)
+        return TimeSeriesSaveResult(inserted=inserted, updated=updated, unchanged=existing - updated, touched=touched)
+
+    @staticmethod
+    def _same_bar(stored, incoming) -> bool:
+        """
+        Compare a stored (open, high, low, close, volume) row, with Decimal prices, to
+        incoming float prices quantized to the column precision.
+        """
+        *stored_prices, stored_volume = stored
+        *prices, volume = incoming
+        return stored_volume == volume and all(
+            float(current) == round(price, MarketDataRepository.PRICE_DECIMALS)
+            for current, price in zip(stored_prices, prices)
+        )
+
+    @staticmethod
+    def _as_date(value) -> date:
+        """
+        Normalize the bar timestamp (datetime, pandas Timestamp or date) to a date.
+        """
+        if isinstance(value, datetime):
+            return value.date()
+        return value
+
+    @staticmethod
+    def get_last_time_series_dates(symbols: List[str]) -> dict[str, date]:
+        """
+        Return the most recent stored bar date for each of the given symbols.
+        Symbols without any stored bar (new assets) are left out of the result.
+        """
+        rows = (
+            TimeSeries.objects
+            .filter(asset__ticker__in=symbols)
+            .values("asset__ticker")
+            .annotate(last_date=Max("date"))
+            .order_by()
+        )
+
+        return {row["asset__ticker"]: row["last_date"] for row in rows}
 
     @staticmethod
     def save_stock_metrics(metrics: StockMetricsData):
@@ -83,6 +296,7 @@ class MarketDataRepository:
         StockMetrics.objects.update_or_create(
             asset=asset,
             defaults=metrics_data)
+        DataVersionRepository.bump_metrics(AssetType.STOCK)
 
     @staticmethod
     def save_etf_metrics(metrics: ETFMetricsData):
@@ -118,6 +332,7 @@ class MarketDataRepository:
             asset=asset,
             defaults=metrics_data
         )
+        DataVersionRepository.bump_metrics(AssetType.ETF)
 
     @staticmethod
     def save_currency_metrics(metrics: CurrencyMetricsData):
@@ -151,6 +366,121 @@ class MarketDataRepository:
             asset=asset,
             defaults=metrics_data
         )
+        DataVersionRepository.bump_metrics(AssetType.FOREX)
+
+    # Metrics table, FinancialAsset.asset_type for new assets and auto-updated timestamp column
+    METRICS_TABLES = {
+        AssetType.STOCK: (StockMetrics, "stock", "updated_at"),
+        AssetType.ETF: (ETFMetrics, "etf", "last_updated"),
+        AssetType.FOREX: (CurrencyMetrics, "currency", "last_updated"),
+    }
+
+    @staticmethod
+    def _resolve_asset_ids(symbols: List[str], asset_type_value: str) -> dict[str, int]:
+        """
+        Return the FinancialAsset id of each symbol, creating the missing assets in bulk.
+        """
+        asset_ids = dict(FinancialAsset.objects.filter(ticker__in=symbols).values_list("ticker", "id"))
+        missing = [symbol for symbol in symbols if symbol not in asset_ids]
+
+        if missing:
+            FinancialAsset.objects.bulk_create(
+                [FinancialAsset(ticker=symbol, name=symbol, asset_type=asset_type_value) for symbol in missing],
+                ignore_conflicts=True
+            )
+            asset_ids.update(FinancialAsset.objects.filter(ticker__in=missing).values_list("ticker", "id"))
+
+        return asset_ids
+
+    @staticmethod
+    def save_metrics_batch(
+        asset_type: AssetType,
+        metrics_list: List[StockMetricsData | ETFMetricsData | CurrencyMetricsData]
+    ) -> int:
+        """
+        Persist a batch of metrics of one asset type with a single
+        INSERT ... ON CONFLICT (asset_id) DO UPDATE. Equivalent to calling
+        save_stock_metrics / save_etf_metrics / save_currency_metrics per item.
+        :return: Number of metrics rows written.
+        """
+        if not metrics_list:
+            return 0
+
+        model, asset_type_value, timestamp_field = MarketDataRepository.METRICS_TABLES[asset_type]
+        asset_ids = MarketDataRepository._resolve_asset_ids(
+            [metrics.symbol for metrics in metrics_list],
+            asset_type_value
+        )
+
+        # The metrics dataclasses mirror the model columns, plus the symbol
+        rows = {}
+        for metrics in metrics_list:
+            values = dataclasses.asdict(metrics)
+            symbol = values.pop("symbol")
+            rows[symbol] = model(asset_id=asset_ids[symbol], **values)
+
+        update_fields = [field.name for field in dataclasses.fields(metrics_list[0]) if field.name != "symbol"]
+
+        with transaction.atomic():
+            model.objects.bulk_create(
+                list(rows.values()),
+                update_conflicts=True,
+                unique_fields=["asset"],
+                update_fields=[*update_fields, timestamp_field]
+            )
+
+        DataVersionRepository.bump_metrics(asset_type)
+        return len(rows)
+
+    @staticmethod
+    def save_derived_metrics(asset_type: AssetType, derived_metrics: List[DerivedMetricsData]) -> int:
+        """
+        Bulk-write the metrics derived from stored TimeSeries (window changes and
+        52-week range) into the metrics table of the given asset type, with a single
+        INSERT ... ON CONFLICT (asset_id) DO UPDATE. Other columns are left untouched
+        on existing rows.
+        :return: Number of metrics rows written.
+        """
+        model, _, timestamp_field = MarketDataRepository.METRICS_TABLES[asset_type]
+        field_map = {
+            AssetType.STOCK: {},
+            AssetType.ETF: {"week52_high": "week52_high", "week52_low": "week52_low"},
+            AssetType.FOREX: {"week52_high": "fifty_two_week_high", "week52_low": "fifty_two_week_low"},
+        }[asset_type]
+
+        field_map = {
+            "change_5d_percent": "change_5d_percent",
+            "change_1m_percent": "change_1m_percent",
+            "change_ytd_percent": "change_ytd_percent",
+            "change_5y_percent": "change_5y_percent",
+            **field_map
+        }
+
+        asset_ids = dict(
+            FinancialAsset.objects
+            .filter(ticker__in=[d.symbol for d in derived_metrics])
+            .values_list("ticker", "id")
+        )
+
+        rows = [
+            model(
+                asset_id=asset_ids[d.symbol],
+                **{column: getattr(d, attribute) for attribute, column in field_map.items()}
+            )
+            for d in derived_metrics
+            if d.symbol in asset_ids
+        ]
+
+        if rows:
+            model.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["asset"],
+                update_fields=[*field_map.values(), timestamp_field]
+            )
+            DataVersionRepository.bump_metrics(asset_type)
+
+        return len(rows)
         
   
     @staticmethod
@@ -164,7 +494,8 @@ class MarketDataRepository:
         """
         Retrieves paginated stock metrics, optionally filtered by a query string (ticker or name).
         """
-        queryset = StockMetrics.objects.select_related("asset")
+        # Former S&P 500 constituents are kept in the DB but no longer listed
+        queryset = StockMetrics.objects.select_related("asset").filter(asset__is_active=True)
 
         if query:
             queryset = queryset.filter(
@@ -205,7 +536,7 @@ class MarketDataRepository:
         """
         Retrieves all ETF metrics, optionally filtered by query (ticker or name).
         """
-        queryset = ETFMetrics.objects.select_related("asset")
+        queryset = ETFMetrics.objects.select_related("asset").filter(asset__is_active=True)
 
         if query:
             queryset = queryset.filter(
@@ -236,7 +567,7 @@ class MarketDataRepository:
         """
         Retrieves all currency metrics, optionally filtered by query (ticker or name).
         """
-        queryset = CurrencyMetrics.objects.select_related("asset")
+        queryset = CurrencyMetrics.objects.select_related("asset").filter(asset__is_active=True)
 
         if query:
             queryset = queryset.filter(
@@ -259,7 +590,7 @@ class MarketDataRepository:
     @staticmethod
     def get_stock_metrics_by_ticker(ticker: str) -> MetricDTO | None:
         try:
-            m = StockMetrics.objects.select_related("asset").get(asset__ticker=ticker)
+            m = StockMetrics.objects.select_related("asset").get(asset__ticker=ticker, asset__is_active=True)
         except StockMetrics.DoesNotExist:
             return None
         return MetricsDtoMapper.stock_to_dto(m)
@@ -267,7 +598,7 @@ class MarketDataRepository:
     @staticmethod
     def get_etf_metrics_by_ticker(ticker: str) -> MetricDTO | None:
         try:
-            m = ETFMetrics.objects.select_related("asset").get(asset__ticker=ticker)
+            m = ETFMetrics.objects.select_related("asset").get(asset__ticker=ticker, asset__is_active=True)
         except ETFMetrics.DoesNotExist:
             return None
         return MetricsDtoMapper.etf_to_dto(m)
@@ -275,22 +606,29 @@ class MarketDataRepository:
     @staticmethod
     def get_currency_metrics_by_ticker(ticker: str) -> MetricDTO | None:
         try:
-            m = CurrencyMetrics.objects.select_related("asset").get(asset__ticker=ticker)
+            m = CurrencyMetrics.objects.select_related("asset").get(asset__ticker=ticker, asset__is_active=True)
         except CurrencyMetrics.DoesNotExist:
             return None
         return MetricsDtoMapper.currency_to_dto(m)
     
     @staticmethod
-    def get_time_series_from_db(ticker: str, period: str) -> List[TimeSeriesDTO]:
+    def get_time_series_from_db(ticker: str, period: str, interval: str = "1d") -> List[TimeSeriesDTO]:
         """
-        Retrieves historical time series data (daily granularity) for a given ticker
-        and period (5y, 1y, 1m). Data is read directly from the database and mapped
-        to DTOs using TimeSeriesDTOMapper.
+        Retrieves historical time series data for a given ticker and period (5y, 1y, 1m).
+        Daily data (interval 1d) is read directly from the database and mapped to DTOs
+        using TimeSeriesDTOMapper; weekly (1wk) and monthly (1mo) data is read from the
+        precomputed rollups.
+        The asset is resolved once and only (date, close) tuples are fetched, with the
+        close cast to float by the database, so no model instances or Decimals are built.
         """
         valid_periods = {"5y", "1y", "1m"}
         if period not in valid_periods:
             raise ValueError(f"Invalid period '{period}'. Must be one of {valid_periods}.")
 
+        valid_intervals = {"1d", *RollupRepository.INTERVALS}
+        if interval not in valid_intervals:
+            raise ValueError(f"Invalid interval '{interval}'. Must be one of {valid_intervals}.")
+
         today = timezone.now().date()
 
         if period == "5y":
@@ -300,13 +638,21 @@ class MarketDataRepository:
         else:  # "1m"
             start_date = today - timedelta(days=30)
 
-        queryset = (
+        if interval in RollupRepository.INTERVALS:
+            return RollupRepository.get_rollups(ticker, interval, start_date, today)
+
+        asset_id = FinancialAsset.objects.filter(ticker=ticker).values_list("id", flat=True).first()
+        if asset_id is None:
+            return []
+
+        # Both bounds are constants so PostgreSQL only scans the partitions of the range
+        rows = (
             TimeSeries.objects
-            .select_related("asset")
-            .filter(asset__ticker=ticker, date__gte=start_date)
-            .order_by("date") 
+            .filter(asset_id=asset_id, date__gte=start_date, date__lte=today)
+            .order_by("date")
+            .values_list("date", Cast("close_price", output_field=FloatField()))
         )
 
-        return TimeSeriesDTOMapper.from_queryset(queryset)
+        return TimeSeriesDTOMapper.from_rows(ticker, rows)
 
 
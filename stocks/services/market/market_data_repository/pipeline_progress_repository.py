@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from django.utils import timezone
+
+from stocks.dataclasses import AssetType
+from stocks.models import PipelineProgress
+
+
+class PipelineProgressRepository:
+    """
+    Stores per-ticker checkpoints of the market pipeline jobs so that an interrupted
+    run can be resumed without re-fetching the tickers that already completed.
+    """
+
+    # Completions older than this belong to a previous run and are redone on resume
+    RUN_WINDOW_HOURS = 24
+
+    @staticmethod
+    def time_series_job_id(period: str, interval: str) -> str:
+        return f"time_series:{period}:{interval}"
+
+    @staticmethod
+    def metrics_job_id(local_changes: bool) -> str:
+        return "metrics:local" if local_changes else "metrics"
+
+    @staticmethod
+    def run_window_start(hours: int = RUN_WINDOW_HOURS) -> datetime:
+        return timezone.now() - timedelta(hours=hours)
+
+    @staticmethod
+    def get_completed_symbols(job_id: str, asset_type: AssetType, since: datetime = None) -> set[str]:
+        """
+        Symbols of the job completed within the current run window.
+        :param since: Start of the run window (default: the last RUN_WINDOW_HOURS hours).
+        """
+        since = since or PipelineProgressRepository.run_window_start()
+        return set(
+            PipelineProgress.objects
+            .filter(
+                job_id=job_id,
+                asset_type=asset_type.value,
+                status=PipelineProgress.STATUS_COMPLETED,
+                updated_at__gte=since
+            )
+            .values_list("symbol", flat=True)
+        )
+
+    @staticmethod
+    def record(job_id: str, asset_type: AssetType, entries: Iterable[Tuple[str, str, int, float]]) -> int:
+        """
+        Upsert the outcome of a group of tickers in a single statement.
+        :param entries: (symbol, status, rows, duration seconds) tuples.
+        :return: Number of checkpoints written.
+        """
+        now = timezone.now()
+        objs: List[PipelineProgress] = [
+            PipelineProgress(
+                job_id=job_id,
+                asset_type=asset_type.value,
+                symbol=symbol,
+                status=status,
+                rows=rows,
+                duration=duration,
+                updated_at=now
+            )
+            for symbol, status, rows, duration in entries
+        ]
+        if not objs:
+            return 0
+
+        PipelineProgress.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=["job_id", "asset_type", "symbol"],
+            update_fields=["status", "rows", "duration", "updated_at"]
+        )
+        return len(objs)
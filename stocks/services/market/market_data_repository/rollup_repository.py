@@ -0,0 +1,162 @@
+from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import FloatField, Q
+from django.db.models.functions import Cast
+
+from stocks.dtos.dtos import TimeSeriesDTO
+from stocks.dtos.time_series_dto_mapper import TimeSeriesDTOMapper
+from stocks.models import FinancialAsset, TimeSeries, TimeSeriesRollup
+from stocks.services.market.market_data_repository.data_version_repository import DataVersionRepository
+
+
+class RollupRepository:
+    """
+    Maintains the weekly and monthly OHLCV rollups of the daily TimeSeries.
+
+    The ingest pipeline passes the dates of the bars it actually wrote; only the
+    buckets containing them are re-aggregated from the daily rows and upserted, so a
+    daily incremental run touches one week and one month per asset.
+    """
+
+    WEEK = "1wk"
+    MONTH = "1mo"
+    INTERVALS = (WEEK, MONTH)
+
+    # Assets whose daily rows are read per query when rebuilding
+    REBUILD_CHUNK_SIZE = 50
+
+    UPDATE_FIELDS = ["open_price", "high_price", "low_price", "close_price", "volume"]
+
+    @staticmethod
+    def period_start(day: date, interval: str) -> date:
+        if interval == RollupRepository.WEEK:
+            return day - timedelta(days=day.weekday())
+        if interval == RollupRepository.MONTH:
+            return day.replace(day=1)
+        raise ValueError(f"Invalid rollup interval '{interval}'. Must be one of {set(RollupRepository.INTERVALS)}.")
+
+    @staticmethod
+    def period_end(start: date, interval: str) -> date:
+        """
+        First day after the bucket starting at start.
+        """
+        if interval == RollupRepository.WEEK:
+            return start + timedelta(days=7)
+        return date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+
+    @staticmethod
+    def refresh(touched: Dict[int, Iterable[date]]) -> int:
+        """
+        Re-aggregate the weekly and monthly buckets containing the given daily bars.
+        :param touched: asset_id -> dates of the daily bars inserted or updated.
+        :return: Number of rollup rows written.
+        """
+        buckets = {
+            asset_id: {
+                (interval, RollupRepository.period_start(day, interval))
+                for day in days
+                for interval in RollupRepository.INTERVALS
+            }
+            for asset_id, days in touched.items()
+            if days
+        }
+        if not buckets:
+            return 0
+
+        # One read of the daily rows spanning each asset's touched buckets
+        ranges = []
+        for asset_id, asset_buckets in buckets.items():
+            first = min(start for _, start in asset_buckets)
+            last = max(RollupRepository.period_end(start, interval) for interval, start in asset_buckets)
+            ranges.append(Q(asset_id=asset_id, date__gte=first, date__lt=last))
+
+        rows = TimeSeries.objects.filter(reduce(or_, ranges)).order_by("asset_id", "date").values_list(
+            "asset_id", "date", "open_price", "high_price", "low_price", "close_price", "volume"
+        )
+        return RollupRepository._write(RollupRepository._aggregate(rows, buckets))
+
+    @staticmethod
+    def rebuild(asset_ids: Optional[List[int]] = None) -> int:
+        """
+        Recompute every bucket of the given assets (default: every asset) from the daily rows.
+        :return: Number of rollup rows written.
+        """
+        if asset_ids is None:
+            asset_ids = list(FinancialAsset.objects.order_by("id").values_list("id", flat=True))
+
+        written = 0
+        for start in range(0, len(asset_ids), RollupRepository.REBUILD_CHUNK_SIZE):
+            rows = TimeSeries.objects.filter(
+                asset_id__in=asset_ids[start:start + RollupRepository.REBUILD_CHUNK_SIZE]
+            ).order_by("asset_id", "date").values_list(
+                "asset_id", "date", "open_price", "high_price", "low_price", "close_price", "volume"
+            )
+            written += RollupRepository._write(RollupRepository._aggregate(rows))
+        return written
+
+    @staticmethod
+    def get_rollups(ticker: str, interval: str, start_date: date, end_date: date) -> List[TimeSeriesDTO]:
+        """
+        Rollup bars of a ticker whose bucket overlaps [start_date, end_date], oldest first.
+        """
+        rows = TimeSeriesRollup.objects.filter(
+            asset__ticker=ticker,
+            interval=interval,
+            period_start__gte=RollupRepository.period_start(start_date, interval),
+            period_start__lte=end_date
+        ).order_by("period_start").values_list("period_start", Cast("close_price", output_field=FloatField()))
+
+        return TimeSeriesDTOMapper.from_rows(ticker, rows)
+
+    @staticmethod
+    def _aggregate(rows, buckets: Optional[Dict[int, set]] = None) -> List[TimeSeriesRollup]:
+        """
+        Fold daily rows ordered by (asset, date) into rollup bars: first open, highest
+        high, lowest low, last close and total volume of each bucket. With buckets,
+        only those (interval, period_start) buckets of each asset are built.
+        """
+        rollups: Dict[tuple, TimeSeriesRollup] = {}
+
+        for asset_id, day, open_price, high_price, low_price, close_price, volume in rows:
+            for interval in RollupRepository.INTERVALS:
+                start = RollupRepository.period_start(day, interval)
+                if buckets is not None and (interval, start) not in buckets.get(asset_id, ()):
+                    continue
+
+                rollup = rollups.get((asset_id, interval, start))
+                if rollup is None:
+                    rollups[(asset_id, interval, start)] = TimeSeriesRollup(
+                        asset_id=asset_id,
+                        interval=interval,
+                        period_start=start,
+                        open_price=open_price,
+                        high_price=high_price,
+                        low_price=low_price,
+                        close_price=close_price,
+                        volume=volume
+                    )
+                else:
+                    rollup.high_price = max(rollup.high_price, high_price)
+                    rollup.low_price = min(rollup.low_price, low_price)
+                    rollup.close_price = close_price
+                    rollup.volume += volume
+
+        return list(rollups.values())
+
+    @staticmethod
+    def _write(rollups: List[TimeSeriesRollup]) -> int:
+        if rollups:
+            with transaction.atomic():
+                TimeSeriesRollup.objects.bulk_create(
+                    rollups,
+                    batch_size=2000,
+                    update_conflicts=True,
+                    unique_fields=["asset", "interval", "period_start"],
+                    update_fields=RollupRepository.UPDATE_FIELDS
+                )
+                DataVersionRepository.bump(DataVersionRepository.TIME_SERIES)
+        return len(rollups)
@@ -0,0 +1,184 @@
+import re
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from stocks.models import TimeSeries
+
+
+class TimeSeriesPartitionRepository:
+    """
+    Manages the date range partitions of the time series table on PostgreSQL
+    (see migration 0010_partition_time_series).
+
+    Partitions are named <table>_y<YYYY> (yearly) or <table>_m<YYYY>_<MM> (monthly)
+    and cover [start, end) of their period; rows outside every partition land in
+    <table>_default until a partition for their period is created. On other databases
+    (or before the migration) every method is a no-op.
+    """
+
+    YEAR = "year"
+    MONTH = "month"
+
+    _BOUND_RE = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+    @staticmethod
+    def is_partitioned(table: str = TimeSeries._meta.db_table) -> bool:
+        if connection.vendor != "postgresql":
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+            row = cursor.fetchone()
+        return bool(row) and row[0] == "p"
+
+    @staticmethod
+    def period_bounds(day: date, granularity: str = YEAR) -> Tuple[date, date]:
+        """
+        [start, end) of the yearly or monthly partition period containing day.
+        """
+        if granularity == TimeSeriesPartitionRepository.YEAR:
+            return date(day.year, 1, 1), date(day.year + 1, 1, 1)
+        if granularity == TimeSeriesPartitionRepository.MONTH:
+            start = date(day.year, day.month, 1)
+            end = date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+            return start, end
+        raise ValueError(f"Invalid partition granularity '{granularity}'. Use 'year' or 'month'.")
+
+    @staticmethod
+    def partition_name(table: str, start: date, granularity: str = YEAR) -> str:
+        if granularity == TimeSeriesPartitionRepository.YEAR:
+            return f"{table}_y{start.year}"
+        return f"{table}_m{start.year}_{start.month:02d}"
+
+    @staticmethod
+    def list_partitions(table: str = TimeSeries._meta.db_table) -> List[Tuple[str, Optional[date], Optional[date]]]:
+        """
+        (name, start, end) of every partition of the table, ordered by start. The
+        default partition is reported with start and end None.
+        """
+        if not TimeSeriesPartitionRepository.is_partitioned(table):
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(%s)",
+                [table]
+            )
+            rows = cursor.fetchall()
+
+        partitions = []
+        for name, bound in rows:
+            match = TimeSeriesPartitionRepository._BOUND_RE.search(bound)
+            if match:
+                partitions.append((name, date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))))
+            else:
+                partitions.append((name, None, None))
+        return sorted(partitions, key=lambda partition: (partition[1] is None, partition[1] or date.min))
+
+    @staticmethod
+    def plan_partitions(
+        start: date,
+        end: date,
+        granularity: str,
+        existing: List[Tuple[date, date]]
+    ) -> List[Tuple[date, date, str]]:
+        """
+        Periods to create so every day between start and end (inclusive) has a partition,
+        given the [start, end) bounds of the existing ones. Periods already covered are
+        skipped (e.g. months inside a yearly partition of migration 0010); a year partly
+        covered by monthly partitions is completed with the missing months.
+        :return: (start, end, granularity) of each partition to create.
+        :raises ValueError: When a month partly overlaps an existing partition.
+        """
+        def overlaps(period_start, period_end):
+            return [(s, e) for s, e in existing if s < period_end and period_start < e]
+
+        plan = []
+        period_start, _ = TimeSeriesPartitionRepository.period_bounds(start, granularity)
+        while period_start <= end:
+            _, period_end = TimeSeriesPartitionRepository.period_bounds(period_start, granularity)
+            overlapping = overlaps(period_start, period_end)
+
+            if not overlapping:
+                plan.append((period_start, period_end, granularity))
+            elif any(s <= period_start and period_end <= e for s, e in overlapping):
+                pass    # Already covered by one partition
+            elif granularity == TimeSeriesPartitionRepository.YEAR:
+                plan += TimeSeriesPartitionRepository.plan_partitions(
+                    period_start, period_end - timedelta(days=1), TimeSeriesPartitionRepository.MONTH, existing
+                )
+            else:
+                ranges = ", ".join(f"[{s}, {e})" for s, e in overlapping)
+                raise ValueError(
+                    f"Partition period [{period_start}, {period_end}) partly overlaps the existing partitions {ranges}."
+                )
+
+            period_start = period_end
+
+        return plan
+
+    @staticmethod
+    def ensure_partitions(
+        start: date,
+        end: date,
+        granularity: str = YEAR,
+        table: str = TimeSeries._meta.db_table
+    ) -> List[str]:
+        """
+        Create the missing partitions of every period between start and end (inclusive),
+        skipping the periods covered by existing partitions (see plan_partitions).
+        Rows of a new period already stored in the default partition are moved into it.
+        :return: Names of the partitions created.
+        :raises ValueError: When a requested period partly overlaps an existing partition.
+        """
+        if not TimeSeriesPartitionRepository.is_partitioned(table):
+            return []
+
+        partitions = TimeSeriesPartitionRepository.list_partitions(table)
+        has_default = any(period_start is None for _, period_start, _ in partitions)
+        plan = TimeSeriesPartitionRepository.plan_partitions(
+            start, end, granularity, [(s, e) for _, s, e in partitions if s is not None]
+        )
+        default = f"{table}_default"
+        quote = connection.ops.quote_name
+
+        created = []
+        for period_start, period_end, period_granularity in plan:
+            name = TimeSeriesPartitionRepository.partition_name(table, period_start, period_granularity)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS)")
+                if has_default:
+                    cursor.execute(
+                        f"WITH moved AS (DELETE FROM {quote(default)} WHERE date >= %s AND date < %s RETURNING *) "
+                        f"INSERT INTO {quote(name)} SELECT * FROM moved",
+                        [period_start, period_end]
+                    )
+                cursor.execute(
+                    f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)",
+                    [period_start, period_end]
+                )
+            created.append(name)
+
+        return created
+
+    @staticmethod
+    def drop_partitions_before(cutoff: date, table: str = TimeSeries._meta.db_table) -> List[str]:
+        """
+        Drop every partition that ends on or before cutoff: detaching and dropping a
+        partition is instant, unlike deleting its rows. Rows before cutoff in the
+        partition that contains it (or in the default partition) are kept.
+        :return: Names of the partitions dropped.
+        """
+        quote = connection.ops.quote_name
+        dropped = []
+        for name, _, end in TimeSeriesPartitionRepository.list_partitions(table):
+            if end is None or end > cutoff:
+                continue
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+                cursor.execute(f"DROP TABLE {quote(name)}")
+            dropped.append(name)
+        return dropped
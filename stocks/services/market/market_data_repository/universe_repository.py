@@ -0,0 +1,116 @@
+from typing import List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from stocks.dataclasses import AssetType, MarketTicker, UniverseDiff
+from stocks.models import FinancialAsset, TickerUniverse
+from stocks.services.market.market_data_repository.data_version_repository import DataVersionRepository
+
+
+class UniverseRepository:
+    """
+    Persists scraped ticker universes and keeps FinancialAsset membership in sync
+    with them, touching only the constituents that changed.
+    """
+
+    @staticmethod
+    def get_snapshot(name: str) -> Optional[TickerUniverse]:
+        return TickerUniverse.objects.filter(name=name).first()
+
+    @staticmethod
+    def to_tickers(snapshot: TickerUniverse) -> List[MarketTicker]:
+        return [MarketTicker(symbol=symbol, name=name) for symbol, name in snapshot.members]
+
+    @staticmethod
+    def touch_snapshot(name: str):
+        """
+        Mark a snapshot as revalidated (the upstream answered 304 Not Modified).
+        """
+        TickerUniverse.objects.filter(name=name).update(checked_at=timezone.now())
+
+    @staticmethod
+    def diff(previous: List[MarketTicker], current: List[MarketTicker]) -> UniverseDiff:
+        previous_symbols = {ticker.symbol for ticker in previous}
+        current_symbols = {ticker.symbol for ticker in current}
+        return UniverseDiff(
+            added=[ticker for ticker in current if ticker.symbol not in previous_symbols],
+            removed=sorted(previous_symbols - current_symbols)
+        )
+
+    @staticmethod
+    def save_snapshot(
+        name: str,
+        asset_type: AssetType,
+        tickers: List[MarketTicker],
+        etag: str = "",
+        last_modified: str = ""
+    ) -> UniverseDiff:
+        """
+        Store a freshly parsed universe and apply its membership diff against the
+        previous snapshot: added constituents get an active FinancialAsset, removed
+        ones are deactivated. Unchanged constituents are not touched. Without a previous
+        snapshot, the stored active assets of the type are diffed instead, so assets that
+        are not members are deactivated on the first run too.
+        :return: The membership diff.
+        """
+        snapshot = UniverseRepository.get_snapshot(name)
+        if snapshot:
+            previous = UniverseRepository.to_tickers(snapshot)
+        else:
+            # First snapshot: the active assets already stored stand for the previous universe
+            previous = UniverseRepository.active_assets(asset_type)
+        diff = UniverseRepository.diff(previous, tickers)
+
+        with transaction.atomic():
+            TickerUniverse.objects.update_or_create(
+                name=name,
+                defaults={
+                    "members": [[ticker.symbol, ticker.name] for ticker in tickers],
+                    "etag": etag or "",
+                    "last_modified": last_modified or "",
+                    "checked_at": timezone.now()
+                }
+            )
+            UniverseRepository.apply_diff(asset_type, diff)
+
+        return diff
+
+    @staticmethod
+    def _asset_type_value(asset_type: AssetType) -> str:
+        return "currency" if asset_type == AssetType.FOREX else asset_type.value
+
+    @staticmethod
+    def active_assets(asset_type: AssetType) -> List[MarketTicker]:
+        return [
+            MarketTicker(symbol=ticker, name=name)
+            for ticker, name in FinancialAsset.objects.filter(
+                asset_type=UniverseRepository._asset_type_value(asset_type), is_active=True
+            ).order_by("ticker").values_list("ticker", "name")
+        ]
+
+    @staticmethod
+    def apply_diff(asset_type: AssetType, diff: UniverseDiff):
+        """
+        Create or reactivate the added assets and deactivate the removed ones.
+        """
+        asset_type_value = UniverseRepository._asset_type_value(asset_type)
+
+        if diff.added:
+            added_symbols = [ticker.symbol for ticker in diff.added]
+            FinancialAsset.objects.bulk_create(
+                [
+                    FinancialAsset(ticker=ticker.symbol, name=ticker.name, asset_type=asset_type_value)
+                    for ticker in diff.added
+                ],
+                ignore_conflicts=True
+            )
+            # Former constituents coming back to the universe
+            FinancialAsset.objects.filter(ticker__in=added_symbols, is_active=False).update(is_active=True)
+
+        if diff.removed:
+            FinancialAsset.objects.filter(ticker__in=diff.removed).update(is_active=False)
+
+        if diff.added or diff.removed:
+            # Membership filters the metrics listings
+            DataVersionRepository.bump_metrics(asset_type)
@@ -0,0 +1,110 @@
+import uuid
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from stocks.dataclasses import AssetType, TimeSeriesBatch
+
+
+def _pyarrow():
+    """
+    pyarrow is an optional dependency, only needed by the staging mode.
+    """
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet staging requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+class TimeSeriesStaging:
+    """
+    Parquet staging area between fetch and load.
+
+    Transformed time series batches are appended as Parquet files to a hive-partitioned
+    dataset (asset_type=<type>/month=<YYYY-MM>/part-*.parquet) instead of being written
+    to the database, so downloads survive failed DB writes and a backfill can be loaded
+    (again) into any database with MarketDataRepository.copy_time_series.
+    Bars are partitioned by month rather than by day to keep the number of files low.
+    """
+
+    COLUMNS = ["symbol", "date", "open_price", "high_price", "low_price", "close_price", "volume", "staged_at"]
+
+    @staticmethod
+    def write_batches(root: str, batches: List[TimeSeriesBatch]) -> int:
+        """
+        Append the batches to the staging dataset under root.
+        :return: Number of bars staged.
+        """
+        pa = _pyarrow()
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return 0
+
+        staged_at = datetime.now(timezone.utc)
+        dates = pd.to_datetime(np.concatenate([batch.dates for batch in batches]))
+        frame = pd.DataFrame({
+            "asset_type": np.concatenate([[batch.asset_type.value] * len(batch) for batch in batches]),
+            "symbol": np.concatenate([[batch.symbol] * len(batch) for batch in batches]),
+            "date": dates.date,
+            "month": dates.strftime("%Y-%m"),
+            "open_price": np.concatenate([batch.open_prices for batch in batches]),
+            "high_price": np.concatenate([batch.high_prices for batch in batches]),
+            "low_price": np.concatenate([batch.low_prices for batch in batches]),
+            "close_price": np.concatenate([batch.close_prices for batch in batches]),
+            "volume": np.concatenate([batch.volumes for batch in batches]),
+            "staged_at": staged_at,
+        })
+
+        pa.dataset.write_dataset(
+            pa.Table.from_pandas(frame, preserve_index=False),
+            root,
+            format="parquet",
+            partitioning=["asset_type", "month"],
+            partitioning_flavor="hive",
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore"
+        )
+        return len(frame)
+
+    @staticmethod
+    def partitions(
+        root: str,
+        asset_type: Optional[AssetType] = None,
+        since: Optional[date] = None
+    ) -> List[Tuple[AssetType, str]]:
+        """
+        List the staged (asset type, month) partitions, optionally filtered.
+        """
+        partitions = []
+        for month_dir in sorted(Path(root).glob("asset_type=*/month=*")):
+            partition_type = AssetType(month_dir.parent.name.split("=", 1)[1])
+            month = month_dir.name.split("=", 1)[1]
+            if asset_type and partition_type != asset_type:
+                continue
+            if since and month < since.strftime("%Y-%m"):
+                continue
+            partitions.append((partition_type, month))
+        return partitions
+
+    @staticmethod
+    def read_partition(root: str, asset_type: AssetType, month: str) -> pd.DataFrame:
+        """
+        Read one partition as a frame with one row per (symbol, date): when a bar was
+        staged several times, the most recently staged version wins.
+        """
+        pa = _pyarrow()
+        path = Path(root) / f"asset_type={asset_type.value}" / f"month={month}"
+        frame = pa.dataset.dataset(str(path), format="parquet").to_table(columns=TimeSeriesStaging.COLUMNS).to_pandas()
+
+        return (
+            frame.sort_values("staged_at", kind="stable")
+            .drop_duplicates(["symbol", "date"], keep="last")
+            .drop(columns="staged_at")
+            .reset_index(drop=True)
+        )
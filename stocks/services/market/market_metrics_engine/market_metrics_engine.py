@@ -0,0 +1,163 @@
+import dataclasses
+import warnings
+from datetime import timedelta
+from typing import List
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+from stocks.dataclasses import DerivedMetricsData
+from stocks.models import FinancialAsset, TimeSeries
+
+
+class MarketMetricsEngine:
+    """
+    Derives the historical metrics (5d, 1mo, YTD and 5y changes, 52-week high/low)
+    from the daily closes already stored in TimeSeries, without any upstream call.
+    The whole universe is loaded into (assets x dates) NumPy matrices and every
+    window is computed in one vectorized pass.
+    """
+
+    # Extra calendar days loaded on top of 5 years so the 5y window always has an anchor
+    HISTORY_MARGIN_DAYS = 10
+
+    @staticmethod
+    def load_price_matrices(symbols: List[str]):
+        """
+        Load the stored daily closes, highs and lows of the given symbols.
+        :return: (symbols, dates, closes, highs, lows) where dates is a sorted
+                 datetime64[D] array and each price matrix has one row per symbol
+                 and NaN where the asset has no bar for that date.
+        """
+        since = timezone.now().date() - timedelta(days=5 * 366 + MarketMetricsEngine.HISTORY_MARGIN_DAYS)
+
+        assets = dict(FinancialAsset.objects.filter(ticker__in=symbols).values_list("id", "ticker"))
+        rows = list(
+            TimeSeries.objects
+            .filter(asset_id__in=list(assets), date__gte=since)
+            .order_by()
+            .values_list("asset_id", "date", "close_price", "high_price", "low_price")
+        )
+
+        row_symbols = sorted(assets.values())
+        if not rows:
+            empty = np.empty((len(row_symbols), 0))
+            return row_symbols, np.array([], dtype="datetime64[D]"), empty, empty.copy(), empty.copy()
+
+        asset_ids, dates, closes, highs, lows = zip(*rows)
+
+        position = {ticker: i for i, ticker in enumerate(row_symbols)}
+        row_of_asset = {asset_id: position[ticker] for asset_id, ticker in assets.items()}
+        row_index = np.fromiter((row_of_asset[a] for a in asset_ids), dtype=np.intp, count=len(rows))
+        unique_dates, column_index = np.unique(np.array(dates, dtype="datetime64[D]"), return_inverse=True)
+
+        matrices = []
+        for values in (closes, highs, lows):
+            matrix = np.full((len(row_symbols), len(unique_dates)), np.nan)
+            matrix[row_index, column_index] = np.array(values, dtype=float)
+            matrices.append(matrix)
+
+        return (row_symbols, unique_dates, *matrices)
+
+    @staticmethod
+    def _first_valid_on_or_after(valid: np.ndarray, dates: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+        """
+        Column of the first valid bar on or after each row's threshold date (-1 when none).
+        """
+        mask = valid & (dates[None, :] >= thresholds[:, None])
+        return np.where(mask.any(axis=1), mask.argmax(axis=1), -1)
+
+    @staticmethod
+    def compute(symbols: List[str]) -> dict[str, DerivedMetricsData]:
+        """
+        Compute the derived metrics of every given symbol with stored bars.
+        Windows are anchored on each asset's own last stored session and follow
+        MarketDataTransformer.compute_period_changes semantics.
+        """
+        row_symbols, dates, closes, highs, lows = MarketMetricsEngine.load_price_matrices(symbols)
+        if dates.size == 0:
+            return {}
+
+        valid = ~np.isnan(closes)
+        has_data = valid.any(axis=1)
+        rows = np.arange(len(row_symbols))
+
+        # Last valid session per asset
+        last_col = valid.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+        last_close = closes[rows, last_col]
+        last_dates = pd.DatetimeIndex(dates[last_col])
+
+        # 5d: the 5th most recent valid session
+        valid_count = valid.cumsum(axis=1)
+        five_back = valid & (valid_count >= (valid_count[:, -1] - 4)[:, None])
+        anchors = {"5d": five_back.argmax(axis=1)}
+
+        thresholds = {
+            "1m": (last_dates - pd.DateOffset(months=1)).values.astype("datetime64[D]"),
+            "ytd": dates[last_col].astype("datetime64[Y]").astype("datetime64[D]"),
+            "5y": (last_dates - pd.DateOffset(years=5)).values.astype("datetime64[D]"),
+        }
+        for window, threshold in thresholds.items():
+            anchors[window] = MarketMetricsEngine._first_valid_on_or_after(valid, dates, threshold)
+
+        changes = {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for window, anchor in anchors.items():
+                first_close = np.where(anchor >= 0, closes[rows, np.maximum(anchor, 0)], np.nan)
+                changes[window] = (last_close - first_close) / first_close * 100
+
+        week52_start = (dates[last_col] - np.timedelta64(365, "D"))
+        in_week52 = valid & (dates[None, :] > week52_start[:, None])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+            week52_high = np.nanmax(np.where(in_week52, highs, np.nan), axis=1)
+            week52_low = np.nanmin(np.where(in_week52, lows, np.nan), axis=1)
+
+        def clean(value):
+            return float(value) if np.isfinite(value) else None
+
+        return {
+            symbol: DerivedMetricsData(
+                symbol=symbol,
+                last_close=clean(last_close[i]),
+                change_5d_percent=clean(changes["5d"][i]),
+                change_1m_percent=clean(changes["1m"][i]),
+                change_ytd_percent=clean(changes["ytd"][i]),
+                change_5y_percent=clean(changes["5y"][i]),
+                week52_high=clean(week52_high[i]),
+                week52_low=clean(week52_low[i]),
+            )
+            for i, symbol in enumerate(row_symbols)
+            if has_data[i]
+        }
+
+    @staticmethod
+    def apply(metrics, derived: DerivedMetricsData | None):
+        """
+        Overlay the derived values on a StockMetricsData, ETFMetricsData or
+        CurrencyMetricsData object fetched without history.
+        """
+        if derived is None:
+            return metrics
+
+        values = {
+            "change_5d_percent": derived.change_5d_percent,
+            "change_1m_percent": derived.change_1m_percent,
+            "change_ytd_percent": derived.change_ytd_percent,
+            "change_5y_percent": derived.change_5y_percent,
+        }
+        field_names = {field.name for field in dataclasses.fields(metrics)}
+
+        if "week52_high" in field_names:
+            values.update(week52_high=derived.week52_high, week52_low=derived.week52_low)
+        if "fifty_two_week_high" in field_names:
+            values.update(fifty_two_week_high=derived.week52_high, fifty_two_week_low=derived.week52_low)
+
+        if "exchange_rate" in field_names and metrics.exchange_rate is None:
+            values["exchange_rate"] = derived.last_close
+
+        # Never replace an upstream value with a missing derived one
+        values = {name: value for name, value in values.items() if value is not None}
+
+        return dataclasses.replace(metrics, **values)
@@ -1,3 +1,1221 @@
-from django.test import TestCase
+"""
+Tests for the stocks market data pipeline.
+"""
 
-# Create your tests here.
+import io
+import json
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from stocks.benchmarks.synthetic_market_data import SyntheticMarketDataFetcher
+from stocks.dataclasses import AssetType, ETFMetricsData, MarketTicker, StockMetricsData, TimeSeriesBatch, TimeSeriesData
+from stocks.dtos.dtos import TimeSeriesDTO
+from stocks.dtos.time_series_dto_mapper import TimeSeriesDTOMapper
+from stocks.models import ETFMetrics, FinancialAsset, IntradayBar, PipelineProgress, StockMetrics, TickerUniverse, TimeSeries, TimeSeriesRollup
+from stocks.renderers.time_series_renderers import ColumnarTimeSeriesRenderer, PackedTimeSeriesRenderer
+from stocks.services.market.concurrency.concurrent_fetch_executor import ConcurrentFetchExecutor
+from stocks.services.market.concurrency.rate_limiter import TokenBucketRateLimiter
+from stocks.services.market.concurrency.shared_upstream_budget import SharedUpstreamBudget
+from stocks.services.market.concurrency.single_flight import SingleFlight
+from stocks.services.market.concurrency.staged_pipeline import StagedPipeline
+from stocks.services.market.concurrency.upstream_budget import UpstreamBudget
+from stocks.services.market.concurrency.upstream_health import CircuitOpenError, UpstreamHealthController
+from stocks.services.market.downsampling.time_series_downsampler import TimeSeriesDownsampler
+from stocks.services.market.instrumentation.pipeline_instrumentation import PipelineInstrumentation
+from stocks.services.market.market_data_fetcher.live_time_series_fetcher import LiveTimeSeriesFetcher, UpstreamBudgetExhausted
+from stocks.services.market.market_data_fetcher.market_data_fetcher import MarketDataFetcher
+from stocks.services.market.market_data_fetcher.market_data_transformer import MarketDataTransformer
+from stocks.services.market.market_data_fetcher.response_store import ResponseStore
+from stocks.services.market.market_data_provider.market_ticket_provider import MarketTickerProvider
+from stocks.services.market.market_data_pipeline import MarketDataPipeline
+from stocks.services.market.market_data_repository.data_version_repository import DataVersionRepository
+from stocks.services.market.market_data_repository.intraday_repository import IntradayRepository
+from stocks.services.market.market_data_repository.market_data_repository import MarketDataRepository
+from stocks.services.market.market_data_repository.pipeline_progress_repository import PipelineProgressRepository
+from stocks.services.market.market_data_repository.rollup_repository import RollupRepository
+from stocks.services.market.market_data_repository.time_series_partition_repository import TimeSeriesPartitionRepository
+from stocks.services.market.market_data_staging.time_series_staging import TimeSeriesStaging
+from stocks.services.market.market_metrics_engine.market_metrics_engine import MarketMetricsEngine
+from stocks.views import StockMetricDetailView, TimeSeriesView
+
+
+def build_bars(symbol, start, days, close=10.0, asset_type=AssetType.STOCK):
+    """Build consecutive daily TimeSeriesData bars with a constant close."""
+    return [
+        TimeSeriesData(
+            asset_type=asset_type,
+            symbol=symbol,
+            date=datetime.combine(start + timedelta(days=offset), datetime.min.time()),
+            open_price=close,
+            close_price=close,
+            high_price=close,
+            low_price=close,
+            volume=100
+        )
+        for offset in range(days)
+    ]
+
+
+def build_multi_ticker_frame(symbols, days=5, group_by_ticker=True):
+    """Build a yfinance-like multi-ticker OHLCV frame with deterministic prices."""
+    index = pd.date_range("2024-01-01", periods=days, freq="D", name="Date")
+    fields = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+    data = {}
+    for offset, symbol in enumerate(symbols):
+        base = np.arange(days, dtype=float) + 100 * (offset + 1)
+        for field in fields:
+            key = (symbol, field) if group_by_ticker else (field, symbol)
+            data[key] = base * 10 if field == "Volume" else base
+    frame = pd.DataFrame(data, index=index)
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+    return frame
+
+
+class SplitMultiTickerFrameTestCase(SimpleTestCase):
+    """Tests for MarketDataTransformer.split_multi_ticker_frame"""
+
+    def test_split_ticker_first_layout(self):
+        raw = build_multi_ticker_frame(["AAPL", "MSFT"])
+
+        frames = MarketDataTransformer.split_multi_ticker_frame(raw, ["AAPL", "MSFT"])
+
+        self.assertEqual(set(frames), {"AAPL", "MSFT"})
+        self.assertEqual(frames["MSFT"]["Close"].iloc[0], 200.0)
+
+    def test_split_price_first_layout(self):
+        raw = build_multi_ticker_frame(["AAPL", "MSFT"], group_by_ticker=False)
+
+        frames = MarketDataTransformer.split_multi_ticker_frame(raw, ["AAPL", "MSFT"])
+
+        self.assertEqual(frames["AAPL"]["Close"].iloc[-1], 104.0)
+
+    def test_split_drops_non_trading_rows_and_missing_symbols(self):
+        raw = build_multi_ticker_frame(["EURUSD=X", "USDJPY=X"])
+        raw.loc[raw.index[0], ("USDJPY=X", "Close")] = np.nan
+
+        frames = MarketDataTransformer.split_multi_ticker_frame(raw, ["EURUSD=X", "USDJPY=X", "GBPUSD=X"])
+
+        self.assertNotIn("GBPUSD=X", frames)
+        self.assertEqual(len(frames["USDJPY=X"]), 4)
+
+        series = MarketDataTransformer.transform_time_series("USDJPY=X", AssetType.FOREX, frames["USDJPY=X"])
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series[0].close_price, 201.0)
+
+
+class IncrementalWindowTestCase(TestCase):
+    """Tests for the incremental download planning of MarketDataPipeline"""
+
+    def setUp(self):
+        asset = FinancialAsset.objects.create(name="Apple", ticker="AAPL", asset_type="stock")
+        for day in (date(2024, 3, 1), date(2024, 3, 4)):
+            TimeSeries.objects.create(
+                asset=asset, date=day, open_price=1, high_price=1,
+                low_price=1, close_price=1, volume=1
+            )
+
+    def test_full_mode_downloads_every_symbol_for_the_period(self):
+        windows = MarketDataPipeline._plan_download_windows(["AAPL", "MSFT"], incremental=False)
+
+        self.assertEqual(windows, {None: ["AAPL", "MSFT"]})
+
+    def test_incremental_mode_starts_after_last_stored_bar_with_overlap(self):
+        windows = MarketDataPipeline._plan_download_windows(["AAPL", "MSFT"], incremental=True, overlap_days=3)
+
+        self.assertEqual(windows, {
+            date(2024, 3, 4) - timedelta(days=3): ["AAPL"],
+            None: ["MSFT"],
+        })
+
+
+class SaveTimeSeriesTestCase(TestCase):
+    """Tests for the bulk upsert in MarketDataRepository.save_time_series"""
+
+    def test_first_load_inserts_every_bar(self):
+        result = MarketDataRepository.save_time_series(build_bars("AAPL", date(2024, 1, 1), 10))
+
+        self.assertEqual((result.inserted, result.updated), (10, 0))
+        self.assertEqual(TimeSeries.objects.filter(asset__ticker="AAPL").count(), 10)
+
+    def test_overlapping_load_updates_existing_bars(self):
+        MarketDataRepository.save_time_series(build_bars("AAPL", date(2024, 1, 1), 10))
+
+        result = MarketDataRepository.save_time_series(build_bars("AAPL", date(2024, 1, 6), 10, close=11.0))
+
+        self.assertEqual((result.inserted, result.updated), (5, 5))
+        self.assertEqual(TimeSeries.objects.get(asset__ticker="AAPL", date=date(2024, 1, 10)).close_price, 11)
+
+    def test_statements_do_not_grow_with_rows(self):
+        MarketDataRepository.save_time_series(build_bars("AAPL", date(2024, 1, 1), 1))
+
+        # asset lookup + savepoint, select stored bars, insert, release savepoint + data version bump
+        with self.assertNumQueries(6):
+            MarketDataRepository.save_time_series(build_bars("AAPL", date(2024, 1, 1), 100))
+
+    def test_unchanged_bars_are_not_rewritten(self):
+        bars = build_bars("AAPL", date(2024, 1, 1), 10, close=10.1234567)
+        MarketDataRepository.save_time_series(bars)
+
+        # Only the stored bars are read back: no insert statement
+        with self.assertNumQueries(4):
+            result = MarketDataRepository.save_time_series(bars)
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (0, 0, 10))
+
+        bars[3].volume = 999
+        result = MarketDataRepository.save_time_series(bars + build_bars("AAPL", date(2024, 1, 11), 1))
+
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (1, 1, 9))
+        self.assertEqual(TimeSeries.objects.get(asset__ticker="AAPL", date=date(2024, 1, 4)).volume, 999)
+
+
+class ComputePeriodChangesTestCase(SimpleTestCase):
+    """Tests for MarketDataTransformer.compute_period_changes"""
+
+    def setUp(self):
+        index = pd.bdate_range("2019-07-01", "2024-06-28", name="Date")
+        self.history = pd.DataFrame({"Close": np.arange(1, len(index) + 1, dtype=float)}, index=index)
+        self.closes = self.history["Close"]
+
+    def expected_change(self, first_close):
+        return (self.closes.iloc[-1] - first_close) / first_close * 100
+
+    def test_all_windows_from_one_frame(self):
+        changes = MarketDataTransformer.compute_period_changes(self.history)
+
+        self.assertAlmostEqual(changes["change_5d_percent"], self.expected_change(self.closes.iloc[-5]))
+        self.assertAlmostEqual(changes["change_1mo_percent"], self.expected_change(self.closes["2024-05-28"]))
+        self.assertAlmostEqual(changes["change_ytd_percent"], self.expected_change(self.closes["2024-01-01"]))
+        self.assertAlmostEqual(changes["change_5y_percent"], self.expected_change(self.closes.iloc[0]))
+
+    def test_short_or_empty_history(self):
+        self.assertEqual(MarketDataTransformer.compute_period_changes(pd.DataFrame()), {})
+
+        changes = MarketDataTransformer.compute_period_changes(self.history.tail(3))
+        self.assertAlmostEqual(changes["change_5d_percent"], self.expected_change(self.closes.iloc[-3]))
+
+
+class MarketMetricsEngineTestCase(TestCase):
+    """Tests for the metrics derived locally from stored TimeSeries"""
+
+    def setUp(self):
+        index = pd.bdate_range(end=date.today(), periods=500, name="Date")
+        self.history = pd.DataFrame({"Close": np.linspace(50, 150, len(index))}, index=index)
+
+        for symbol, asset_type in (("AAPL", AssetType.STOCK), ("SPY", AssetType.ETF)):
+            MarketDataRepository.save_time_series([
+                TimeSeriesData(
+                    asset_type=asset_type, symbol=symbol, date=day.to_pydatetime(),
+                    open_price=close, close_price=close, high_price=close + 1,
+                    low_price=close - 1, volume=100
+                )
+                for day, close in self.history["Close"].items()
+            ])
+
+    def test_changes_match_single_history_computation(self):
+        derived = MarketMetricsEngine.compute(["AAPL", "SPY", "MSFT"])
+        expected = MarketDataTransformer.compute_period_changes(self.history)
+
+        self.assertEqual(set(derived), {"AAPL", "SPY"})
+        aapl = derived["AAPL"]
+        self.assertAlmostEqual(aapl.change_5d_percent, expected["change_5d_percent"], places=4)
+        self.assertAlmostEqual(aapl.change_1m_percent, expected["change_1mo_percent"], places=4)
+        self.assertAlmostEqual(aapl.change_ytd_percent, expected["change_ytd_percent"], places=4)
+        self.assertAlmostEqual(aapl.change_5y_percent, expected["change_5y_percent"], places=4)
+        self.assertAlmostEqual(aapl.week52_high, 151.0, places=4)
+
+    def test_bulk_write_and_overlay(self):
+        derived = MarketMetricsEngine.compute(["AAPL", "SPY"])
+
+        self.assertEqual(MarketDataRepository.save_derived_metrics(AssetType.STOCK, [derived["AAPL"]]), 1)
+        MarketDataRepository.save_derived_metrics(AssetType.ETF, [derived["SPY"]])
+
+        self.assertAlmostEqual(StockMetrics.objects.get(asset__ticker="AAPL").change_5y_percent, 200.0, places=4)
+        self.assertAlmostEqual(ETFMetrics.objects.get(asset__ticker="SPY").week52_high, 151.0, places=4)
+
+        metrics = MarketMetricsEngine.apply(ETFMetricsData(symbol="SPY", week52_low=1.0), derived["SPY"])
+        self.assertAlmostEqual(metrics.change_5y_percent, 200.0, places=4)
+        self.assertNotEqual(metrics.week52_low, 1.0)
+
+
+class ConcurrentFetchTestCase(SimpleTestCase):
+    """Tests for the token bucket and the concurrent fetch executor"""
+
+    def test_rate_limiter_throttles_after_burst(self):
+        limiter = TokenBucketRateLimiter(rate=50, capacity=5)
+
+        started = time.monotonic()
+        for _ in range(10):
+            limiter.acquire()
+
+        # 5 tokens of burst, then 5 more at 50/s
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_executor_yields_results_and_errors(self):
+        def fetch(value):
+            if value == 3:
+                raise RuntimeError("throttled")
+            return value * 2
+
+        executor = ConcurrentFetchExecutor(workers=4, rate_limiter=TokenBucketRateLimiter(rate=0))
+        results = {item: (result, error) for item, result, error in executor.map(fetch, range(20))}
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[5], (10, None))
+        self.assertIsInstance(results[3][1], RuntimeError)
+
+
+class SaveMetricsBatchTestCase(TestCase):
+    """Tests for MarketDataRepository.save_metrics_batch"""
+
+    def test_batch_creates_assets_and_upserts(self):
+        written = MarketDataRepository.save_metrics_batch(AssetType.STOCK, [
+            StockMetricsData(symbol="AAPL", price=10.0, sector="Tech"),
+            StockMetricsData(symbol="MSFT", price=20.0),
+        ])
+        MarketDataRepository.save_metrics_batch(AssetType.STOCK, [StockMetricsData(symbol="AAPL", price=11.0)])
+
+        self.assertEqual(written, 2)
+        self.assertEqual(FinancialAsset.objects.get(ticker="MSFT").asset_type, "stock")
+        self.assertEqual(StockMetrics.objects.count(), 2)
+        self.assertEqual(StockMetrics.objects.get(asset__ticker="AAPL").price, 11.0)
+
+
+class StagedPipelineTestCase(SimpleTestCase):
+    """Tests for the fetch -> transform -> write StagedPipeline"""
+
+    def test_every_item_reaches_the_writer_in_batches(self):
+        batches = []
+
+        def fetch(item):
+            if item == 7:
+                raise RuntimeError("boom")
+            return item
+
+        pipeline = StagedPipeline(
+            fetch_func=fetch,
+            transform_func=lambda item, raw: [raw, raw],
+            write_func=batches.append,
+            fetch_workers=3,
+            queue_size=2,
+            write_batch_size=4,
+            on_error=lambda item, error: [-item]
+        )
+        stats = pipeline.run(range(10))
+
+        written = sorted(unit for batch in batches for unit in batch)
+        self.assertEqual(written, sorted([i for i in range(10) if i != 7] * 2 + [-7]))
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        self.assertEqual(stats["fetch"].items, 10)
+        self.assertEqual(stats["write"].items, 19)
+        self.assertEqual([(stage, item) for stage, item, _ in pipeline.failures], [("fetch", 7)])
+
+    def test_failing_on_error_does_not_hang_the_run(self):
+        def fetch(item):
+            if item % 3 == 0:
+                raise RuntimeError("boom")
+            return item
+
+        def on_error(item, error):
+            raise ValueError("on_error failed")
+
+        pipeline = StagedPipeline(
+            fetch_func=fetch,
+            transform_func=lambda item, raw: [raw],
+            write_func=lambda units: None,
+            fetch_workers=2,
+            queue_size=1,
+            on_error=on_error
+        )
+        runner = threading.Thread(target=pipeline.run, args=(range(20),), daemon=True)
+        runner.start()
+        runner.join(timeout=10)
+
+        self.assertFalse(runner.is_alive())
+        self.assertEqual(pipeline.stats["write"].items, 13)
+        self.assertEqual(sorted(item for stage, item, _ in pipeline.failures if stage == "on_error"), [0, 3, 6, 9, 12, 15, 18])
+
+
+class TimeSeriesJobTestCase(TestCase):
+    """End-to-end test of the time series job with a fake multi-ticker download"""
+
+    @patch("stocks.services.market.market_data_pipeline.MarketDataFetcher.download_time_series_frame")
+    def test_job_stores_every_ticker_with_data(self, download):
+        download.side_effect = lambda symbols, *args: build_multi_ticker_frame(
+            [s for s in symbols if s != "MISSING"]
+        )
+        tickers = [MarketTicker(symbol=s, name=s) for s in ("AAPL", "MSFT", "MISSING", "NVDA")]
+
+        MarketDataPipeline._update_time_series_for_asset_type(
+            asset_type=AssetType.STOCK,
+            get_tickers_func=lambda: tickers,
+            period="5d",
+            interval="1d",
+            batch_size=2,
+            workers=2,
+            rate=0
+        )
+
+        self.assertEqual(download.call_count, 2)
+        self.assertEqual(TimeSeries.objects.count(), 15)
+        self.assertFalse(FinancialAsset.objects.filter(ticker="MISSING").exists())
+
+
+class ColumnarTransformerTestCase(SimpleTestCase):
+    """Tests for MarketDataTransformer.transform_time_series_columnar"""
+
+    def test_single_ticker_multiindex_matches_row_values(self):
+        raw = build_multi_ticker_frame(["AAPL"], group_by_ticker=False)
+
+        batch = MarketDataTransformer.transform_time_series_columnar("AAPL", AssetType.STOCK, raw)
+        records = batch.to_records()
+
+        self.assertEqual(len(batch), 5)
+        self.assertEqual(records[2].close_price, 102.0)
+        self.assertEqual(records[2].volume, 1020)
+        self.assertEqual(records[2].date, datetime(2024, 1, 3))
+        self.assertIsInstance(records[2].volume, int)
+
+    def test_batch_round_trip(self):
+        bars = build_bars("AAPL", date(2024, 1, 1), 3, close=12.5)
+
+        records = TimeSeriesBatch.from_records(bars).to_records()
+
+        self.assertEqual(records, bars)
+
+
+class PipelineResumeTestCase(TestCase):
+    """Tests for the per-ticker checkpoints and --resume"""
+
+    def run_job(self, tickers, resume):
+        MarketDataPipeline._update_time_series_for_asset_type(
+            asset_type=AssetType.STOCK,
+            get_tickers_func=lambda: tickers,
+            period="5d",
+            interval="1d",
+            batch_size=2,
+            workers=1,
+            rate=0,
+            resume=resume
+        )
+
+    @patch("stocks.services.market.market_data_pipeline.MarketDataFetcher.download_time_series_frame")
+    def test_resume_retries_only_failed_tickers(self, download):
+        download.side_effect = lambda symbols, *args: build_multi_ticker_frame(
+            [s for s in symbols if s != "MSFT"]
+        )
+        tickers = [MarketTicker(symbol=s, name=s) for s in ("AAPL", "MSFT", "NVDA")]
+        job_id = PipelineProgressRepository.time_series_job_id("5d", "1d")
+
+        self.run_job(tickers, resume=False)
+
+        statuses = dict(PipelineProgress.objects.filter(job_id=job_id).values_list("symbol", "status"))
+        self.assertEqual(statuses, {"AAPL": "completed", "MSFT": "failed", "NVDA": "completed"})
+        self.assertEqual(PipelineProgress.objects.get(job_id=job_id, symbol="AAPL").rows, 5)
+
+        download.reset_mock()
+        download.side_effect = lambda symbols, *args: build_multi_ticker_frame(symbols)
+        self.run_job(tickers, resume=True)
+
+        download.assert_called_once()
+        self.assertEqual(download.call_args.args[0], ["MSFT"])
+        self.assertEqual(
+            PipelineProgressRepository.get_completed_symbols(job_id, AssetType.STOCK),
+            {"AAPL", "MSFT", "NVDA"}
+        )
+
+    def test_completions_outside_the_run_window_are_redone(self):
+        PipelineProgressRepository.record("metrics", AssetType.ETF, [("SPY", "completed", 1, 0.5)])
+        PipelineProgress.objects.update(updated_at=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(PipelineProgressRepository.get_completed_symbols("metrics", AssetType.ETF), set())
+
+
+def sp500_response(symbols, status_code=200, etag='"v1"'):
+    """Fake requests response holding a Wikipedia-like S&P 500 table."""
+    rows = "".join(f"<tr><td>{s}</td><td>{s} Inc.</td></tr>" for s in symbols)
+    response = MagicMock(status_code=status_code, headers={"ETag": etag})
+    response.text = f"<table><tr><th>Symbol</th><th>Security</th></tr>{rows}</table>"
+    return response
+
+
+@patch("stocks.services.market.market_data_provider.market_ticket_provider.requests.get")
+class SP500UniverseTestCase(TestCase):
+    """Tests for the cached and diffed S&P 500 universe"""
+
+    def setUp(self):
+        MarketTickerProvider.reset_universe_cache()
+        self.addCleanup(MarketTickerProvider.reset_universe_cache)
+
+    def test_page_is_parsed_once_and_revalidated_conditionally(self, get):
+        get.return_value = sp500_response(["AAPL", "BRK.B"])
+
+        first = MarketTickerProvider.get_sp500_tickers()
+        second = MarketTickerProvider.get_sp500_tickers()
+
+        self.assertEqual([t.symbol for t in first], ["AAPL", "BRK-B"])
+        self.assertEqual(first, second)
+        self.assertEqual(get.call_count, 1)
+
+        # A new process within the TTL reads the stored snapshot
+        MarketTickerProvider.reset_universe_cache()
+        self.assertEqual(MarketTickerProvider.get_sp500_tickers(), first)
+        self.assertEqual(get.call_count, 1)
+
+        # Once expired, the page is revalidated with its ETag and not re-parsed on 304
+        TickerUniverse.objects.update(checked_at=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        MarketTickerProvider.reset_universe_cache()
+        get.return_value = sp500_response([], status_code=304)
+
+        self.assertEqual(MarketTickerProvider.get_sp500_tickers(), first)
+        self.assertEqual(get.call_args.kwargs["headers"]["If-None-Match"], '"v1"')
+        self.assertGreater(TickerUniverse.objects.get().checked_at.year, 2020)
+
+    def test_membership_diff_creates_and_deactivates_assets(self, get):
+        get.return_value = sp500_response(["AAA", "BBB"])
+        MarketTickerProvider.get_sp500_tickers()
+
+        get.return_value = sp500_response(["BBB", "CCC"], etag='"v2"')
+        MarketTickerProvider.get_sp500_tickers(force_refresh=True)
+
+        active = dict(FinancialAsset.objects.values_list("ticker", "is_active"))
+        self.assertEqual(active, {"AAA": False, "BBB": True, "CCC": True})
+        self.assertEqual(TickerUniverse.objects.get().etag, '"v2"')
+
+    def test_first_snapshot_deactivates_stored_non_members(self, get):
+        FinancialAsset.objects.create(ticker="OLD", name="Old", asset_type="stock")
+        FinancialAsset.objects.create(ticker="AAA", name="AAA", asset_type="stock")
+        FinancialAsset.objects.create(ticker="SPY", name="SPY", asset_type="etf")
+        MarketDataRepository.save_stock_metrics(StockMetricsData(symbol="OLD", price=1.0))
+
+        get.return_value = sp500_response(["AAA", "BBB"])
+        MarketTickerProvider.get_sp500_tickers()
+
+        active = dict(FinancialAsset.objects.values_list("ticker", "is_active"))
+        self.assertEqual(active, {"OLD": False, "AAA": True, "BBB": True, "SPY": True})
+        # Deactivated assets are hidden from every metrics read path
+        self.assertIsNone(MarketDataRepository.get_stock_metrics_by_ticker("OLD"))
+
+
+class ConcurrentRunAllTestCase(SimpleTestCase):
+    """Tests for the concurrent asset type chains of MarketDataPipeline.run_all"""
+
+    def test_chains_overlap_and_metrics_follow_their_time_series(self):
+        events = []
+
+        def job(name, seconds):
+            def run(**kwargs):
+                events.append(("start", name))
+                self.assertIsNotNone(kwargs["budget"])
+                time.sleep(seconds)
+                events.append(("end", name))
+            return run
+
+        jobs = {
+            "update_stock_time_series": job("stock_ts", 0.2),
+            "update_stock_metrics": job("stock_metrics", 0.01),
+            "update_etf_time_series": job("etf_ts", 0.01),
+            "update_etf_metrics": job("etf_metrics", 0.01),
+            "update_currency_time_series": job("currency_ts", 0.01),
+            "update_currency_metrics": MagicMock(side_effect=RuntimeError("boom")),
+        }
+        with patch.multiple(MarketDataPipeline, **jobs):
+            timings = MarketDataPipeline.run_all(workers=2, rate=0)
+
+        self.assertEqual(len(timings), 6)
+        self.assertEqual([t.name for t in timings if not t.succeeded], ["💱 CURRENCY metrics"])
+        # ETF metrics finished while the stock time series were still running
+        self.assertLess(events.index(("end", "etf_metrics")), events.index(("end", "stock_ts")))
+        self.assertLess(events.index(("end", "stock_ts")), events.index(("start", "stock_metrics")))
+
+
+class ResponseStoreTestCase(SimpleTestCase):
+    """Tests for the record/replay yfinance ResponseStore"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(ResponseStore.configure, ResponseStore.PASSTHROUGH)
+
+    @patch("stocks.services.market.market_data_fetcher.market_data_fetcher.yf")
+    def test_recorded_responses_replay_without_network(self, yf):
+        frame = build_multi_ticker_frame(["AAPL", "MSFT"])
+        yf.download.return_value = frame
+        yf.Ticker.return_value = MagicMock(ticker="AAPL", info={"regularMarketPrice": 10.0})
+
+        ResponseStore.configure(ResponseStore.RECORD, self.directory)
+        MarketDataFetcher.download_time_series_frame(["AAPL", "MSFT"], "5d", "1d")
+        MarketDataFetcher.get_stock_metrics("AAPL", include_history=False)
+
+        yf.download.side_effect = AssertionError("network access in replay mode")
+        yf.Ticker.return_value = MagicMock(ticker="AAPL", info={"regularMarketPrice": 99.0})
+
+        ResponseStore.configure(ResponseStore.REPLAY, self.directory)
+        replayed = MarketDataFetcher.download_time_series_frame(["AAPL", "MSFT"], "5d", "1d")
+        metrics = MarketDataFetcher.get_stock_metrics("AAPL", include_history=False)
+
+        pd.testing.assert_frame_equal(replayed, frame)
+        self.assertEqual(metrics.price, 10.0)
+        self.assertEqual(yf.download.call_count, 1)
+
+    @patch("stocks.services.market.market_data_fetcher.market_data_fetcher.yf")
+    def test_throttled_metrics_history_is_raised(self, yf):
+        stock = MagicMock(ticker="AAPL", info={"regularMarketPrice": 10.0})
+        stock.history.side_effect = RuntimeError("Too Many Requests. Rate limited. Try after a while.")
+        yf.Ticker.return_value = stock
+
+        with self.assertRaises(RuntimeError) as raised:
+            MarketDataFetcher.get_stock_metrics("AAPL")
+        self.assertTrue(UpstreamHealthController.is_rate_limit(raised.exception))
+
+        stock.history.side_effect = ValueError("no price data found")
+        metrics = MarketDataFetcher.get_stock_metrics("AAPL")
+        self.assertIsNone(metrics.change_5d_percent)
+
+    def test_replay_of_unrecorded_request_fails(self):
+        ResponseStore.configure(ResponseStore.REPLAY, self.directory)
+
+        with self.assertRaises(RuntimeError):
+            MarketDataFetcher.download_time_series_frame(["AAPL"], "5d", "1d")
+
+
+class SyntheticMarketDataTestCase(SimpleTestCase):
+    """Tests for the synthetic benchmark data source"""
+
+    def test_bars_do_not_depend_on_the_download_batch(self):
+        fetcher = SyntheticMarketDataFetcher(years=1)
+
+        alone = fetcher.download_time_series_frame(["T0001"], "1y")
+        batched = fetcher.download_time_series_frame(["T0000", "T0001"], "1y")
+        batches = MarketDataTransformer.transform_time_series_batch(batched, ["T0000", "T0001"], AssetType.STOCK)
+
+        pd.testing.assert_frame_equal(alone["T0001"], batched["T0001"])
+        self.assertEqual(len(batches["T0001"]), 252)
+        self.assertEqual(fetcher.get_stock_metrics("T0001"), fetcher.get_stock_metrics("T0001"))
+
+
+class PipelineInstrumentationTestCase(TestCase):
+    """Tests for the per-stage spans and report"""
+
+    def setUp(self):
+        PipelineInstrumentation.reset()
+        self.addCleanup(PipelineInstrumentation.reset)
+
+    @patch("stocks.services.market.market_data_pipeline.MarketDataFetcher.download_time_series_frame")
+    def test_time_series_job_records_every_stage(self, download):
+        download.side_effect = lambda symbols, *args: build_multi_ticker_frame(symbols)
+        tickers = [MarketTicker(symbol=s, name=s) for s in ("AAPL", "MSFT", "NVDA")]
+
+        MarketDataPipeline._update_time_series_for_asset_type(
+            asset_type=AssetType.STOCK,
+            get_tickers_func=lambda: tickers,
+            period="5d",
+            interval="1d",
+            batch_size=2,
+            workers=2,
+            rate=0
+        )
+        report = PipelineInstrumentation.report()
+
+        self.assertEqual(list(report["stages"]), ["universe", "fetch", "transform", "write", "rollups"])
+        self.assertEqual(report["stages"]["universe"]["rows"], 3)
+        self.assertEqual(report["stages"]["fetch"]["spans"], 2)
+        self.assertEqual(report["stages"]["transform"]["rows"], 15)
+        self.assertEqual(report["stages"]["write"]["rows"], 15)
+        self.assertEqual(report["stages"]["rollups"]["rows"], 6)     # one week and one month per ticker
+        self.assertIn(report["bottleneck"], report["stages"])
+        for stage in report["stages"].values():
+            self.assertLessEqual(stage["p50_seconds"], stage["p95_seconds"])
+            self.assertLessEqual(stage["p95_seconds"], stage["max_seconds"])
+
+    @patch("stocks.services.market.market_data_pipeline.time.sleep")
+    @patch("stocks.services.market.market_data_pipeline.MarketDataFetcher.download_time_series_frame")
+    def test_requeued_and_empty_tickers_are_reported(self, download, _sleep):
+        calls = []
+
+        def fake_download(symbols, *args):
+            calls.append(tuple(symbols))
+            if symbols[0] == "AAPL" and len(calls) == 1:
+                raise RuntimeError("Too Many Requests")
+            found = [s for s in symbols if s != "MISSING"]
+            return build_multi_ticker_frame(found) if found else pd.DataFrame()
+
+        download.side_effect = fake_download
+        tickers = [MarketTicker(symbol=s, name=s) for s in ("AAPL", "MSFT", "MISSING")]
+
+        MarketDataPipeline._update_time_series_for_asset_type(
+            asset_type=AssetType.STOCK,
+            get_tickers_func=lambda: tickers,
+            period="5d",
+            interval="1d",
+            batch_size=2,
+            workers=1,
+            budget=UpstreamBudget(rate=0, max_in_flight=1, health=UpstreamHealthController(max_concurrency=1, base_backoff=0.001))
+        )
+        stages = PipelineInstrumentation.report()["stages"]
+
+        self.assertEqual(calls.count(("AAPL", "MSFT")), 2)
+        self.assertEqual(stages["fetch"]["retries"], 1)
+        self.assertEqual(stages["fetch"]["failures"], 2)        # the throttled AAPL + MSFT batch
+        self.assertEqual(stages["transform"]["failures"], 1)    # MISSING returned no data
+        self.assertEqual(TimeSeries.objects.count(), 10)
+
+    def test_failed_span_is_counted_and_log_output_is_json(self):
+        with self.assertRaises(ValueError):
+            with PipelineInstrumentation.span("fetch"):
+                raise ValueError("throttled")
+
+        self.addCleanup(PipelineInstrumentation.configure, PipelineInstrumentation.OUTPUT_PRINT)
+        PipelineInstrumentation.configure(PipelineInstrumentation.OUTPUT_LOG)
+        with self.assertLogs("stocks.pipeline") as logs:
+            PipelineInstrumentation.progress("✅ done", rows=3)
+
+        self.assertEqual(PipelineInstrumentation.report()["stages"]["fetch"]["failures"], 1)
+        self.assertEqual(json.loads(logs.records[0].getMessage()), {"event": "✅ done", "rows": 3})
+
+    def test_log_output_prints_without_a_configured_handler(self):
+        pipeline_logger = logging.getLogger("stocks.pipeline")
+        handlers, level, propagate = list(pipeline_logger.handlers), pipeline_logger.level, pipeline_logger.propagate
+
+        def restore():
+            pipeline_logger.handlers = handlers
+            pipeline_logger.setLevel(level)
+            pipeline_logger.propagate = propagate
+            PipelineInstrumentation.configure(PipelineInstrumentation.OUTPUT_PRINT)
+
+        self.addCleanup(restore)
+        pipeline_logger.handlers = []
+        pipeline_logger.setLevel(logging.WARNING)
+        with patch("sys.stderr", new=io.StringIO()) as stderr:
+            PipelineInstrumentation.configure(PipelineInstrumentation.OUTPUT_LOG)
+            PipelineInstrumentation.progress("📊 Stage report", report={"bottleneck": "fetch"})
+
+        self.assertEqual(
+            json.loads(stderr.getvalue()),
+            {"event": "📊 Stage report", "report": {"bottleneck": "fetch"}}
+        )
+
+
+class UpstreamHealthTestCase(TestCase):
+    """Tests for the adaptive backoff and circuit breaker around Yahoo calls"""
+
+    @staticmethod
+    def throttled():
+        raise RuntimeError("Error fetching stock metrics: Too Many Requests. Rate limited. Try after a while.")
+
+    def test_rate_limits_halve_concurrency_then_trip_the_breaker(self):
+        health = UpstreamHealthController(max_concurrency=8, trip_after=3, base_backoff=0.001, open_seconds=0.05)
+
+        with self.assertRaises(RuntimeError):
+            health.call(self.throttled)
+        self.assertEqual(health.limit, 4)
+        self.assertEqual(health.state, UpstreamHealthController.CLOSED)
+
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                health.call(self.throttled)
+        self.assertEqual(health.state, UpstreamHealthController.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            health.call(lambda: "not called")
+
+        # After the open period a single probe is let through and closes the circuit
+        time.sleep(0.06)
+        self.assertEqual(health.call(lambda: "ok"), "ok")
+        self.assertEqual(health.state, UpstreamHealthController.CLOSED)
+        self.assertEqual(health.stats["rate_limited"], 3)
+
+    def test_throttled_tickers_are_requeued_for_a_later_pass(self):
+        calls = {}
+
+        def fetch(symbol, include_history=True):
+            calls[symbol] = calls.get(symbol, 0) + 1
+            if symbol == "MSFT" and calls[symbol] == 1:
+                self.throttled()
+            return StockMetricsData(symbol=symbol, price=1.0)
+
+        health = UpstreamHealthController(max_concurrency=2, base_backoff=0.001, open_seconds=0.01)
+        MarketDataPipeline._update_metrics_for_asset_type(
+            asset_type=AssetType.STOCK,
+            get_tickers_func=lambda: [MarketTicker(symbol=s, name=s) for s in ("AAPL", "MSFT", "NVDA")],
+            fetch_func=fetch,
+            label="stock",
+            workers=2,
+            budget=UpstreamBudget(rate=0, max_in_flight=2, health=health)
+        )
+
+        self.assertEqual(calls, {"AAPL": 1, "MSFT": 2, "NVDA": 1})
+        self.assertEqual(StockMetrics.objects.count(), 3)
+
+
+class TimeSeriesStagingTestCase(TestCase):
+    """Time series staged as Parquet by the job and bulk-loaded afterwards"""
+
+    @patch("stocks.services.market.market_data_pipeline.MarketDataFetcher.download_time_series_frame")
+    def test_staged_bars_are_loaded_once_with_the_latest_version(self, download):
+        download.side_effect = lambda symbols, *args: build_multi_ticker_frame(symbols)
+        tickers = [MarketTicker(symbol=s, name=s) for s in ("AAPL", "MSFT")]
+
+        with tempfile.TemporaryDirectory() as stage_dir:
+            for _ in range(2):
+                MarketDataPipeline._update_time_series_for_asset_type(
+                    asset_type=AssetType.STOCK,
+                    get_tickers_func=lambda: tickers,
+                    period="5d",
+                    interval="1d",
+                    workers=1,
+                    rate=0,
+                    stage_dir=stage_dir
+                )
+            self.assertEqual(TimeSeries.objects.count(), 0)
+
+            partitions = TimeSeriesStaging.partitions(stage_dir)
+            self.assertTrue(partitions)
+            self.assertEqual({asset_type for asset_type, _ in partitions}, {AssetType.STOCK})
+            self.assertEqual(TimeSeriesStaging.partitions(stage_dir, asset_type=AssetType.ETF), [])
+
+            # Each bar was staged twice, but is loaded once
+            saved = MarketDataPipeline.load_staged_time_series(stage_dir)
+            self.assertEqual((saved.inserted, saved.updated, saved.unchanged), (10, 0, 0))
+            self.assertEqual(TimeSeries.objects.count(), 10)
+
+            # Reloading the same staging directory does not touch the stored bars
+            saved = MarketDataPipeline.load_staged_time_series(stage_dir)
+            self.assertEqual((saved.inserted, saved.updated, saved.unchanged), (0, 0, 10))
+
+
+class TimeSeriesPartitionTestCase(TestCase):
+    """Partition periods, and no-op partition management outside PostgreSQL"""
+
+    def test_period_bounds_and_names(self):
+        day = date(2024, 12, 15)
+        self.assertEqual(TimeSeriesPartitionRepository.period_bounds(day), (date(2024, 1, 1), date(2025, 1, 1)))
+        self.assertEqual(
+            TimeSeriesPartitionRepository.period_bounds(day, TimeSeriesPartitionRepository.MONTH),
+            (date(2024, 12, 1), date(2025, 1, 1))
+        )
+        self.assertEqual(TimeSeriesPartitionRepository.partition_name("ts", date(2024, 1, 1)), "ts_y2024")
+        self.assertEqual(
+            TimeSeriesPartitionRepository.partition_name("ts", date(2024, 3, 1), TimeSeriesPartitionRepository.MONTH),
+            "ts_m2024_03"
+        )
+        with self.assertRaises(ValueError):
+            TimeSeriesPartitionRepository.period_bounds(day, "week")
+
+    def test_plan_skips_covered_periods_and_fills_partial_years(self):
+        existing = [(date(2024, 1, 1), date(2025, 1, 1)), (date(2025, 3, 1), date(2025, 4, 1))]
+        month = TimeSeriesPartitionRepository.MONTH
+        year = TimeSeriesPartitionRepository.YEAR
+
+        # Months inside the yearly partition of the migration are already covered
+        self.assertEqual(
+            TimeSeriesPartitionRepository.plan_partitions(date(2024, 5, 10), date(2024, 12, 31), month, existing), []
+        )
+        # 2025 is partly covered by a monthly partition: only the missing months are created
+        plan = TimeSeriesPartitionRepository.plan_partitions(date(2024, 6, 1), date(2025, 1, 1), year, existing)
+        self.assertEqual(len(plan), 11)
+        self.assertEqual(plan[0], (date(2025, 1, 1), date(2025, 2, 1), month))
+        self.assertNotIn((date(2025, 3, 1), date(2025, 4, 1), month), plan)
+        self.assertEqual(
+            TimeSeriesPartitionRepository.plan_partitions(date(2026, 2, 1), date(2026, 2, 1), year, existing),
+            [(date(2026, 1, 1), date(2027, 1, 1), year)]
+        )
+
+        with self.assertRaises(ValueError):
+            TimeSeriesPartitionRepository.plan_partitions(date(2030, 1, 1), date(2030, 1, 1), month, [(date(2030, 1, 15), date(2030, 2, 15))])
+
+    def test_management_is_a_no_op_without_partitioning(self):
+        self.assertFalse(TimeSeriesPartitionRepository.is_partitioned())
+        self.assertEqual(TimeSeriesPartitionRepository.ensure_partitions(date(2024, 1, 1), date(2026, 1, 1)), [])
+        self.assertEqual(TimeSeriesPartitionRepository.drop_partitions_before(date(2030, 1, 1)), [])
+
+
+def build_intraday_frame(symbols):
+    """Two sessions of four 15m bars, in the multi-ticker layout of build_multi_ticker_frame."""
+    frame = build_multi_ticker_frame(symbols, days=8)
+    frame.index = pd.date_range("2024-01-02 14:30", periods=4, freq="15min", tz="UTC").append(
+        pd.date_range("2024-01-03 14:30", periods=4, freq="15min", tz="UTC")
+    )
+    return frame
+
+
+class IntradayBarTestCase(TestCase):
+    """Intraday bars refreshed by the pipeline and served by TimeSeriesView"""
+
+    def setUp(self):
+        cache.clear()
+
+    def get_view(self, period, **params):
+        request = APIRequestFactory().get("/time-series/", {"ticker": "AAPL", "period": period, **params})
+        return TimeSeriesView.as_view()(request)
+
+    def store_bars(self):
+        batches = MarketDataTransformer.transform_time_series_batch(build_intraday_frame(["AAPL"]), ["AAPL"], AssetType.STOCK)
+        return IntradayRepository.save_batches("15m", list(batches.values()))
+
+    @patch("stocks.services.market.market_data_fetcher.live_time_series_fetcher.MarketDataFetcher.get_time_series")
+    @patch("stocks.services.market.market_data_pipeline.MarketDataFetcher.download_time_series_frame")
+    def test_refreshed_bars_are_served_from_the_database(self, download, live):
+        download.side_effect = lambda symbols, *args: build_intraday_frame(symbols)
+
+        MarketDataPipeline._update_time_series_for_asset_type(
+            asset_type=AssetType.STOCK,
+            get_tickers_func=lambda: [MarketTicker(symbol="AAPL", name="AAPL")],
+            period="1d",
+            interval="15m",
+            workers=1,
+            rate=0
+        )
+        self.assertEqual(IntradayBar.objects.count(), 8)
+        self.assertEqual(TimeSeries.objects.count(), 0)
+
+        response = self.get_view("1d")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 4)
+        self.assertTrue(response.data[0]["timestamp"].startswith("2024-01-03"))
+        live.assert_not_called()
+
+        # Re-ingesting the same bars updates them in place
+        saved = self.store_bars()
+        self.assertEqual((saved.inserted, saved.updated), (0, 8))
+
+    @patch("stocks.services.market.market_data_fetcher.live_time_series_fetcher.MarketDataFetcher.get_time_series")
+    def test_stale_bars_fall_back_to_a_live_fetch(self, live):
+        self.store_bars()
+        live.return_value = [
+            TimeSeriesData(AssetType.STOCK, "AAPL", datetime(2024, 1, 4, 15, tzinfo=dt_timezone.utc), 1.0, 2.0, 2.0, 1.0, 10)
+        ]
+
+        response = self.get_view("1d")
+        self.assertEqual([bar["close_price"] for bar in response.data], [2.0])
+
+        # Without Yahoo the stale stored bars are still better than an error
+        cache.clear()
+        live.side_effect = RuntimeError("Too Many Requests")
+        response = self.get_view("1d")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 4)
+
+    def test_closed_market_does_not_make_bars_stale(self):
+        new_york = IntradayRepository.MARKET_TIMEZONE
+        saturday = datetime(2024, 1, 6, 12, tzinfo=new_york)
+        friday_close = datetime(2024, 1, 5, 16, tzinfo=new_york)
+
+        self.assertEqual(IntradayRepository.last_session_close(saturday), friday_close)
+        self.assertEqual(IntradayRepository.last_session_close(datetime(2024, 1, 8, 8, tzinfo=new_york)), friday_close)
+        self.assertIsNone(IntradayRepository.last_session_close(datetime(2024, 1, 8, 11, tzinfo=new_york)))
+        self.assertEqual(
+            IntradayRepository.last_session_close(saturday, AssetType.FOREX), datetime(2024, 1, 5, 17, tzinfo=new_york)
+        )
+
+        # The last 15m bar of Friday's session reaches the close: fresh all weekend
+        last_bar = datetime(2024, 1, 5, 15, 45, tzinfo=new_york)
+        self.assertTrue(IntradayRepository.is_fresh("AAPL", "15m", now=saturday, latest_bar=last_bar))
+        # Bars stopping before the close, never refreshed afterwards: stale
+        self.assertFalse(IntradayRepository.is_fresh("AAPL", "15m", now=saturday, latest_bar=last_bar - timedelta(hours=2)))
+        # Market open and no recent refresh: stale whatever the bars
+        self.assertFalse(IntradayRepository.is_fresh(
+            "AAPL", "15m", now=datetime(2024, 1, 8, 11, tzinfo=new_york), latest_bar=datetime(2024, 1, 8, 10, 45, tzinfo=new_york)
+        ))
+
+    @patch("stocks.services.market.market_data_fetcher.live_time_series_fetcher.MarketDataFetcher.get_time_series")
+    def test_unknown_asset_type_is_rejected(self, live):
+        response = self.get_view("1d", asset_type="foo")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("asset_type", response.data["error"])
+        live.assert_not_called()
+
+    def test_bars_older_than_the_retention_window_are_purged(self):
+        self.store_bars()
+        self.assertEqual(IntradayRepository.purge_expired("15m", now=datetime(2024, 1, 10, tzinfo=dt_timezone.utc)), 4)
+        self.assertEqual(IntradayBar.objects.count(), 4)
+
+
+class LiveTimeSeriesFetcherTestCase(SimpleTestCase):
+    """Coalesced, cached and budgeted live time series fetches"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_identical_fetches_share_one_download(self):
+        calls = []
+        flights = SingleFlight()
+
+        def download():
+            calls.append(1)
+            time.sleep(0.1)
+            return ["bars"]
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(lambda _: flights.do(("AAPL", "1d"), download), range(5)))
+
+        self.assertEqual(results, [["bars"]] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.shared, 4)
+
+    @patch("stocks.services.market.market_data_fetcher.live_time_series_fetcher.MarketDataFetcher.get_time_series")
+    def test_last_result_is_served_once_the_budget_is_spent(self, live):
+        live.side_effect = lambda ticker, **kwargs: [ticker]
+        fetch = lambda ticker: LiveTimeSeriesFetcher.get_time_series(ticker, AssetType.STOCK, "1d", "15m")
+
+        with patch.object(LiveTimeSeriesFetcher, "_budget", SharedUpstreamBudget("test", limit=1)):
+            self.assertEqual(fetch("AAPL"), ["AAPL"])
+            self.assertEqual(fetch("AAPL"), ["AAPL"])        # cached
+            self.assertEqual(live.call_count, 1)
+
+            with patch.object(LiveTimeSeriesFetcher, "CACHE_SECONDS", 0):
+                self.assertEqual(fetch("AAPL"), ["AAPL"])    # over budget: last result
+                self.assertEqual(live.call_count, 1)
+                with self.assertRaises(UpstreamBudgetExhausted):
+                    fetch("MSFT")
+
+
+class TimeSeriesDownsamplerTestCase(TestCase):
+    """Server-side downsampling of long chart windows"""
+
+    def series(self, n=1260):
+        start = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+        closes = 100 + np.sin(np.arange(n) / 40) * 10
+        closes[700] = 500.0     # spike
+        closes[900] = 1.0       # crash
+        return [TimeSeriesDTO("AAPL", start + timedelta(days=i), float(close)) for i, close in enumerate(closes)]
+
+    def test_methods_keep_the_endpoints_and_the_extremes(self):
+        series = self.series()
+        for method in TimeSeriesDownsampler.METHODS:
+            sampled = TimeSeriesDownsampler.downsample(series, 200, method)
+            self.assertLessEqual(len(sampled), 200)
+            self.assertGreater(len(sampled), 150)
+            self.assertIs(sampled[0], series[0])
+            self.assertIs(sampled[-1], series[-1])
+            self.assertEqual([item.timestamp for item in sampled], sorted(item.timestamp for item in sampled))
+            closes = {item.close_price for item in sampled}
+            self.assertIn(500.0, closes)
+            self.assertIn(1.0, closes)
+
+        short = series[:50]
+        self.assertIs(TimeSeriesDownsampler.downsample(short, 200), short)
+
+    @patch("stocks.views.MarketDataRepository.get_time_series_from_db")
+    def test_view_points_parameter(self, from_db):
+        from_db.return_value = self.series()
+        get = lambda **params: TimeSeriesView.as_view()(
+            APIRequestFactory().get("/time-series/", {"ticker": "AAPL", "period": "5y", **params})
+        )
+
+        self.assertEqual(len(get().data), 1260)
+        self.assertEqual(len(get(points=300).data), 300)
+        self.assertEqual(get(points=2).status_code, 400)
+        self.assertEqual(get(points=300, downsample="median").status_code, 400)
+
+
+class TimeSeriesRollupTestCase(TestCase):
+    """Weekly and monthly rollups maintained from the written daily bars"""
+
+    def save_bars(self, start, closes):
+        days = np.array([start + timedelta(days=i) for i in range(len(closes))], dtype=object)
+        closes = np.asarray(closes, dtype=float)
+        return MarketDataRepository.save_time_series_batches([TimeSeriesBatch(
+            asset_type=AssetType.STOCK, symbol="AAPL", dates=days, open_prices=closes - 1,
+            high_prices=closes + 1, low_prices=closes - 2, close_prices=closes, volumes=np.full(len(closes), 10, dtype=np.int64)
+        )])
+
+    def test_only_the_buckets_of_written_bars_are_refreshed(self):
+        # Mon 2024-01-29 .. Sun 2024-02-11: two weeks across two months
+        saved = self.save_bars(date(2024, 1, 29), np.arange(14) + 100)
+        self.assertEqual(RollupRepository.refresh(saved.touched), 4)
+
+        week = TimeSeriesRollup.objects.get(interval="1wk", period_start=date(2024, 1, 29))
+        self.assertEqual((week.open_price, week.high_price, week.low_price, week.close_price, week.volume),
+                         (99, 107, 98, 106, 70))
+        month = TimeSeriesRollup.objects.get(interval="1mo", period_start=date(2024, 2, 1))
+        self.assertEqual((month.open_price, month.close_price, month.volume), (102, 113, 110))
+
+        # Re-ingesting one changed bar touches one week and one month only
+        saved = self.save_bars(date(2024, 2, 10), [200, 113])
+        self.assertEqual(saved.touched, {week.asset_id: {date(2024, 2, 10)}})
+        self.assertEqual(RollupRepository.refresh(saved.touched), 2)
+        self.assertEqual(TimeSeriesRollup.objects.get(interval="1wk", period_start=date(2024, 2, 5)).high_price, 201)
+
+        self.assertEqual(RollupRepository.rebuild(), 4)
+
+    def test_interval_parameter_reads_the_rollups(self):
+        today = timezone.now().date()
+        self.save_bars(today - timedelta(days=59), np.arange(60) + 100)
+        MarketDataPipeline.rebuild_rollups()
+
+        get = lambda **params: TimeSeriesView.as_view()(
+            APIRequestFactory().get("/time-series/", {"ticker": "AAPL", "period": "1y", **params})
+        )
+        self.assertEqual(len(get().data), 60)
+        weekly = get(interval="1wk").data
+        self.assertIn(len(weekly), (9, 10))
+        self.assertEqual(weekly[-1]["close_price"], 159.0)
+        self.assertLessEqual(len(get(interval="1mo").data), 3)
+        self.assertEqual(get(interval="1h").status_code, 400)
+        self.assertEqual(get(interval="1wk", period="5d").status_code, 400)
+
+
+class TimeSeriesReadPathTestCase(TestCase):
+    """The values_list read path returns the same DTOs as the model-instance mapper"""
+
+    def test_lean_read_matches_the_queryset_mapper(self):
+        today = timezone.now().date()
+        days = np.array([today - timedelta(days=i) for i in range(40)], dtype=object)
+        closes = np.round(np.linspace(100, 140, 40), 2)
+        MarketDataRepository.save_time_series_batches([TimeSeriesBatch(
+            asset_type=AssetType.STOCK, symbol="AAPL", dates=days, open_prices=closes, high_prices=closes,
+            low_prices=closes, close_prices=closes, volumes=np.zeros(40, dtype=np.int64)
+        )])
+
+        expected = TimeSeriesDTOMapper.from_queryset(
+            TimeSeries.objects.select_related("asset").filter(date__gte=today - timedelta(days=30)).order_by("date")
+        )
+        self.assertEqual(MarketDataRepository.get_time_series_from_db("AAPL", "1m"), expected)
+        self.assertEqual(MarketDataRepository.get_time_series_from_db("UNKNOWN", "1m"), [])
+
+
+class TimeSeriesWireFormatTestCase(TestCase):
+    """Columnar and packed representations of TimeSeriesView carry the same series"""
+
+    def setUp(self):
+        today = timezone.now().date()
+        self.days = [today - timedelta(days=i) for i in range(20)][::-1]
+        closes = np.round(np.linspace(100, 120, 20), 2)
+        MarketDataRepository.save_time_series_batches([TimeSeriesBatch(
+            asset_type=AssetType.STOCK, symbol="AAPL", dates=np.array(self.days, dtype=object), open_prices=closes,
+            high_prices=closes, low_prices=closes, close_prices=closes, volumes=np.zeros(20, dtype=np.int64)
+        )])
+        self.closes = closes.tolist()
+        self.epoch_days = [(day - date(1970, 1, 1)).days for day in self.days]
+
+    def _get(self, **kwargs):
+        query = kwargs.pop("query", {"ticker": "AAPL", "period": "1m"})
+        response = TimeSeriesView.as_view()(APIRequestFactory().get("/stocks/time-series/", query, **kwargs))
+        response.render()
+        return response
+
+    def test_default_json_is_unchanged(self):
+        body = json.loads(self._get().content)
+        self.assertEqual(len(body), 20)
+        self.assertEqual(set(body[0]), {"ticker", "timestamp", "close_price"})
+
+    def test_columnar_json_by_accept_header(self):
+        response = self._get(HTTP_ACCEPT=ColumnarTimeSeriesRenderer.media_type)
+        self.assertEqual(response["Content-Type"], ColumnarTimeSeriesRenderer.media_type)
+        body = json.loads(response.content)
+        self.assertEqual(body, {"ticker": "AAPL", "time_unit": "day", "times": self.epoch_days, "close": self.closes})
+
+    def test_packed_binary_by_format_param(self):
+        response = self._get(query={"ticker": "AAPL", "period": "1m", "format": "packed"})
+        self.assertEqual(response["Content-Type"], PackedTimeSeriesRenderer.media_type)
+
+        columns = PackedTimeSeriesRenderer.unpack(response.content)
+        self.assertEqual(columns.ticker, "AAPL")
+        self.assertEqual(columns.time_unit, "day")
+        self.assertEqual(columns.times.tolist(), self.epoch_days)
+        np.testing.assert_allclose(columns.close_prices, self.closes, rtol=1e-6)
+        self.assertLess(len(response.content), len(self._get().content) / 5)
+
+    def test_errors_stay_json_under_packed(self):
+        response = self._get(query={"period": "1m", "format": "packed"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("error", json.loads(response.content))
+
+
+class ConditionalGetTestCase(TestCase):
+    """ETag validators from the data versions short-circuit unchanged polls to 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self._save_bars(100.0)
+
+    def _save_bars(self, close):
+        closes = np.full(5, close)
+        with self.captureOnCommitCallbacks(execute=True):
+            MarketDataRepository.save_time_series_batches([TimeSeriesBatch(
+                asset_type=AssetType.STOCK, symbol="AAPL",
+                dates=np.array([self.today - timedelta(days=i) for i in range(5)], dtype=object),
+                open_prices=closes, high_prices=closes, low_prices=closes, close_prices=closes,
+                volumes=np.zeros(5, dtype=np.int64)
+            )])
+
+    def _get(self, query=None, **headers):
+        request = APIRequestFactory().get("/stocks/metrics/time-series/", query or {"ticker": "AAPL", "period": "1m"}, **headers)
+        return TimeSeriesView.as_view()(request)
+
+    def test_unchanged_poll_is_not_modified_without_queries(self):
+        etag = self._get()["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_pipeline_write_changes_the_etag(self):
+        etag = self._get()["ETag"]
+        self._save_bars(101.0)
+
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        # An identical re-ingest writes nothing and keeps the version
+        etag = response["ETag"]
+        self._save_bars(101.0)
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_representations_have_distinct_etags(self):
+        self.assertNotEqual(
+            self._get()["ETag"],
+            self._get(HTTP_ACCEPT=ColumnarTimeSeriesRenderer.media_type)["ETag"]
+        )
+
+    def test_errors_carry_no_validators(self):
+        response = StockMetricDetailView.as_view()(APIRequestFactory().get("/stocks/metrics/stocks/NOPE/"), ticker="NOPE")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_failed_precondition_carries_no_validators(self):
+        response = self._get(HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, 412)
+        self.assertFalse(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Last-Modified"))
+        self.assertFalse(response.has_header("Cache-Control"))
+
+    def test_version_survives_until_bumped(self):
+        token, _ = DataVersionRepository.get(DataVersionRepository.ETF_METRICS)
+        cache.clear()
+        self.assertEqual(DataVersionRepository.get(DataVersionRepository.ETF_METRICS)[0], token)
+
+        DataVersionRepository.bump_metrics(AssetType.ETF)
+        cache.clear()
+        self.assertNotEqual(DataVersionRepository.get(DataVersionRepository.ETF_METRICS)[0], token)
+
+    def test_write_from_another_process_changes_the_etag(self):
+        """A pipeline process with its own cache only bumps the table; the web cache is not told"""
+        etag = self._get()["ETag"]
+
+        closes = np.full(5, 102.0)
+        MarketDataRepository.save_time_series_batches([TimeSeriesBatch(
+            asset_type=AssetType.STOCK, symbol="AAPL",
+            dates=np.array([self.today - timedelta(days=i) for i in range(5)], dtype=object),
+            open_prices=closes, high_prices=closes, low_prices=closes, close_prices=closes,
+            volumes=np.zeros(5, dtype=np.int64)
+        )])
+        cache.clear()   # The memoized version expired
+
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
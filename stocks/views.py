@@ -5,13 +5,20 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 
 from stocks.dataclasses import AssetType
+from stocks.decorators.conditional_get import conditional_on_data_version
 from stocks.dtos.time_series_dto_mapper import TimeSeriesDTOMapper
+from stocks.renderers.time_series_renderers import ColumnarTimeSeriesRenderer, PackedTimeSeriesRenderer
 from stocks.serializers.metric_dto_serializer import MetricDTOSerializer
 from stocks.serializers.time_series_dto_serializer import TimeSeriesDTOSerializer
-from stocks.services.market.market_data_fetcher.market_data_fetcher import MarketDataFetcher
+from stocks.services.market.downsampling.time_series_downsampler import TimeSeriesDownsampler
+from stocks.services.market.market_data_fetcher.live_time_series_fetcher import LiveTimeSeriesFetcher, UpstreamBudgetExhausted
+from stocks.services.market.market_data_repository.data_version_repository import DataVersionRepository
+from stocks.services.market.market_data_repository.intraday_repository import IntradayRepository
 from stocks.services.market.market_data_repository.market_data_repository import MarketDataRepository
+from stocks.services.market.market_data_repository.rollup_repository import RollupRepository
 from stocks.services.trade_of_the_day.trade_of_the_day_service import TradeOfTheDayService
 from stocks.repository.trade_of_the_day_repository import TradeOfTheDayRepository
 
@@ -33,6 +40,7 @@ class StockMetricsView(APIView):
     """
     Endpoint to obtain stock metrics (StockMetrics) with pagination, sorting, and optional search.
     """
+    @conditional_on_data_version(DataVersionRepository.STOCK_METRICS)
     def get(self, request):
         page = int(request.GET.get("page", 1))
         page_size = int(request.GET.get("page_size", 25))
@@ -54,6 +62,7 @@ class ETFMetricsView(APIView):
     """
     Endpoint for obtaining sorted ETF metrics, with optional search.
     """
+    @conditional_on_data_version(DataVersionRepository.ETF_METRICS)
     def get(self, request):
         sort_by = request.GET.get("sort_by", "ticker")
         order = request.GET.get("order", "asc")
@@ -68,6 +77,7 @@ class CurrencyMetricsView(APIView):
     """
     Endpoint for obtaining currency metrics (Forex) with sorting and optional search.
     """
+    @conditional_on_data_version(DataVersionRepository.CURRENCY_METRICS)
     def get(self, request):
         sort_by = request.GET.get("sort_by", "ticker")
         order = request.GET.get("order", "asc")
@@ -84,6 +94,7 @@ class StockMetricDetailView(APIView):
     Endpoint: /api/metrics/stocks/<ticker>/
     Obtiene las métricas de un stock específico por su ticker.
     """
+    @conditional_on_data_version(DataVersionRepository.STOCK_METRICS)
     def get(self, request, ticker: str):
         dto = MarketDataRepository.get_stock_metrics_by_ticker(ticker)
         if dto is None:
@@ -97,6 +108,7 @@ class ETFMetricDetailView(APIView):
     Endpoint: /api/metrics/etfs/<ticker>/
     Obtiene las métricas de un ETF específico por su ticker.
     """
+    @conditional_on_data_version(DataVersionRepository.ETF_METRICS)
     def get(self, request, ticker: str):
         dto = MarketDataRepository.get_etf_metrics_by_ticker(ticker)
         if dto is None:
@@ -110,6 +122,7 @@ class CurrencyMetricDetailView(APIView):
     Endpoint: /api/metrics/currencies/<ticker>/
     Obtiene las métricas de una divisa específica por su ticker.
     """
+    @conditional_on_data_version(DataVersionRepository.CURRENCY_METRICS)
     def get(self, request, ticker: str):
         dto = MarketDataRepository.get_currency_metrics_by_ticker(ticker)
         if dto is None:
@@ -122,13 +135,36 @@ class CurrencyMetricDetailView(APIView):
 class TimeSeriesView(APIView):
     """
     Endpoint to retrieve a time series for a given ticker and period.
-    - Uses SQL data for (5y, 1y, 1m) with daily granularity.
-    - Uses Yahoo Finance for (5d, 1d) with hourly granularity.
+    - Uses SQL data for (5y, 1y, 1m) with daily granularity, or weekly / monthly
+      granularity from the rollups with `interval=1wk` / `interval=1mo`.
+    - Uses the stored intraday bars for (5d, 1d) with 1h / 15m granularity, and
+      Yahoo Finance only when they are stale: not refreshed recently by the intraday
+      job while the market is open, or short of the last session close while it is
+      closed (coalesced, cached and within the shared budget, see LiveTimeSeriesFetcher).
+    - Optional `points=N` downsamples the series server-side (LTTB by default,
+      `downsample=minmax` to keep every bucket's low and high).
+    - Besides one JSON object per point, the series can be negotiated as columnar JSON
+      or packed binary (`?format=columnar|packed` or the Accept header, see
+      stocks/renderers/time_series_renderers.py), skipping the DRF serializer.
+    - Periods served from the daily series carry ETag / Last-Modified validators; the
+      intraday periods may come from Yahoo and are not versioned.
     """
 
+    STORED_PERIODS = {"5y", "1y", "1m"}
+
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarTimeSeriesRenderer, PackedTimeSeriesRenderer]
+
+    @staticmethod
+    def _dataset(request) -> str | None:
+        if request.GET.get("period", "1y") in TimeSeriesView.STORED_PERIODS:
+            return DataVersionRepository.TIME_SERIES
+        return None
+
+    @conditional_on_data_version(_dataset)
     def get(self, request):
         ticker = request.GET.get("ticker")
         period = request.GET.get("period", "1y")  # default: 1 year
+        interval = request.GET.get("interval", "1d")  # 1d, or the 1wk / 1mo rollups
         asset_type = request.GET.get("asset_type", "stock").upper()
 
         # 🔎 Validate input
@@ -140,26 +176,73 @@ class TimeSeriesView(APIView):
             return Response({"error": f"Invalid period '{period}'. Must be one of {valid_periods}."},
                             status=status.HTTP_400_BAD_REQUEST)
 
+        if asset_type not in AssetType.__members__:
+            return Response({"error": f"Invalid asset_type '{asset_type.lower()}'. Must be one of {set(name.lower() for name in AssetType.__members__)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        asset_type = AssetType[asset_type]
+
+        valid_intervals = {"1d", *RollupRepository.INTERVALS}
+        if interval not in valid_intervals or (interval != "1d" and period in {"5d", "1d"}):
+            return Response({"error": f"Invalid interval '{interval}'. Must be one of {valid_intervals} (1d only for the 5d and 1d periods)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # 📉 Optional server-side downsampling (?points=N&downsample=lttb|minmax)
+        points = request.GET.get("points")
+        method = request.GET.get("downsample", TimeSeriesDownsampler.LTTB)
+        if points is not None:
+            if not points.isdigit() or int(points) < TimeSeriesDownsampler.MIN_POINTS:
+                return Response({"error": f"Invalid points '{points}'. Must be an integer >= {TimeSeriesDownsampler.MIN_POINTS}."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            points = int(points)
+        if method not in TimeSeriesDownsampler.METHODS:
+            return Response({"error": f"Invalid downsample '{method}'. Must be one of {set(TimeSeriesDownsampler.METHODS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
         try:
             # 🧭 Determine source of data based on period
-            if period in {"5y", "1y", "1m"}:
-                # From SQL database (daily granularity)
-                data = MarketDataRepository.get_time_series_from_db(ticker, period)
+            if period in self.STORED_PERIODS:
+                # From SQL database (daily granularity, or the weekly / monthly rollups)
+                data = MarketDataRepository.get_time_series_from_db(ticker, period, interval)
 
             else:
-                # From Yahoo Finance (hourly or 4h granularity)
-                interval = "15m" if period == "1d" else "1h"
-                data = MarketDataFetcher.get_time_series(
-                    ticker=ticker,
-                    asset_type=AssetType[asset_type],
-                    period=period,
-                    interval=interval
+                # From the intraday bar store (15m or 1h granularity)
+                interval = IntradayRepository.interval_for_period(period)
+                data = IntradayRepository.get_bars(ticker, period)
+
+                stale = not data or not IntradayRepository.is_fresh(
+                    ticker,
+                    interval,
+                    asset_type=asset_type,
+                    latest_bar=data[-1].timestamp
                 )
-                data = TimeSeriesDTOMapper.timedata_to_dto(data)
+                if stale:
+                    # Stale or missing: fetch live from Yahoo Finance, keeping the stored bars as fallback
+                    try:
+                        live = LiveTimeSeriesFetcher.get_time_series(
+                            ticker=ticker,
+                            asset_type=asset_type,
+                            period=period,
+                            interval=interval
+                        )
+                        data = TimeSeriesDTOMapper.timedata_to_dto(live) or data
+                    except Exception:
+                        if not data:
+                            raise
                 
+            if points:
+                data = TimeSeriesDownsampler.downsample(data, points, method)
+
+            # 📦 Compact wire formats: parallel arrays, no per-point serialization
+            if getattr(request.accepted_renderer, "columnar", False):
+                time_unit = TimeSeriesDTOMapper.DAY if period in self.STORED_PERIODS else TimeSeriesDTOMapper.SECOND
+                columns = TimeSeriesDTOMapper.to_columns(ticker, data, time_unit)
+                return Response(columns, status=status.HTTP_200_OK)
+
             # 🧱 Serialize result
             serializer = TimeSeriesDTOSerializer(data, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
+        except UpstreamBudgetExhausted as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file